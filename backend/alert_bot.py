@@ -1,13 +1,35 @@
 import os
 import logging
 import asyncio
-import hmac
-import hashlib
-from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup
+import threading
+from telegram import Bot, Update
 from telegram.ext import Application, CallbackQueryHandler, CommandHandler, ContextTypes
 from typing import Dict, Any
-from contract_config import get_contract_id, get_contract_info, get_deployer_address
-from config import DEEPLINK_SECRET, FRONTEND_URL
+from contract_config import get_contract_id, get_contract_info, get_deployer_address, load_contracts
+from position_store import DEMO_USER_ID, get_position_store
+from alert_queue import AlertQueue
+from alert_coalescer import AlertCoalescer
+from deeplink_signer import get_signer
+from message_templates import (
+    CALLBACK_ERROR_TEXT,
+    WELCOME_TEXT,
+    render_alert,
+    render_alert_summary,
+    render_alerts,
+    render_contract,
+    render_demo,
+    render_position_details,
+    render_protection_link,
+    render_status,
+)
+from async_runner import get_background_loop
+from telegram_client import shutdown as shutdown_telegram_client
+from telegram_dispatcher import send_message
+from telegram_webhook import TELEGRAM_WEBHOOK_SECRET, TELEGRAM_WEBHOOK_URL, set_webhook
+from update_processor import OrderedUpdateProcessor
+from position_monitor import PositionMonitor
+from score_table import RISK_TABLE_ENABLED, ScoreTable, get_score_reader
+from config import FRONTEND_URL
 
 # Configure logging
 logging.basicConfig(
@@ -21,12 +43,17 @@ if not token:
     raise ValueError("TELEGRAM_TOKEN environment variable not set")
 bot = Bot(token=token)
 
+# How long a synchronous producer waits for alert queue capacity
+ALERT_ENQUEUE_TIMEOUT = float(os.getenv("ALERT_ENQUEUE_TIMEOUT", "5"))
+# Positions listed individually in a batched alert; the rest are summarized
+ALERT_BATCH_MAX_POSITIONS = int(os.getenv("ALERT_BATCH_MAX_POSITIONS", "10"))
+# Re-score the position book in the background while polling
+MONITOR_ENABLED = os.getenv("MONITOR_ENABLED", "true").lower() == "true"
+
 def generate_deeplink(position_id: str, user_id: str) -> str:
     """Generate HMAC-secured deeplink for position protection"""
     try:
-        secret = DEEPLINK_SECRET.encode()
-        message = f"{position_id}:{user_id}".encode()
-        signature = hmac.new(secret, message, hashlib.sha256).hexdigest()
+        signature = get_signer().sign(position_id, user_id)
         
         deeplink = f"{FRONTEND_URL}/protect/?pos={position_id}&user={user_id}&sig={signature}"
         
@@ -37,65 +64,134 @@ def generate_deeplink(position_id: str, user_id: str) -> str:
         # Fallback URL without signature for demo
         return f"{FRONTEND_URL}/protect?pos={position_id}&user={user_id}"
 
+def generate_deeplinks(pairs: list) -> list:
+    """Deeplinks for many (position_id, user_id) pairs, signed in one pass"""
+    signatures = get_signer().sign_many(pairs)
+    return [
+        f"{FRONTEND_URL}/protect/?pos={position_id}&user={user_id}&sig={signature}"
+        for (position_id, user_id), signature in zip(pairs, signatures)
+    ]
+
 def verify_deeplink_signature(position_id: str, user_id: str, signature: str) -> bool:
-    """Verify HMAC signature for deeplink"""
+    """Verify HMAC signature for deeplink (versioned, or legacy when accepted)"""
     try:
-        secret = DEEPLINK_SECRET.encode()
-        message = f"{position_id}:{user_id}".encode()
-        expected_signature = hmac.new(secret, message, hashlib.sha256).hexdigest()
-        return hmac.compare_digest(signature, expected_signature)
+        return get_signer().verify(position_id, user_id, signature)
     except Exception as e:
         logger.error(f"Failed to verify deeplink signature: {str(e)}")
         return False
 
+async def deliver_alert(user_id: str, position: dict, risk_score: float):
+    """Send liquidation risk alert to user via Telegram, raising on failure"""
+    text, reply_markup = render_alert(position, risk_score, get_contract_id())
+    # Pooled client behind the rate-limited dispatcher
+    await send_message(user_id, text, parse_mode="Markdown", reply_markup=reply_markup)
+    logger.info(f"Alert sent to user {user_id} for position {position['id']}")
+
+async def deliver_batch_alert(user_id: str, alerts: list):
+    """Send one /status-style alert covering several at-risk positions, raising on failure"""
+    if len(alerts) == 1:
+        return await deliver_alert(user_id, alerts[0]['position'], alerts[0]['risk_score'])
+
+    text, reply_markup = render_alert_summary(alerts, get_contract_id(), ALERT_BATCH_MAX_POSITIONS)
+    await send_message(user_id, text, parse_mode="Markdown", reply_markup=reply_markup)
+    logger.info(f"Batched alert sent to user {user_id} for {len(alerts)} positions")
+
+async def send_alerts_async(alerts: list) -> list:
+    """Render (user_id, position, risk_score) alerts in one pass and send them concurrently"""
+    rendered = render_alerts(((position, risk_score) for _, position, risk_score in alerts), get_contract_id())
+
+    async def send(user_id, text, reply_markup):
+        try:
+            await send_message(user_id, text, parse_mode="Markdown", reply_markup=reply_markup)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to send alert to {user_id}: {str(e)}")
+            return False
+
+    return await asyncio.gather(*(
+        send(user_id, text, reply_markup) for (user_id, _, _), (text, reply_markup) in zip(alerts, rendered)
+    ))
+
 async def send_alert_async(user_id: str, position: dict, risk_score: float):
     """Send liquidation risk alert to user via Telegram (async version)"""
     try:
-        contract_id = get_contract_id()
-        keyboard = [
-            [
-                InlineKeyboardButton("🛡️ Activate Protection", callback_data=f"protect_{position['id']}"),
-                InlineKeyboardButton("📊 View Details", callback_data=f"details_{position['id']}")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # Use the token directly for async bot operations
-        token = os.getenv("TELEGRAM_TOKEN")
-        if not token:
-            raise ValueError("TELEGRAM_TOKEN environment variable not set")
-        bot = Bot(token=token)
-        await bot.send_message(
-            chat_id=user_id,
-            text=f"⚠️ *Liquidation Risk Alert*\n\n"
-                 f"🎯 Position: {position.get('asset', 'Unknown')}\n"
-                 f"📊 Risk Score: {risk_score:.0%}\n"
-                 f"💰 Amount: ${position.get('amount', 0):,.2f}\n"
-                 f"🔥 Health Factor: {position.get('health_factor', 'N/A')}\n\n"
-                 f"⚡ *Action Required* - Your position is at risk of liquidation!\n"
-                 f"🛡️ SafetyVault: `{contract_id[:8]}...{contract_id[-8:]}`",
-            parse_mode="Markdown",
-            reply_markup=reply_markup
-        )
-        logger.info(f"Alert sent to user {user_id} for position {position['id']}")
+        await deliver_alert(user_id, position, risk_score)
         return True
     except Exception as e:
         logger.error(f"Failed to send alert to {user_id}: {str(e)}")
         return False
 
+async def _send_queued_alert(chat_id: str, payload: dict):
+    """Alert queue sender; exceptions make the queue retry"""
+    if 'alerts' in payload:
+        await deliver_batch_alert(chat_id, payload['alerts'])
+    else:
+        await deliver_alert(chat_id, payload['position'], payload['risk_score'])
+
+_alert_queue = None
+_alert_queue_lock = threading.Lock()
+
+def get_alert_queue() -> AlertQueue:
+    """Return the durable alert queue, starting its workers on the background loop"""
+    global _alert_queue
+    if _alert_queue is None:
+        with _alert_queue_lock:
+            if _alert_queue is None:
+                queue = AlertQueue(_send_queued_alert)
+                get_background_loop().run(queue.start())
+                _alert_queue = queue
+    return _alert_queue
+
+_alert_coalescer = None
+
+def get_alert_coalescer() -> AlertCoalescer:
+    """Return the dedup/batching stage in front of the alert queue"""
+    global _alert_coalescer
+    if _alert_coalescer is None:
+        # Start the queue here: flushes run on the background loop and cannot wait on it
+        queue = get_alert_queue()
+
+        def hold(user_id: str, alert: dict) -> int:
+            # Durable from submission; waits on backpressure and raises QueueFull when it persists
+            return queue.enqueue(user_id, alert, timeout=ALERT_ENQUEUE_TIMEOUT, held=True)
+
+        def enqueue_batch(user_id: str, alerts: list, held: list):
+            # One message supersedes the held alerts; frees capacity, so it never blocks the loop
+            queue.replace(user_id, {'alerts': alerts}, held)
+
+        with _alert_queue_lock:
+            if _alert_coalescer is None:
+                _alert_coalescer = AlertCoalescer(enqueue_batch, hold=hold)
+    return _alert_coalescer
+
+_position_monitor = None
+
+def get_position_monitor() -> PositionMonitor:
+    """Return the tiered re-scoring scheduler, alerting through send_alert"""
+    global _position_monitor
+    if _position_monitor is None:
+        # The monitor alerts from the background loop, which cannot wait on
+        # itself to start the queue; bring the alert pipeline up first
+        get_alert_coalescer()
+        with _alert_queue_lock:
+            if _position_monitor is None:
+                table = ScoreTable.create() if RISK_TABLE_ENABLED else None
+                _position_monitor = PositionMonitor(alert=send_alert, table=table)
+    return _position_monitor
+
 def send_alert(user_id: str, position: dict, risk_score: float):
-    """Send liquidation risk alert to user via Telegram (sync wrapper)"""
+    """Queue a liquidation risk alert for delivery via Telegram (sync wrapper).
+
+    Repeats for the same position and risk bucket are dropped, and alerts for
+    one user arriving close together go out as a single message. Returns False
+    if the alert could not be queued, e.g. the queue stayed full for
+    ALERT_ENQUEUE_TIMEOUT seconds.
+    """
     try:
-        # Try to get current loop, if none exists, create one
-        try:
-            loop = asyncio.get_running_loop()
-            # If loop exists, create a task
-            task = loop.create_task(send_alert_async(user_id, position, risk_score))
-            return True
-        except RuntimeError:
-            # No loop running, use asyncio.run
-            asyncio.run(send_alert_async(user_id, position, risk_score))
-            return True
+        outcome = get_alert_coalescer().submit(user_id, position, risk_score)
+        if outcome == 'suppressed':
+            logger.debug(f"Suppressed repeat alert to {user_id} for position {position.get('id')}")
+        return True
     except Exception as e:
         logger.error(f"Failed to send alert to {user_id}: {str(e)}")
         return False
@@ -119,25 +215,14 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             user_id = str(query.from_user.id)
             
             # Step 2: Generate secured deeplink as specified
-            message = f"{position_id}:{user_id}".encode()
-            signature = hmac.new(DEEPLINK_SECRET.encode(), message, hashlib.sha256).hexdigest()
+            signature = get_signer().sign(position_id, user_id)
             deeplink = f"{FRONTEND_URL}/protect/?pos={position_id}&user={user_id}&sig={signature}"
             
             logger.info(f"Generated secured deeplink for position {position_id}, user {user_id}")
             
             # Step 3: Send button with "Open Protection App" as specified
-            keyboard = [[InlineKeyboardButton("🛡️ Open Protection App", url=deeplink)]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await query.edit_message_text(
-                text=f"🛡️ **Protection Activated!**\n\n"
-                     f"✅ Secure HMAC-signed deeplink generated\n"
-                     f"🔐 Position: `{position_id}`\n"
-                     f"👤 User: `{user_id}`\n\n"
-                     f"Click below to open BlendGuard protection interface:",
-                parse_mode="Markdown",
-                reply_markup=reply_markup
-            )
+            text, reply_markup = render_protection_link(position_id, user_id, deeplink)
+            await query.edit_message_text(text=text, parse_mode="Markdown", reply_markup=reply_markup)
                 
         elif query.data and query.data.startswith('details_'):
             position_id = query.data.split('_')[1]
@@ -145,29 +230,12 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             position_details = get_position_details(position_id)
             contract_info = get_contract_info()
             
-            keyboard = [[InlineKeyboardButton("🛡️ Activate Protection", callback_data=f"protect_{position_id}")]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await query.edit_message_text(
-                text=f"📊 **Position Details**\n\n"
-                     f"🏷️ ID: `{position_id}`\n"
-                     f"🎯 Asset: {position_details.get('asset', 'Unknown')}\n"
-                     f"💰 Collateral: ${position_details.get('collateral', 0):,.2f}\n"
-                     f"💸 Debt: ${position_details.get('debt', 0):,.2f}\n"
-                     f"📈 LTV: {position_details.get('ltv', 0):.1%}\n"
-                     f"🔥 Health Factor: {position_details.get('health_factor', 'N/A')}\n"
-                     f"⚡ Liquidation Price: ${position_details.get('liquidation_price', 0):,.2f}\n\n"
-                     f"🛡️ SafetyVault Ready: {contract_info['status']}",
-                parse_mode="Markdown",
-                reply_markup=reply_markup
-            )
+            text, reply_markup = render_position_details(position_id, position_details, contract_info['status'])
+            await query.edit_message_text(text=text, parse_mode="Markdown", reply_markup=reply_markup)
             
     except Exception as e:
         logger.error(f"Error handling callback {query.data}: {str(e)}")
-        await query.edit_message_text(
-            text="❌ An error occurred while processing your request. Please try again.",
-            parse_mode="Markdown"
-        )
+        await query.edit_message_text(text=CALLBACK_ERROR_TEXT, parse_mode="Markdown")
 
 async def handle_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command"""
@@ -175,19 +243,7 @@ async def handle_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error("No message in update")
         return
         
-    welcome_message = """
-🛡️ **Welcome to BlendGuard!**
-
-I'm your personal Stellar lending protection assistant. I monitor your positions and help protect them from liquidation.
-
-**Available Commands:**
-• `/status` - Check your position health
-• `/contract` - View BlendGuard contract info
-• `/demo` - See demo protection result
-
-Stay safe! 🚀
-"""
-    await update.message.reply_text(welcome_message, parse_mode="Markdown")
+    await update.message.reply_text(WELCOME_TEXT, parse_mode="Markdown")
 
 async def handle_demo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /demo command - show protection result with TX hash"""
@@ -195,21 +251,7 @@ async def handle_demo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error("No message in update")
         return
         
-    # Generate demo TX hash
-    demo_tx = "d1f2a5c8e3b7a9f012e4b8c7d5f6e3a9b2c4d7e8f1a3b5c6d9e2f4a7b8c1d5e"
-    
-    keyboard = [[
-        InlineKeyboardButton("View on Explorer", 
-            url=f"https://stellar.expert/explorer/testnet/tx/{demo_tx}")
-    ]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    demo_message = (
-        f"⚠️ *DEMO: Protection Applied*\n"
-        f"🔗 TX: `{demo_tx[:16]}...`\n"
-        f"🆕 Health Factor: **1.85**\n\n"
-        f"🛡️ Position successfully protected from liquidation!"
-    )
+    demo_message, reply_markup = render_demo()
     
     await update.message.reply_text(
         demo_message,
@@ -225,34 +267,10 @@ async def handle_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
         
     user_id = str(update.message.from_user.id)
-    positions = get_user_positions(user_id)
-    
-    if not positions:
-        no_positions_message = """
-📊 **Position Status**
-
-No active lending positions found.
-
-Connect your wallet to start using Blend lending markets!
-"""
-        await update.message.reply_text(no_positions_message, parse_mode="Markdown")
-        return
+    # Latest scores are a shared-memory read, not a model call
+    positions = apply_shared_scores(get_user_positions(user_id))
     
-    status_message = "📊 **Your Lending Positions**\n\n"
-    
-    keyboard = []
-    for position in positions:
-        risk_emoji = "🔴" if position['risk_score'] > 0.8 else "🟡" if position['risk_score'] > 0.6 else "🟢"
-        status_message += f"{risk_emoji} **{position['asset']}**: ${position['amount']:,}\n"
-        status_message += f"   Risk: {position['risk_score']:.0%} | Health: {position['health_factor']:.2f}\n\n"
-        
-        if position['risk_score'] > 0.7:  # High risk positions
-            keyboard.append([InlineKeyboardButton(
-                f"🛡️ Activate Protection - {position['asset']}", 
-                callback_data=f"protect_{position['id']}"
-            )])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
+    status_message, reply_markup = render_status(positions)
     await update.message.reply_text(status_message, parse_mode="Markdown", reply_markup=reply_markup)
 
 async def handle_contract(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -261,18 +279,7 @@ async def handle_contract(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error("No message in update") 
         return
         
-    contract_info = get_contract_info()
-    contract_message = f"""
-🔗 **BlendGuard Contract Info**
-
-**SafetyVault Contract:**
-`{contract_info['contract_id']}`
-
-**Network:** {contract_info['network']}
-**Version:** {contract_info['version']}
-
-This contract protects your lending positions through automated safety actions.
-"""
+    contract_message = render_contract(get_contract_info())
     await update.message.reply_text(contract_message, parse_mode="Markdown")
 
 def trigger_safety_vault_protection(position_id: str) -> Dict[str, Any]:
@@ -306,17 +313,12 @@ def trigger_safety_vault_protection(position_id: str) -> Dict[str, Any]:
 
 def get_position_details(position_id: str) -> Dict[str, Any]:
     """Get detailed information about a position"""
-    # Centralized position data - consistent with position_service.js
-    return {
-        'id': position_id or 'XLM-123',
-        'asset': 'XLM',
-        'collateral': 10000.00,  # USD value
-        'debt': 8500.00,         # USD value
-        'ltv': 0.85,            # 85%
-        'health_factor': 1.15,
-        'liquidation_price': 0.095,
-        'status': 'high-risk'
-    }
+    store = get_position_store()
+    details = store.get(position_id or 'XLM-123')
+    if details is None:
+        # Unknown ids are shown against the demo position, as before
+        details = dict(store.get('XLM-123'), id=position_id)
+    return details
 
 def format_position(position):
     """Standardized position formatting for consistent display"""
@@ -331,21 +333,32 @@ def format_position(position):
 
 def get_user_positions(user_id: str) -> list:
     """Get all positions for a user"""
-    # Centralized position data - consistent with position_service.js
-    HIGH_RISK_POSITION = {
-        "id": "XLM-123",
-        "ltv": 0.85,
-        "collateral": 10000,  # USD value - consistent with Telegram display
-        "debt": 8500,
-        "pool": "XLM-LENDING",
-        "assets": [{"code": "XLM", "amount": 10000}],
-        "asset": "XLM", 
-        "amount": 10000,  # Updated to match collateral
-        "risk_score": 0.85,
-        "health_factor": 1.15
-    }
-    
-    return [HIGH_RISK_POSITION]
+    store = get_position_store()
+    # Users without tracked positions see the demo position
+    return store.positions_for_user(user_id) or store.positions_for_user(DEMO_USER_ID)
+
+def apply_shared_scores(positions: list) -> list:
+    """Overlay the monitor's latest scores from the shared score table, when one is running"""
+    table = get_score_reader() if RISK_TABLE_ENABLED else None
+    if table is None or not positions:
+        return positions
+    for position, record in zip(positions, table.get_many([position['id'] for position in positions])):
+        if record is None:
+            continue
+        for field in ('risk_score', 'health_factor'):
+            if record[field] == record[field]:  # skip NaN (not scored yet)
+                position[field] = record[field]
+    return positions
+
+def register_handlers(application: Application):
+    """Attach the bot's command and callback handlers (polling and webhook modes)"""
+    # Build the contract snapshot now rather than on the first update
+    load_contracts()
+    application.add_handler(CommandHandler("start", handle_start))
+    application.add_handler(CommandHandler("status", handle_status))
+    application.add_handler(CommandHandler("contract", handle_contract))
+    application.add_handler(CommandHandler("demo", handle_demo))
+    application.add_handler(CallbackQueryHandler(handle_callback))
 
 def start_bot(test_mode=False):
     """Start the bot with proper event loop handling"""
@@ -386,19 +399,31 @@ async def run_bot_async():
         return False
     
     application = None
+    monitor = None
     try:
-        # Log contract info on startup
-        contract_info = get_contract_info()
+        # Snapshot contract config once and log it on startup
+        contract_info = load_contracts()['contract_info']
         logger.info(f"BlendGuard Alert Bot starting with SafetyVault: {contract_info['contract_id']}")
         
-        application = Application.builder().token(token).build()
+        if TELEGRAM_WEBHOOK_URL:
+            if not TELEGRAM_WEBHOOK_SECRET:
+                logger.error("TELEGRAM_WEBHOOK_SECRET must be set to use webhook mode")
+                return False
+            # Updates are pushed to the backend's webhook route instead of polled here
+            await set_webhook(TELEGRAM_WEBHOOK_URL, token=token)
+            logger.info(f"Webhook mode: Telegram updates are delivered to {TELEGRAM_WEBHOOK_URL}")
+            return True
+        
+        # Concurrent across users, ordered per user, with handler timeouts
+        application = Application.builder().token(token).concurrent_updates(OrderedUpdateProcessor()).build()
         
         # Add handlers
-        application.add_handler(CommandHandler("start", handle_start))
-        application.add_handler(CommandHandler("status", handle_status))
-        application.add_handler(CommandHandler("contract", handle_contract))
-        application.add_handler(CommandHandler("demo", handle_demo))
-        application.add_handler(CallbackQueryHandler(handle_callback))
+        register_handlers(application)
+        
+        # Keep re-scoring positions and alerting on threshold crossings
+        if MONITOR_ENABLED:
+            monitor = get_position_monitor()
+            monitor.start()
         
         # Start polling
         logger.info("BlendGuard Alert Bot started successfully!")
@@ -409,6 +434,9 @@ async def run_bot_async():
         logger.error(f"Bot error: {str(e)}")
         return False
     finally:
+        if monitor:
+            monitor.stop()
+        await shutdown_telegram_client()
         if application:
             try:
                 await application.shutdown()
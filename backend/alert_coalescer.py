@@ -0,0 +1,198 @@
+"""
+Alert Coalescer for BlendGuard
+Sits in front of the alert queue: drops repeat alerts for the same
+(user, position, risk bucket) within a window and merges a user's at-risk
+positions into one message per flush. With a ``hold`` hook each alert is
+persisted (and subject to the queue's backpressure) before it is buffered.
+"""
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from async_runner import get_background_loop
+
+logger = logging.getLogger(__name__)
+
+# Suppress repeats of an already-sent alert for this long
+ALERT_DEDUP_WINDOW_SECONDS = float(os.getenv("ALERT_DEDUP_WINDOW_SECONDS", "900"))
+# How long alerts for one user are gathered before they go out together
+ALERT_COALESCE_DELAY_SECONDS = float(os.getenv("ALERT_COALESCE_DELAY_SECONDS", "2"))
+ALERT_RISK_BUCKET_WIDTH = float(os.getenv("ALERT_RISK_BUCKET_WIDTH", "0.1"))
+# Minimum risk score move that justifies a re-alert inside the window
+ALERT_MATERIAL_CHANGE = float(os.getenv("ALERT_MATERIAL_CHANGE", "0.1"))
+
+# Persists one (user_id, {'position': ..., 'risk_score': ...}) alert before it is
+# buffered and returns a token for it; raises if the alert cannot be accepted
+Hold = Callable[[str, Dict[str, Any]], Any]
+# Receives (user_id, [{'position': ..., 'risk_score': ...}, ...], held tokens) for each flush
+Flush = Callable[[str, List[Dict[str, Any]], List[Any]], Any]
+
+
+class AlertCoalescer:
+    """Dedupes and batches alerts per user.
+
+    An alert is suppressed while the last one sent for the same position is
+    younger than ``window`` and the risk score either stayed in the same bucket
+    or moved by less than ``material_change``. Alerts that pass are buffered per
+    user for ``delay`` seconds; a later alert for a buffered position replaces
+    it instead of adding another line. The tokens ``hold`` returned for a
+    batch's alerts are handed to ``flush`` so it can supersede them.
+    """
+
+    def __init__(self, flush: Flush, hold: Optional[Hold] = None, window: float = ALERT_DEDUP_WINDOW_SECONDS,
+                 delay: float = ALERT_COALESCE_DELAY_SECONDS, bucket_width: float = ALERT_RISK_BUCKET_WIDTH,
+                 material_change: float = ALERT_MATERIAL_CHANGE,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.flush = flush
+        self.hold = hold
+        self.window = window
+        self.delay = delay
+        self.bucket_width = bucket_width
+        self.material_change = material_change
+        self._loop = loop
+        self._lock = threading.Lock()
+        # (user_id, position_id) -> (bucket, risk_score, sent_at)
+        self._sent: Dict[Tuple[str, str], Tuple[int, float, float]] = {}
+        # (expires_at, key) in send order, so pruning only looks at expired entries
+        self._expiry: Deque[Tuple[float, Tuple[str, str]]] = deque()
+        # user_id -> {position_id: alert}, in arrival order
+        self._pending: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # user_id -> hold tokens of the buffered alerts
+        self._held: Dict[str, List[Any]] = {}
+        self.metrics = {
+            'submitted': 0,
+            'suppressed': 0,
+            'rejected': 0,
+            'merged': 0,
+            'messages': 0,
+            'alerts_flushed': 0,
+        }
+
+    def bucket(self, risk_score: float) -> int:
+        return int(math.floor(risk_score / self.bucket_width))
+
+    def _is_repeat(self, key: Tuple[str, str], risk_score: float, now: float) -> bool:
+        sent = self._sent.get(key)
+        if sent is None:
+            return False
+        bucket, last_score, sent_at = sent
+        if now - sent_at >= self.window:
+            return False
+        # Crossing a bucket edge by a hair is jitter, not a material change
+        return bucket == self.bucket(risk_score) or abs(risk_score - last_score) < self.material_change
+
+    def submit(self, user_id: Any, position: Dict[str, Any], risk_score: float) -> str:
+        """Offer an alert; returns 'suppressed', 'merged' or 'queued'.
+
+        Raises whatever ``hold`` raises (e.g. QueueFull) when the alert cannot
+        be accepted; it is then not buffered.
+        """
+        user_id = str(user_id)
+        position_id = str(position.get('id'))
+        now = time.time()
+        with self._lock:
+            self.metrics['submitted'] += 1
+            if self._is_repeat((user_id, position_id), risk_score, now):
+                self.metrics['suppressed'] += 1
+                return 'suppressed'
+
+        alert = {'position': position, 'risk_score': risk_score}
+        token = None
+        if self.hold is not None:
+            # Outside the lock: holding may wait on the queue's backpressure
+            try:
+                token = self.hold(user_id, alert)
+            except Exception:
+                with self._lock:
+                    self.metrics['rejected'] += 1
+                raise
+
+        with self._lock:
+            pending = self._pending.get(user_id)
+            first = pending is None
+            if first:
+                pending = self._pending[user_id] = {}
+            merged = position_id in pending
+            pending[position_id] = alert
+            if token is not None:
+                self._held.setdefault(user_id, []).append(token)
+            if merged:
+                self.metrics['merged'] += 1
+                return 'merged'
+
+        if first:
+            self._schedule(user_id)
+        return 'queued'
+
+    def _schedule(self, user_id: str):
+        loop = self._loop or get_background_loop().loop
+        loop.call_soon_threadsafe(loop.call_later, self.delay, self.flush_user, user_id)
+
+    def flush_user(self, user_id: str) -> bool:
+        """Hand a user's buffered alerts to ``flush`` as one batch"""
+        with self._lock:
+            pending = self._pending.pop(user_id, None)
+            held = self._held.pop(user_id, [])
+        if not pending:
+            return False
+
+        alerts = list(pending.values())
+        try:
+            self.flush(user_id, alerts, held)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(alerts)} alerts for {user_id}, retrying: {str(e)}")
+            with self._lock:
+                # Newer alerts that arrived meanwhile win over the failed batch
+                pending.update(self._pending.get(user_id, {}))
+                reschedule = user_id not in self._pending
+                self._pending[user_id] = pending
+                self._held[user_id] = held + self._held.get(user_id, [])
+            if reschedule:
+                self._schedule(user_id)
+            return False
+
+        now = time.time()
+        with self._lock:
+            for alert in alerts:
+                score = alert['risk_score']
+                key = (user_id, str(alert['position'].get('id')))
+                self._sent[key] = (self.bucket(score), score, now)
+                self._expiry.append((now + self.window, key))
+            self.metrics['messages'] += 1
+            self.metrics['alerts_flushed'] += len(alerts)
+            self._prune(now)
+        return True
+
+    def flush_all(self) -> int:
+        """Flush every buffered user immediately; returns the number of messages"""
+        with self._lock:
+            users = list(self._pending)
+        return sum(self.flush_user(user_id) for user_id in users)
+
+    def _prune(self, now: float):
+        expiry, sent = self._expiry, self._sent
+        while expiry and expiry[0][0] <= now:
+            _, key = expiry.popleft()
+            entry = sent.get(key)
+            # A key sent again since has a later expiry entry of its own
+            if entry is not None and now - entry[2] >= self.window:
+                del sent[key]
+
+    def forget(self, user_id: Any, position_id: Any):
+        """Allow the next alert for a position through, e.g. after it was protected"""
+        with self._lock:
+            self._sent.pop((str(user_id), str(position_id)), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.metrics)
+            stats['pending_users'] = len(self._pending)
+            stats['tracked_positions'] = len(self._sent)
+        submitted = stats['submitted']
+        stats['messages_per_alert'] = stats['messages'] / submitted if submitted else 0.0
+        return stats
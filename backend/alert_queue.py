@@ -0,0 +1,297 @@
+"""
+Durable Alert Queue for BlendGuard
+SQLite-backed outbound alert queue with an async worker pool, per-chat
+ordering, bounded in-flight sends, retries and backpressure to producers.
+"""
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Set
+
+logger = logging.getLogger(__name__)
+
+ALERT_QUEUE_PATH = os.getenv("ALERT_QUEUE_PATH", "alerts.db")
+ALERT_QUEUE_WORKERS = int(os.getenv("ALERT_QUEUE_WORKERS", "8"))
+ALERT_QUEUE_MAX_IN_FLIGHT = int(os.getenv("ALERT_QUEUE_MAX_IN_FLIGHT", "32"))
+ALERT_QUEUE_MAX_PENDING = int(os.getenv("ALERT_QUEUE_MAX_PENDING", "100000"))
+ALERT_QUEUE_MAX_ATTEMPTS = int(os.getenv("ALERT_QUEUE_MAX_ATTEMPTS", "5"))
+ALERT_QUEUE_RETRY_BACKOFF = float(os.getenv("ALERT_QUEUE_RETRY_BACKOFF", "1.0"))
+# Upper bound on how long an idle worker sleeps before re-checking for retries
+POLL_INTERVAL = 0.5
+
+Sender = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS alerts_status ON alerts (status, id);
+CREATE INDEX IF NOT EXISTS alerts_chat ON alerts (chat_id, id);
+"""
+
+
+class QueueFull(Exception):
+    """Raised when a producer times out waiting for queue capacity"""
+
+
+class AlertQueue:
+    """Persistent FIFO-per-chat queue drained by a pool of asyncio workers.
+
+    Delivered alerts are deleted; alerts that exhaust their retries stay in the
+    table with status 'failed' as a dead-letter record. Alerts enqueued as
+    'held' are stored (and count against capacity) but not delivered until
+    replace() swaps them for a combined alert; after a restart they are
+    delivered individually.
+    """
+
+    def __init__(self, sender: Sender, path: str = ALERT_QUEUE_PATH, workers: int = ALERT_QUEUE_WORKERS,
+                 max_in_flight: int = ALERT_QUEUE_MAX_IN_FLIGHT, max_pending: int = ALERT_QUEUE_MAX_PENDING,
+                 max_attempts: int = ALERT_QUEUE_MAX_ATTEMPTS, retry_backoff: float = ALERT_QUEUE_RETRY_BACKOFF):
+        self.sender = sender
+        self.path = path
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db_lock = threading.Lock()
+
+        # Sends interrupted by a crash are retried; held alerts never combined go out individually
+        self._execute("UPDATE alerts SET status = 'pending' WHERE status IN ('inflight', 'held')")
+        self._outstanding = self._execute("SELECT COUNT(*) FROM alerts WHERE status = 'pending'").fetchone()[0]
+        self._capacity = threading.Condition()
+
+        self._leased_chats: Set[str] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._tasks = []
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._db_lock:
+            return self._db.execute(sql, params)
+
+    # Producer side
+
+    def enqueue(self, chat_id: Any, payload: Dict[str, Any], timeout: Optional[float] = None,
+                held: bool = False) -> int:
+        """Persist an alert, blocking while the queue is at ``max_pending``.
+
+        Raises QueueFull if capacity does not free up within ``timeout`` seconds.
+        """
+        with self._capacity:
+            if not self._capacity.wait_for(lambda: self._outstanding < self.max_pending, timeout):
+                raise QueueFull(f"Alert queue at capacity ({self.max_pending} pending)")
+            self._outstanding += 1
+
+        now = time.time()
+        try:
+            cursor = self._execute(
+                "INSERT INTO alerts (chat_id, payload, status, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (str(chat_id), json.dumps(payload, default=str), 'held' if held else 'pending', now, now),
+            )
+        except Exception:
+            self._release_capacity()
+            raise
+        if not held:
+            self._notify_workers()
+        return cursor.lastrowid
+
+    def replace(self, chat_id: Any, payload: Dict[str, Any], held_ids: Sequence[int]) -> int:
+        """Atomically swap held alerts for one alert superseding them.
+
+        Never waits for capacity: the swap frees at least as much as it takes.
+        Ids that are no longer held are ignored.
+        """
+        now = time.time()
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                removed = 0
+                if held_ids:
+                    marks = ','.join('?' * len(held_ids))
+                    removed = self._db.execute(
+                        f"DELETE FROM alerts WHERE status = 'held' AND id IN ({marks})", tuple(held_ids),
+                    ).rowcount
+                cursor = self._db.execute(
+                    "INSERT INTO alerts (chat_id, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                    (str(chat_id), json.dumps(payload, default=str), now, now),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                raise
+        with self._capacity:
+            self._outstanding += 1 - removed
+            self._capacity.notify_all()
+        self._notify_workers()
+        return cursor.lastrowid
+
+    async def enqueue_async(self, chat_id: Any, payload: Dict[str, Any], timeout: Optional[float] = None) -> int:
+        """Non-blocking producer API for coroutines"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.enqueue, chat_id, payload, timeout)
+
+    def _notify_workers(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _release_capacity(self):
+        with self._capacity:
+            self._outstanding -= 1
+            self._capacity.notify()
+
+    # Consumer side
+
+    async def start(self):
+        """Start the worker pool on the running event loop"""
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Alert queue started with {self.workers} workers ({self._outstanding} pending)")
+
+    async def stop(self):
+        """Cancel the workers; unsent alerts stay queued on disk"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._execute("UPDATE alerts SET status = 'pending' WHERE status = 'inflight'")
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued alert is delivered or dead-lettered"""
+        if not self._tasks:
+            raise RuntimeError("Alert queue workers are not running; call start() before drain()")
+
+        async def wait_empty():
+            while self.pending_count() or self._leased_chats:
+                self._idle.clear()
+                self._wakeup.set()
+                await self._idle.wait()
+                # Idle with alerts left means they are backing off: sleep until the first is due
+                due_in = self._next_attempt_in()
+                if due_in:
+                    await asyncio.sleep(due_in)
+        try:
+            await asyncio.wait_for(wait_empty(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    flush = drain
+
+    def _claim(self) -> Optional[tuple]:
+        """Lease the oldest due alert whose chat has no earlier alert pending or in flight"""
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT id, chat_id, payload, attempts FROM alerts AS a "
+                "WHERE status = 'pending' AND next_attempt_at <= ? "
+                "AND NOT EXISTS (SELECT 1 FROM alerts AS b WHERE b.chat_id = a.chat_id AND b.id < a.id "
+                "AND b.status IN ('pending', 'inflight')) "
+                "ORDER BY id LIMIT 1",
+                (time.time(),),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE alerts SET status = 'inflight' WHERE id = ?", (row[0],))
+            self._leased_chats.add(row[1])
+            return row
+
+    async def _worker(self, index: int):
+        while True:
+            claimed = self._claim()
+            if claimed is None:
+                if not self._leased_chats:
+                    self._idle.set()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            alert_id, chat_id, payload, attempts = claimed
+            try:
+                async with self._in_flight:
+                    await self.sender(chat_id, json.loads(payload))
+            except asyncio.CancelledError:
+                self._execute("UPDATE alerts SET status = 'pending' WHERE id = ?", (alert_id,))
+                self._leased_chats.discard(chat_id)
+                raise
+            except Exception as e:
+                self._record_failure(alert_id, chat_id, attempts + 1, e)
+            else:
+                self._execute("DELETE FROM alerts WHERE id = ?", (alert_id,))
+                self.sent += 1
+                self._release_capacity()
+            finally:
+                self._leased_chats.discard(chat_id)
+                self._wakeup.set()
+
+    def _record_failure(self, alert_id: int, chat_id: str, attempts: int, error: Exception):
+        if attempts >= self.max_attempts:
+            self._execute(
+                "UPDATE alerts SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                (attempts, str(error), alert_id),
+            )
+            self.failed += 1
+            self._release_capacity()
+            logger.error(f"Alert {alert_id} to {chat_id} failed permanently: {str(error)}")
+            return
+
+        # Honor server-provided delays (e.g. Telegram RetryAfter), else back off exponentially
+        delay = getattr(error, 'retry_after', None)
+        if delay is None:
+            delay = self.retry_backoff * (2 ** (attempts - 1))
+        if isinstance(delay, timedelta):
+            delay = delay.total_seconds()
+        self._execute(
+            "UPDATE alerts SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            (attempts, time.time() + float(delay), str(error), alert_id),
+        )
+        self.retried += 1
+        logger.warning(f"Alert {alert_id} to {chat_id} failed (attempt {attempts}), retrying in {delay:.1f}s")
+
+    def _next_attempt_in(self) -> float:
+        """Seconds until the earliest pending alert may be attempted (0 if one is due or none wait)"""
+        next_attempt = self._execute("SELECT MIN(next_attempt_at) FROM alerts WHERE status = 'pending'").fetchone()[0]
+        return max(0.0, next_attempt - time.time()) if next_attempt is not None else 0.0
+
+    def pending_count(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM alerts WHERE status IN ('pending', 'inflight')").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending': self.pending_count(),
+            'held': self._execute("SELECT COUNT(*) FROM alerts WHERE status = 'held'").fetchone()[0],
+            'in_flight': len(self._leased_chats),
+            'sent': self.sent,
+            'retried': self.retried,
+            'failed': self.failed,
+        }
@@ -1,13 +1,19 @@
 #!/usr/bin/env python3
 """
 Notification API for BlendGuard
-Handles POST /notify-telegram endpoint for success notifications
+Handles POST /notify-telegram and /notify-telegram/bulk endpoints for success notifications
 """
 import os
-import logging
-from flask import Flask, request, jsonify
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+import json
+import atexit
 import asyncio
+import logging
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import Blueprint, Flask, Response, request, jsonify, url_for, stream_with_context
+from async_runner import get_background_loop
+from telegram_client import shutdown as shutdown_telegram_client
+from telegram_dispatcher import get_dispatcher, send_message
+from message_templates import explorer_keyboard
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,48 +21,153 @@ logger = logging.getLogger(__name__)
 
 # Initialize bot
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "7837740210:AAHpN4ZdjBVfWU2OM0wm6_5bBdcrJ_Yt3kM")
-bot = Bot(token=TELEGRAM_TOKEN)
+# Upper bound on how long a synchronous request waits for Telegram; for bulk
+# requests it bounds each send, not time spent queued behind the rate limits
+NOTIFY_SEND_TIMEOUT = float(os.getenv("NOTIFY_SEND_TIMEOUT", "15"))
+NOTIFY_BULK_MAX_ITEMS = int(os.getenv("NOTIFY_BULK_MAX_ITEMS", "1000"))
+# Sends in flight per bulk request; the dispatcher still enforces Telegram's limits
+NOTIFY_BULK_CONCURRENCY = int(os.getenv("NOTIFY_BULK_CONCURRENCY", "32"))
 
-app = Flask(__name__)
+bp = Blueprint('notify', __name__)
+
+# Close pooled Telegram connections on the background loop before it stops
+atexit.register(lambda: get_background_loop().stop(shutdown_telegram_client()))
+
+def format_actions(actions):
+    """Bullet list of executed SafetyVault actions"""
+    lines = []
+    for action in actions or []:
+        action_type = action.get('action_type', 'Unknown')
+        amount = action.get('amount', 0)
+        if amount > 0:
+            lines.append(f"• {action_type}: {amount:,.0f} {action.get('asset_id', '')}")
+        else:
+            lines.append(f"• {action_type}")
+    return "\n".join(lines)
+
+async def notify_success_async(user_id, tx_hash, position_id, new_health, actions=None, timeout=None):
+    """Send the enhanced protection-success notification; ``timeout`` bounds the Telegram request"""
+    message = (
+        f"✅ *Position Protected!*\n\n"
+        f"• Position: `{position_id}`\n"
+        f"• TX Hash: `{tx_hash}`\n"
+        f"• New Health Factor: `{new_health:.2f}`"
+    )
+    if actions:
+        message += f"\n\n📊 *Actions Executed:*\n{format_actions(actions)}"
+    result = await send_message(
+        user_id,
+        message,
+        token=TELEGRAM_TOKEN,
+        parse_mode="Markdown",
+        reply_markup=explorer_keyboard(tx_hash, "View Transaction"),
+        timeout=timeout
+    )
+    return {'chatId': user_id, 'messageId': result.message_id, 'txHash': tx_hash, 'newHealth': new_health}
+
+async def notify_basic_async(user_id, message, tx_hash=None, timeout=None):
+    """Send a free-form notification, with an explorer link if a TX hash is given"""
+    reply_markup = explorer_keyboard(tx_hash, "🔍 View Transaction") if tx_hash else None
+    result = await send_message(
+        user_id,
+        message,
+        token=TELEGRAM_TOKEN,
+        parse_mode='Markdown',
+        reply_markup=reply_markup,
+        timeout=timeout
+    )
+    return {'chatId': user_id, 'messageId': result.message_id, 'txHash': tx_hash}
 
-def notify_success(user_id, tx_hash, position_id, new_health):
-    """Enhanced notification function for successful protection"""
+def notify_success(user_id, tx_hash, position_id, new_health, actions=None):
+    """Enhanced notification function for successful protection; a send that times out is cancelled"""
     try:
-        message = (
-            f"✅ *Position Protected!*\n\n"
-            f"• Position: `{position_id}`\n"
-            f"• TX Hash: `{tx_hash}`\n"
-            f"• New Health Factor: `{new_health:.2f}`"
+        get_background_loop().run(
+            notify_success_async(user_id, tx_hash, position_id, new_health, actions),
+            timeout=NOTIFY_SEND_TIMEOUT
         )
-        
-        keyboard = [[
-            InlineKeyboardButton("View Transaction", 
-                url=f"https://stellar.expert/explorer/testnet/tx/{tx_hash}")
-        ]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # Send notification using asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(
-                bot.send_message(
-                    chat_id=user_id,
-                    text=message,
-                    parse_mode="Markdown",
-                    reply_markup=reply_markup
-                )
-            )
-            return True
-        finally:
-            loop.close()
-            
+        return True
+    except FutureTimeoutError:
+        logger.error(f"Timed out notifying success after {NOTIFY_SEND_TIMEOUT:g}s")
+        return False
     except Exception as e:
         logger.error(f"Failed to notify success: {str(e)}")
         return False
 
-@app.route('/notify-telegram', methods=['POST'])
+def telegram_error_details(user_id, error_msg):
+    """Map common Telegram errors to the API's error payload"""
+    if "Chat not found" in error_msg or "Forbidden" in error_msg:
+        return {'error': 'Chat not found', 'details': f'User {user_id} not found in Telegram or bot blocked'}
+    return {'error': 'Failed to send notification', 'details': error_msg}
+
+async def notify_item_async(index, item, slots):
+    """Send one bulk item and report its outcome instead of raising.
+
+    Each send gets its own NOTIFY_SEND_TIMEOUT, counted from when the dispatcher
+    hands it to Telegram, so items queued behind the rate limits are not failed.
+    """
+    if not isinstance(item, dict) or 'userId' not in item:
+        return {'index': index, 'success': False, 'error': 'Missing required field: userId'}
+
+    user_id = item['userId']
+    tx_hash = item.get('txHash')
+    position_id = item.get('positionId')
+    new_health = item.get('newHealth')
+    enhanced = bool(tx_hash and position_id and new_health)
+    if not enhanced and not item.get('message'):
+        return {'index': index, 'success': False, 'chatId': user_id,
+                'error': 'Missing required fields: message, or txHash, positionId and newHealth'}
+    try:
+        async with slots:
+            if enhanced:
+                result = await notify_success_async(user_id, tx_hash, position_id, new_health, item.get('actions'),
+                                                    timeout=NOTIFY_SEND_TIMEOUT)
+            else:
+                result = await notify_basic_async(user_id, item['message'], tx_hash, timeout=NOTIFY_SEND_TIMEOUT)
+        return dict(result, index=index, success=True, positionId=position_id)
+    except asyncio.TimeoutError:
+        logger.error(f"Bulk notification {index} to {user_id} timed out after {NOTIFY_SEND_TIMEOUT:g}s")
+        return bulk_timed_out(index, item)
+    except Exception as e:
+        logger.error(f"Bulk notification {index} to {user_id} failed: {str(e)}")
+        return dict(telegram_error_details(user_id, str(e)), index=index, success=False, chatId=user_id,
+                    positionId=position_id)
+
+def _bulk_failed(index, item, error, details):
+    item = item if isinstance(item, dict) else {}
+    return {'index': index, 'success': False, 'chatId': item.get('userId'), 'positionId': item.get('positionId'),
+            'error': error, 'details': details}
+
+def bulk_timed_out(index, item):
+    """Bulk result for an item whose send did not finish within NOTIFY_SEND_TIMEOUT"""
+    return _bulk_failed(index, item, 'Timed out', f'No response from Telegram within {NOTIFY_SEND_TIMEOUT:g}s')
+
+def bulk_not_sent(index, item):
+    """Bulk result for an item whose send was cancelled, e.g. on shutdown, before it finished"""
+    return _bulk_failed(index, item, 'Not sent', 'Cancelled before the send completed')
+
+def _wants_stream():
+    """NDJSON streaming via ?stream=1 or Accept: application/x-ndjson"""
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return True
+    return 'application/x-ndjson' in request.headers.get('Accept', '')
+
+def _wants_async(data):
+    """Clients opt into 202 responses via body, query string or Prefer header"""
+    if data.get('async') is True:
+        return True
+    if request.args.get('async', '').lower() in ('1', 'true'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+def _accepted(job_id):
+    return jsonify({
+        'success': True,
+        'status': 'queued',
+        'jobId': job_id,
+        'statusUrl': url_for('notify.notify_job_status', job_id=job_id)
+    }), 202
+
+@bp.route('/notify-telegram', methods=['POST'])
 def notify_user():
     """
     Enhanced notification endpoint:
@@ -66,30 +177,41 @@ def notify_user():
       "message": "✅ Protection complete! TX: d1f2a...",
       "txHash": "d1f2a3b4c5e6f7890123456789abcdef",
       "positionId": "high-risk-123",
-      "newHealth": 1.85
+      "newHealth": 1.85,
+      "async": false
     }
+
+    With "async": true (or ?async=1, or "Prefer: respond-async") the request
+    returns 202 Accepted with a jobId instead of waiting on Telegram.
     """
+    user_id = None
     try:
         data = request.json
-        
+
         # Validate required fields
         if not data or 'userId' not in data or 'message' not in data:
             return jsonify({
                 'success': False,
                 'error': 'Missing required fields: userId, message'
             }), 400
-        
+
         user_id = data['userId']
         message = data.get('message', '')
         tx_hash = data.get('txHash')
         position_id = data.get('positionId')
         new_health = data.get('newHealth')
-        
+        actions = data.get('actions')
+        runner = get_background_loop()
+
         logger.info(f"Sending notification to user {user_id} for position {position_id}")
-        
+
         # Use enhanced notification if we have all required data
         if tx_hash and position_id and new_health:
-            success = notify_success(user_id, tx_hash, position_id, new_health)
+            if _wants_async(data):
+                return _accepted(runner.submit_job(
+                    notify_success_async(user_id, tx_hash, position_id, new_health, actions)))
+
+            success = notify_success(user_id, tx_hash, position_id, new_health, actions)
             if success:
                 return jsonify({
                     'success': True,
@@ -103,72 +225,122 @@ def notify_user():
                     'success': False,
                     'error': 'Failed to send enhanced notification'
                 }), 500
-        
+
         # Fallback to basic notification
-        # Create keyboard with TX explorer link if hash provided
-        keyboard = []
-        if tx_hash:
-            keyboard.append([
-                InlineKeyboardButton(
-                    "🔍 View Transaction", 
-                    url=f"https://stellar.expert/explorer/testnet/tx/{tx_hash}"
-                )
-            ])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
-        
-        # Send notification using asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(
-                bot.send_message(
-                    chat_id=user_id,
-                    text=message,
-                    parse_mode='Markdown',
-                    reply_markup=reply_markup
-                )
-            )
-            
-            logger.info(f"Notification sent successfully to {user_id}")
-            return jsonify({
-                'success': True,
-                'message': 'Notification sent successfully',
-                'chatId': user_id,
-                'messageId': result.message_id,
-                'txHash': tx_hash
-            })
-            
-        finally:
-            loop.close()
-        
+        if _wants_async(data):
+            return _accepted(runner.submit_job(notify_basic_async(user_id, message, tx_hash)))
+
+        result = runner.run(notify_basic_async(user_id, message, tx_hash), timeout=NOTIFY_SEND_TIMEOUT)
+
+        logger.info(f"Notification sent successfully to {user_id}")
+        return jsonify({
+            'success': True,
+            'message': 'Notification sent successfully',
+            'chatId': user_id,
+            'messageId': result['messageId'],
+            'txHash': tx_hash
+        })
+
     except Exception as e:
         error_msg = str(e)
         logger.error(f"Failed to send notification: {error_msg}")
-        
+
         # Handle common Telegram errors
-        if "Chat not found" in error_msg or "Forbidden" in error_msg:
-            return jsonify({
-                'success': False,
-                'error': 'Chat not found',
-                'details': f'User {user_id} not found in Telegram or bot blocked'
-            }), 500
-        
+        return jsonify(dict(telegram_error_details(user_id, error_msg), success=False)), 500
+
+@bp.route('/notify-telegram/bulk', methods=['POST'])
+def notify_bulk():
+    """
+    Bulk notification endpoint:
+    POST /notify-telegram/bulk
+    {
+      "notifications": [
+        {"userId": "5678", "txHash": "d1f2a...", "positionId": "XLM-123", "newHealth": 1.85,
+         "actions": [{"action_type": "Repay", "amount": 500, "asset_id": "USDC"}]},
+        {"userId": "9012", "message": "✅ Protection complete!"}
+      ]
+    }
+
+    Items are sent concurrently and each gets its own result, in request order;
+    each send is bounded by NOTIFY_SEND_TIMEOUT. With ?stream=1 (or "Accept: application/x-ndjson") results are streamed as
+    NDJSON lines in completion order, followed by a summary line.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('notifications') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({
+            'success': False,
+            'error': 'Expected a non-empty "notifications" array'
+        }), 400
+    if len(items) > NOTIFY_BULK_MAX_ITEMS:
         return jsonify({
             'success': False,
-            'error': 'Failed to send notification',
-            'details': error_msg
-        }), 500
+            'error': f'Too many notifications (max {NOTIFY_BULK_MAX_ITEMS})'
+        }), 413
+
+    logger.info(f"Sending {len(items)} bulk notifications")
+    slots = asyncio.Semaphore(NOTIFY_BULK_CONCURRENCY)
+    sends = (notify_item_async(index, item, slots) for index, item in enumerate(items))
+
+    def summary(results):
+        sent = sum(1 for result in results if result['success'])
+        return {'total': len(items), 'sent': sent, 'failed': len(items) - sent}
+
+    if _wants_stream():
+        def generate():
+            results = []
+            for future in get_background_loop().as_completed(sends):
+                if future.cancelled():
+                    continue
+                result = future.result()
+                results.append(result)
+                yield json.dumps(result) + "\n"
+            reported = {result['index'] for result in results}
+            for index, item in enumerate(items):
+                if index not in reported:
+                    result = bulk_not_sent(index, item)
+                    results.append(result)
+                    yield json.dumps(result) + "\n"
+            yield json.dumps(dict(summary(results), done=True)) + "\n"
 
-@app.route('/health', methods=['GET'])
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    results = {}
+    for future in get_background_loop().as_completed(sends):
+        if not future.cancelled():
+            result = future.result()
+            results[result['index']] = result
+    results = [results.get(index) or bulk_not_sent(index, item) for index, item in enumerate(items)]
+    counts = summary(results)
+    return jsonify(dict(counts, success=counts['failed'] == 0, results=results))
+
+@bp.route('/notify-jobs/<job_id>', methods=['GET'])
+def notify_job_status(job_id):
+    """Status of a notification accepted with 202"""
+    job = get_background_loop().job(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify({
+        'success': job['status'] != 'failed',
+        'jobId': job_id,
+        'status': job['status'],
+        'result': job.get('result'),
+        'error': job.get('error')
+    })
+
+@bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'service': 'BlendGuard Notification API',
-        'telegram_configured': bool(TELEGRAM_TOKEN)
+        'telegram_configured': bool(TELEGRAM_TOKEN),
+        'dispatcher': get_dispatcher().stats()
     })
 
+# Standalone app serving the blueprint at the root, as before
+app = Flask(__name__)
+app.register_blueprint(bp)
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, debug=True) 
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Telegram Webhook API for BlendGuard
+Handles POST /telegram/webhook deliveries from Telegram
+"""
+import os
+import atexit
+import logging
+from flask import Blueprint, request, jsonify
+from async_runner import get_background_loop
+from telegram_webhook import SECRET_HEADER, TelegramWebhook
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upper bound on handing an update to the processor (not on handling it)
+WEBHOOK_SUBMIT_TIMEOUT = float(os.getenv("WEBHOOK_SUBMIT_TIMEOUT", "5"))
+
+bp = Blueprint('webhook', __name__)
+
+# Handlers run on the shared background loop, concurrently with notification sends
+webhook = TelegramWebhook()
+
+@atexit.register
+def _stop_webhook():
+    # Registered after api.notify's hook, so it runs before the loop stops
+    if webhook.application is not None:
+        try:
+            get_background_loop().run(webhook.stop(), timeout=5)
+        except Exception as e:
+            logger.error(f"Failed to stop webhook processor: {str(e)}")
+
+@bp.route('/telegram/webhook', methods=['POST'])
+def telegram_webhook():
+    """
+    Telegram update delivery:
+    POST /telegram/webhook
+    X-Telegram-Bot-Api-Secret-Token: <TELEGRAM_WEBHOOK_SECRET>
+    {"update_id": 1, "message": {...}}
+
+    Updates are queued and acknowledged immediately; handlers reply to the
+    user asynchronously.
+    """
+    if not webhook.verify(request.headers.get(SECRET_HEADER)):
+        return jsonify({'ok': False, 'error': 'Invalid secret token'}), 403
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or 'update_id' not in payload:
+        return jsonify({'ok': False, 'error': 'Expected a Telegram update'}), 400
+
+    try:
+        update_id = get_background_loop().run(webhook.submit(payload), timeout=WEBHOOK_SUBMIT_TIMEOUT)
+    except Exception as e:
+        # A non-2xx makes Telegram redeliver the update later
+        logger.error(f"Failed to queue Telegram update {payload.get('update_id')}: {str(e)}")
+        return jsonify({'ok': False, 'error': 'Failed to queue update'}), 503
+
+    return jsonify({'ok': True, 'updateId': update_id})
+
+@bp.route('/telegram/webhook/health', methods=['GET'])
+def webhook_health():
+    """Webhook processor status"""
+    return jsonify({'status': 'healthy', 'webhook': webhook.stats()})
@@ -8,6 +8,7 @@ import logging
 from flask import Flask
 from flask_cors import CORS
 from api.notify import bp as notify_bp
+from api.webhook import bp as webhook_bp
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,6 +21,7 @@ def create_app():
     
     # Register blueprints
     app.register_blueprint(notify_bp, url_prefix='/api')
+    app.register_blueprint(webhook_bp, url_prefix='/api')
     
     @app.route('/health', methods=['GET'])
     def health_check():
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+BlendGuard Backend API - ASGI serving mode
+Serves the same routes as app.create_app, but handlers await Telegram sends on
+the server's own event loop instead of blocking a worker thread per request.
+
+Run with:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5001 [--workers N]
+"""
+import os
+import json
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from async_runner import jobs
+from telegram_client import shutdown as shutdown_telegram_client
+from telegram_dispatcher import get_dispatcher
+from telegram_webhook import SECRET_HEADER, TelegramWebhook
+from api.notify import (
+    NOTIFY_BULK_CONCURRENCY,
+    NOTIFY_BULK_MAX_ITEMS,
+    NOTIFY_SEND_TIMEOUT,
+    TELEGRAM_TOKEN,
+    bulk_not_sent,
+    notify_basic_async,
+    notify_item_async,
+    notify_success_async,
+    telegram_error_details,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fire-and-track sends, kept referenced until they finish
+_background_tasks = set()
+
+# Handlers run on this server's loop; each worker process has its own
+webhook = TelegramWebhook()
+
+async def _json_body(request: Request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+def _wants_async(request: Request, data):
+    """Clients opt into 202 responses via body, query string or Prefer header"""
+    if data.get('async') is True:
+        return True
+    if request.query_params.get('async', '').lower() in ('1', 'true'):
+        return True
+    return 'respond-async' in request.headers.get('prefer', '')
+
+def _wants_stream(request: Request):
+    """NDJSON streaming via ?stream=1 or Accept: application/x-ndjson"""
+    if request.query_params.get('stream', '').lower() in ('1', 'true'):
+        return True
+    return 'application/x-ndjson' in request.headers.get('accept', '')
+
+def _accepted(request: Request, coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    job_id = jobs.track(task)
+    return JSONResponse({
+        'success': True,
+        'status': 'queued',
+        'jobId': job_id,
+        'statusUrl': request.app.url_path_for('notify_job_status', job_id=job_id)
+    }, status_code=202)
+
+async def notify_user(request: Request):
+    """POST /api/notify-telegram - same contract as the Flask endpoint"""
+    user_id = None
+    try:
+        data = await _json_body(request)
+
+        # Validate required fields
+        if not data or 'userId' not in data or 'message' not in data:
+            return JSONResponse({
+                'success': False,
+                'error': 'Missing required fields: userId, message'
+            }, status_code=400)
+
+        user_id = data['userId']
+        message = data.get('message', '')
+        tx_hash = data.get('txHash')
+        position_id = data.get('positionId')
+        new_health = data.get('newHealth')
+        actions = data.get('actions')
+
+        logger.info(f"Sending notification to user {user_id} for position {position_id}")
+
+        # Use enhanced notification if we have all required data
+        if tx_hash and position_id and new_health:
+            send = notify_success_async(user_id, tx_hash, position_id, new_health, actions)
+            if _wants_async(request, data):
+                return _accepted(request, send)
+            try:
+                await asyncio.wait_for(send, NOTIFY_SEND_TIMEOUT)
+            except Exception as e:
+                logger.error(f"Failed to notify success: {str(e)}")
+                return JSONResponse({
+                    'success': False,
+                    'error': 'Failed to send enhanced notification'
+                }, status_code=500)
+            return JSONResponse({
+                'success': True,
+                'message': 'Enhanced notification sent successfully',
+                'chatId': user_id,
+                'txHash': tx_hash,
+                'newHealth': new_health
+            })
+
+        # Fallback to basic notification
+        send = notify_basic_async(user_id, message, tx_hash)
+        if _wants_async(request, data):
+            return _accepted(request, send)
+        result = await asyncio.wait_for(send, NOTIFY_SEND_TIMEOUT)
+
+        logger.info(f"Notification sent successfully to {user_id}")
+        return JSONResponse({
+            'success': True,
+            'message': 'Notification sent successfully',
+            'chatId': user_id,
+            'messageId': result['messageId'],
+            'txHash': tx_hash
+        })
+
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"Failed to send notification: {error_msg}")
+        return JSONResponse(dict(telegram_error_details(user_id, error_msg), success=False), status_code=500)
+
+async def notify_bulk(request: Request):
+    """POST /api/notify-telegram/bulk - same contract as the Flask endpoint"""
+    data = await _json_body(request)
+    items = data.get('notifications') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return JSONResponse({
+            'success': False,
+            'error': 'Expected a non-empty "notifications" array'
+        }, status_code=400)
+    if len(items) > NOTIFY_BULK_MAX_ITEMS:
+        return JSONResponse({
+            'success': False,
+            'error': f'Too many notifications (max {NOTIFY_BULK_MAX_ITEMS})'
+        }, status_code=413)
+
+    logger.info(f"Sending {len(items)} bulk notifications")
+    slots = asyncio.Semaphore(NOTIFY_BULK_CONCURRENCY)
+    tasks = [asyncio.create_task(notify_item_async(index, item, slots)) for index, item in enumerate(items)]
+
+    def summary(results):
+        sent = sum(1 for result in results if result['success'])
+        return {'total': len(items), 'sent': sent, 'failed': len(items) - sent}
+
+    if _wants_stream(request):
+        async def generate():
+            results = []
+            pending = set(tasks)
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if not task.cancelled():
+                            results.append(task.result())
+                            yield json.dumps(results[-1]) + "\n"
+                reported = {result['index'] for result in results}
+                for index, item in enumerate(items):
+                    if index not in reported:
+                        results.append(bulk_not_sent(index, item))
+                        yield json.dumps(results[-1]) + "\n"
+                yield json.dumps(dict(summary(results), done=True)) + "\n"
+            finally:
+                # Client went away: stop sending the rest
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(generate(), media_type='application/x-ndjson')
+
+    # Each send is bounded by NOTIFY_SEND_TIMEOUT inside notify_item_async
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    results = [result if isinstance(result, dict) else bulk_not_sent(index, item)
+               for index, (item, result) in enumerate(zip(items, results))]
+    counts = summary(results)
+    return JSONResponse(dict(counts, success=counts['failed'] == 0, results=list(results)))
+
+async def notify_job_status(request: Request):
+    """Status of a notification accepted with 202"""
+    job_id = request.path_params['job_id']
+    job = jobs.get(job_id)
+    if not job:
+        return JSONResponse({'success': False, 'error': 'Unknown job'}, status_code=404)
+    return JSONResponse({
+        'success': job['status'] != 'failed',
+        'jobId': job_id,
+        'status': job['status'],
+        'result': job.get('result'),
+        'error': job.get('error')
+    })
+
+async def notify_health(request: Request):
+    """Health check endpoint"""
+    return JSONResponse({
+        'status': 'healthy',
+        'service': 'BlendGuard Notification API',
+        'telegram_configured': bool(TELEGRAM_TOKEN),
+        'dispatcher': get_dispatcher().stats()
+    })
+
+async def telegram_webhook(request: Request):
+    """POST /api/telegram/webhook - same contract as the Flask endpoint"""
+    if not webhook.verify(request.headers.get(SECRET_HEADER)):
+        return JSONResponse({'ok': False, 'error': 'Invalid secret token'}, status_code=403)
+
+    payload = await _json_body(request)
+    if not isinstance(payload, dict) or 'update_id' not in payload:
+        return JSONResponse({'ok': False, 'error': 'Expected a Telegram update'}, status_code=400)
+
+    try:
+        update_id = await webhook.submit(payload)
+    except Exception as e:
+        # A non-2xx makes Telegram redeliver the update later
+        logger.error(f"Failed to queue Telegram update {payload.get('update_id')}: {str(e)}")
+        return JSONResponse({'ok': False, 'error': 'Failed to queue update'}, status_code=503)
+
+    return JSONResponse({'ok': True, 'updateId': update_id})
+
+async def webhook_health(request: Request):
+    """Webhook processor status"""
+    return JSONResponse({'status': 'healthy', 'webhook': webhook.stats()})
+
+async def health_check(request: Request):
+    """Health check endpoint"""
+    return JSONResponse({'status': 'healthy', 'service': 'blendguard-backend'})
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await webhook.stop()
+    # Close the pooled Telegram connections owned by this loop
+    await shutdown_telegram_client()
+
+def create_asgi_app():
+    """Create the ASGI application"""
+    routes = [
+        Route('/api/notify-telegram', notify_user, methods=['POST']),
+        Route('/api/notify-telegram/bulk', notify_bulk, methods=['POST']),
+        Route('/api/notify-jobs/{job_id}', notify_job_status, methods=['GET']),
+        Route('/api/health', notify_health, methods=['GET']),
+        Route('/api/telegram/webhook', telegram_webhook, methods=['POST']),
+        Route('/api/telegram/webhook/health', webhook_health, methods=['GET']),
+        Route('/health', health_check, methods=['GET']),
+    ]
+    # Enable CORS for frontend requests
+    middleware = [Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])]
+    return Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
+
+app = create_asgi_app()
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 5001))
+    host = os.environ.get('HOST', '0.0.0.0')
+    workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+    logger.info(f"Starting BlendGuard Backend API (ASGI) on {host}:{port}")
+    uvicorn.run('asgi_app:app', host=host, port=port, workers=workers)
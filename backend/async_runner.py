@@ -0,0 +1,144 @@
+"""
+Background asyncio loop for synchronous (Flask) code
+Runs one long-lived event loop in a daemon thread that request handlers submit
+coroutines to, instead of creating and closing a loop per request.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from concurrent.futures import as_completed as futures_as_completed
+from typing import Any, Coroutine, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_HISTORY_LIMIT = int(os.getenv("ASYNC_JOB_HISTORY_LIMIT", "10000"))
+
+
+class JobRegistry:
+    """Bounded, thread-safe record of fire-and-track jobs keyed by id"""
+
+    def __init__(self, limit: int = JOB_HISTORY_LIMIT):
+        self.limit = limit
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def track(self, future) -> str:
+        """Record a concurrent or asyncio future and return its job id"""
+        job_id = uuid.uuid4().hex
+        job = {'id': job_id, 'status': 'pending', 'submitted_at': time.time()}
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.limit:
+                self._jobs.popitem(last=False)
+
+        def finished(future):
+            job['finished_at'] = time.time()
+            try:
+                job['result'] = future.result()
+                job['status'] = 'done'
+            except BaseException as e:
+                job['status'] = 'failed'
+                job['error'] = str(e) or type(e).__name__
+                logger.error(f"Background job {job_id} failed: {job['error']}")
+
+        future.add_done_callback(finished)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+
+# Shared so job ids resolve regardless of which serving mode accepted them
+jobs = JobRegistry()
+
+
+class BackgroundLoop:
+    """An event loop running forever in its own thread"""
+
+    def __init__(self, name: str = "blendguard-async"):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._started.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                self._started.wait()
+        return self.loop
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule ``coro`` on the background loop and return a thread-safe future"""
+        loop = self.start()
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run ``coro`` on the background loop and block until it finishes (cancelling it on timeout)"""
+        if self._thread is threading.current_thread():
+            coro.close()
+            raise RuntimeError("BackgroundLoop.run() called from the loop's own thread would deadlock")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def as_completed(self, coros: Iterable[Coroutine], timeout: Optional[float] = None) -> Iterator[Future]:
+        """Schedule all ``coros`` together and yield their futures as each one finishes"""
+        futures = [self.submit(coro) for coro in coros]
+        try:
+            yield from futures_as_completed(futures, timeout)
+        finally:
+            # A consumer that stops early (e.g. a dropped stream) cancels the rest
+            for future in futures:
+                future.cancel()
+
+    def submit_job(self, coro: Coroutine) -> str:
+        """Fire-and-track: schedule ``coro`` and return a job id for status lookups"""
+        return jobs.track(self.submit(coro))
+
+    def job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return jobs.get(job_id)
+
+    def stop(self, shutdown: Optional[Coroutine] = None, timeout: float = 5.0):
+        """Stop the loop, first running an optional ``shutdown`` coroutine on it"""
+        if self.loop is None or self._thread is None or not self._thread.is_alive():
+            return
+        if shutdown is not None:
+            try:
+                self.run(shutdown, timeout)
+            except Exception as e:
+                logger.error(f"Background loop shutdown hook failed: {str(e)}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+
+
+_background_loop = BackgroundLoop()
+
+
+def get_background_loop() -> BackgroundLoop:
+    """Return the process-wide background loop, starting it if needed"""
+    _background_loop.start()
+    return _background_loop
@@ -0,0 +1,403 @@
+"""
+Historical Replay and Backtesting for BlendGuard
+Replays recorded market and position snapshots through the live scoring path
+(MarketFeed features, PositionStore risk metrics, batch LiquidationPredictor
+scoring and the position monitor's alert decision at each threshold) as fast
+as the recording can be read, then grades the alerts against the liquidations
+that actually happened:
+
+    precision      share of alerted positions that were later liquidated
+    recall         share of liquidated positions alerted before liquidation
+    time_to_alert  event-time lead from first alert to liquidation
+    events/sec     wall-clock replay throughput, the risk-engine regression benchmark
+
+Recordings are NDJSON, CSV or Parquet files holding market_feed events plus:
+    {"type": "position", "id": "p1", "user": "42", "asset": "XLM", "pool": "XLM-LENDING",
+     "collateral_amount": 1200.0, "debt": 90.0, "collateral_factor": 0.75, "ts": 1718000000.0}
+    {"type": "liquidation", "id": "p1", "ts": 1718000042.0}
+
+Events must be in timestamp order. Positions are scored once their asset has a
+price and their pool a utilization. Unless --labels-only is given, a position
+also counts as liquidated when its replayed health factor first drops below 1.0.
+"""
+import os
+import csv
+import json
+import math
+import mmap
+import time
+import logging
+import argparse
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+import numpy as np
+
+from market_feed import MARKET_PUBLISH_INTERVAL, MarketFeed, paced, parse_lines, store_sink
+from position_monitor import alert_crossings
+from position_store import PositionStore
+from risk_engine import DEFAULT_CHUNK_SIZE, ENGINES, LiquidationPredictor
+
+logger = logging.getLogger(__name__)
+
+# Risk scores graded as alerts: the /status yellow, protect and red levels
+BACKTEST_THRESHOLDS = tuple(float(t) for t in os.getenv("BACKTEST_THRESHOLDS", "0.6,0.7,0.8").split(','))
+# Collateral factor for positions recorded without one
+BACKTEST_COLLATERAL_FACTOR = float(os.getenv("BACKTEST_COLLATERAL_FACTOR", "0.75"))
+# Rows per batch when reading Parquet recordings
+PARQUET_BATCH_ROWS = 65536
+
+
+# Sources
+
+def _mapped_lines(path: str) -> Iterator[bytes]:
+    """Lines of a file read through a read-only memory map"""
+    with open(path, 'rb') as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, 'madvise'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            yield from iter(mapped.readline, b'')
+
+
+def ndjson_events(path: str) -> Iterator[Dict[str, Any]]:
+    return parse_lines(_mapped_lines(path))
+
+
+def csv_events(path: str) -> Iterator[Dict[str, Any]]:
+    """CSV rows as events; empty cells are dropped so they read as missing fields"""
+    for row in csv.DictReader(line.decode('utf-8') for line in _mapped_lines(path)):
+        yield {key: value for key, value in row.items() if value != ''}
+
+
+def parquet_events(path: str, batch_rows: int = PARQUET_BATCH_ROWS) -> Iterator[Dict[str, Any]]:
+    """Parquet rows as events, memory-mapped and decoded one batch at a time"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Replaying Parquet recordings requires pyarrow (pip install pyarrow)") from None
+    for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=batch_rows):
+        for row in batch.to_pylist():
+            yield {key: value for key, value in row.items() if value is not None}
+
+
+def recording_source(path: str, speed: float = 0.0) -> Iterator[Dict[str, Any]]:
+    """Events from a recording, picking the reader by extension"""
+    if path.endswith('.parquet'):
+        events = parquet_events(path)
+    elif path.endswith('.csv'):
+        events = csv_events(path)
+    else:
+        events = ndjson_events(path)
+    return paced(events, speed)
+
+
+def synthetic_crash(positions: int = 10_000, ticks: int = 200_000, assets: int = 5, pools: int = 3,
+                    drawdown: float = 0.35, seed: int = 0, start_ts: float = 0.0,
+                    tick: float = 0.01) -> Iterator[Dict[str, Any]]:
+    """A recording of a crash: calm prices, a ``drawdown`` fall over the middle third, then a calm tail.
+
+    Every asset but the last crashes; pool utilization climbs while it does.
+    """
+    rng = np.random.default_rng(seed)
+    factor = BACKTEST_COLLATERAL_FACTOR
+    health = rng.uniform(1.05, 3.0, size=positions).tolist()
+    amounts = rng.uniform(100.0, 10_000.0, size=positions).tolist()
+    for i, (hf, amount) in enumerate(zip(health, amounts)):
+        yield {'type': 'position', 'id': f"bt-{i}", 'user': str(i % 1000), 'asset': f"ASSET{i % assets}",
+               'pool': f"POOL{i % pools}", 'collateral_amount': amount, 'debt': amount * factor / hf,
+               'collateral_factor': factor, 'ts': start_ts}
+
+    crash_start, crash_end = ticks // 3, 2 * ticks // 3
+    # Each tick moves one asset, so an asset sees about 1/assets of the crash window
+    drift = math.log(1.0 - drawdown) / max(1, (crash_end - crash_start) / assets)
+    prices = np.ones(assets)
+    picks = rng.integers(0, assets, size=ticks).tolist()
+    noise = rng.normal(0.0, 0.002, size=ticks).tolist()
+    calm = rng.uniform(0.4, 0.7, size=ticks).tolist()
+    for i, (asset, shock) in enumerate(zip(picks, noise)):
+        ts = start_ts + (i + 1) * tick
+        crashing = crash_start <= i < crash_end
+        if i % 20 == 19:
+            utilization = calm[i] + (0.3 * (i - crash_start) / (crash_end - crash_start) if crashing else 0.0)
+            yield {'type': 'pool', 'pool': f"POOL{i % pools}", 'utilization': min(utilization, 0.99), 'ts': ts}
+            continue
+        if crashing and asset != assets - 1:
+            shock += drift
+        prices[asset] *= math.exp(shock)
+        yield {'type': 'price', 'asset': f"ASSET{asset}", 'price': float(prices[asset]), 'ts': ts}
+
+
+# Replay
+
+class Backtest:
+    """Replays a recording and records, per threshold, when each position was first alerted"""
+
+    def __init__(self, predictor: LiquidationPredictor, thresholds: Sequence[float] = BACKTEST_THRESHOLDS,
+                 publish_interval: float = MARKET_PUBLISH_INTERVAL, derive_liquidations: bool = True,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.predictor = predictor
+        self.thresholds = np.array(sorted(thresholds), dtype=np.float64)
+        self.publish_interval = publish_interval
+        self.derive_liquidations = derive_liquidations
+        self.chunk_size = chunk_size
+        self.store = PositionStore()
+        self.feed = MarketFeed(publish_interval)
+        self.feed.subscribe(store_sink(self.store))
+        self.feed.subscribe(self._on_features)
+        self.prices: Dict[str, float] = {}
+        self.factors: Dict[str, float] = {}
+        # Event time of each row's first alert per threshold, and of its liquidation (NaN = never)
+        self._first_alert = np.full((len(self.thresholds), 0), np.nan)
+        # Per threshold: rows currently alerted (silent until they fall back below), and alerts raised
+        self._alerted = np.zeros((len(self.thresholds), 0), dtype=bool)
+        self._alerts_raised = np.zeros(len(self.thresholds), dtype=np.int64)
+        self._liquidated_at = np.full(0, np.nan)
+        self._touched: Set[int] = set()
+        self._now = 0.0
+        self._started_at: Optional[float] = None
+        self._batch_seconds: List[float] = []
+        self.stats = {'events': 0, 'positions': 0, 'liquidation_events': 0, 'rejected': 0,
+                      'scored': 0, 'batches': 0, 'score_seconds': 0.0, 'wall_seconds': 0.0}
+
+    def run(self, events: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Replay every event, then return report()"""
+        stats = self.stats
+        process_market = self.feed.process
+        last_flush = None
+        started = time.perf_counter()
+        for event in events:
+            stats['events'] += 1
+            ts = event.get('ts')
+            if ts not in (None, ''):
+                self._now = float(ts)
+                if self._started_at is None:
+                    self._started_at = self._now
+            kind = event.get('type')
+            if kind == 'position':
+                self._on_position(event)
+            elif kind == 'liquidation':
+                self._on_liquidation(event)
+            else:
+                # The feed counts the events it rejects
+                process_market(event)
+            # Positions not covered by a market publish are scored on the same cadence
+            if self._touched:
+                if last_flush is None:
+                    last_flush = self._now
+                elif self._now - last_flush >= self.publish_interval:
+                    self.flush()
+                    last_flush = self._now
+        self.flush()
+        stats['wall_seconds'] += time.perf_counter() - started
+        return self.report()
+
+    def flush(self):
+        """Score everything changed since the last batch"""
+        self.feed.publish()
+        if self._touched:
+            self._rescore(np.array(sorted(self._touched), dtype=np.intp))
+            self._touched.clear()
+
+    def _on_position(self, event: Dict[str, Any]):
+        try:
+            position_id = str(event['id'])
+            asset, pool = str(event['asset']), str(event['pool'])
+            values = {'collateral_amount': float(event['collateral_amount']), 'debt': float(event['debt'])}
+            factor = event.get('collateral_factor')
+        except (KeyError, TypeError, ValueError) as e:
+            self.stats['rejected'] += 1
+            logger.debug(f"Rejected position event {event!r}: {str(e)}")
+            return
+        self.factors[asset] = float(factor) if factor is not None else self.factors.get(
+            asset, BACKTEST_COLLATERAL_FACTOR)
+        # Market features published before this position appeared
+        estimator = self.feed.assets.get(asset)
+        if estimator is not None:
+            values['asset_volatility'] = estimator.volatility
+            values['trend'] = estimator.trend
+        if pool in self.feed.pools:
+            values['pool_utilization'] = self.feed.pools[pool]
+        user_id = event.get('user')
+        if self.store.row_of(position_id) is None:
+            self.stats['positions'] += 1
+        row = self.store.upsert(position_id, str(user_id) if user_id is not None else None, asset=asset,
+                                pool=pool, status='active', **values)
+        if row >= len(self._liquidated_at):
+            self._grow(row + 1)
+        self._touched.add(row)
+
+    def _on_liquidation(self, event: Dict[str, Any]):
+        row = self.store.row_of(str(event.get('id')))
+        if row is None:
+            self.stats['rejected'] += 1
+            return
+        self.stats['liquidation_events'] += 1
+        if math.isnan(self._liquidated_at[row]):
+            self._liquidated_at[row] = self._now
+
+    def _on_features(self, update: Dict[str, Any]):
+        for asset, features in update['assets'].items():
+            self.prices[asset] = features['price']
+        store = self.store
+        rows = [store.rows_for_asset(asset) for asset in update['assets']]
+        rows += [store.rows_for_pool(pool) for pool in update['pools']]
+        rows.append(np.fromiter(self._touched, dtype=np.intp, count=len(self._touched)))
+        self._touched.clear()
+        rows = np.unique(np.concatenate(rows))
+        if rows.size:
+            self._rescore(rows)
+
+    def _rescore(self, rows: np.ndarray):
+        """The live path for one batch: risk metrics, model scores, alert decisions"""
+        started = time.perf_counter()
+        # Liquidated positions are closed; they are neither re-scored nor alerted on again
+        rows = rows[np.isnan(self._liquidated_at[rows])]
+        if not rows.size:
+            return
+        store, now = self.store, self._now
+        metrics = store.refresh_risk_metrics(self.prices, self.factors, rows)
+        if self.derive_liquidations:
+            underwater = metrics['health_factor'] < 1.0
+            if underwater.any():
+                self._liquidated_at[rows[underwater]] = now
+                rows = rows[~underwater]
+
+        features = store.features(rows)
+        rows = rows[~np.isnan(features).any(axis=1)]
+        if rows.size:
+            scores = store.score(self.predictor, rows, chunk_size=self.chunk_size)
+            # The monitor's decision, as if it ran with each threshold
+            for index, threshold in enumerate(self.thresholds.tolist()):
+                crossed, self._alerted[index, rows] = alert_crossings(scores, threshold, self._alerted[index, rows])
+                first = self._first_alert[index, rows]
+                self._first_alert[index, rows] = np.where(crossed & np.isnan(first), now, first)
+                self._alerts_raised[index] += int(crossed.sum())
+            self.stats['scored'] += rows.size
+
+        elapsed = time.perf_counter() - started
+        self.stats['batches'] += 1
+        self.stats['score_seconds'] += elapsed
+        self._batch_seconds.append(elapsed)
+
+    def _grow(self, size: int):
+        capacity = max(size, 2 * len(self._liquidated_at), 1024)
+        liquidated = np.full(capacity, np.nan)
+        liquidated[:len(self._liquidated_at)] = self._liquidated_at
+        first_alert = np.full((len(self.thresholds), capacity), np.nan)
+        first_alert[:, :self._first_alert.shape[1]] = self._first_alert
+        alerted = np.zeros((len(self.thresholds), capacity), dtype=bool)
+        alerted[:, :self._alerted.shape[1]] = self._alerted
+        self._liquidated_at, self._first_alert, self._alerted = liquidated, first_alert, alerted
+
+    def report(self) -> Dict[str, Any]:
+        n = self.store.size
+        liquidated_at = self._liquidated_at[:n]
+        liquidated = ~np.isnan(liquidated_at)
+        thresholds = {}
+        for index, (threshold, alert_at) in enumerate(zip(self.thresholds.tolist(), self._first_alert[:, :n])):
+            alerted = ~np.isnan(alert_at)
+            early = alerted & liquidated & (alert_at < liquidated_at)
+            tp = int(early.sum())
+            fp = int((alerted & ~liquidated).sum())
+            fn = int((liquidated & ~early).sum())
+            lead = (liquidated_at - alert_at)[early]
+            thresholds[f"{threshold:g}"] = {
+                'alerted_positions': int(alerted.sum()),
+                # Includes re-alerts after a score dipped below and rose again
+                'alerts': int(self._alerts_raised[index]),
+                'true_positives': tp,
+                'false_positives': fp,
+                'false_negatives': fn,
+                'precision': tp / (tp + fp) if tp + fp else None,
+                'recall': tp / (tp + fn) if tp + fn else None,
+                'time_to_alert': {
+                    'mean_seconds': float(lead.mean()) if lead.size else None,
+                    'p50_seconds': float(np.percentile(lead, 50)) if lead.size else None,
+                    'p10_seconds': float(np.percentile(lead, 10)) if lead.size else None,
+                },
+            }
+
+        stats = self.stats
+        batches = np.array(self._batch_seconds) if self._batch_seconds else np.zeros(1)
+        wall = stats['wall_seconds']
+        replayed = self._now - self._started_at if self._started_at is not None else 0.0
+        return {
+            'events': stats['events'],
+            'rejected': stats['rejected'] + self.feed.stats['rejected'],
+            'positions': n,
+            'liquidated': int(liquidated.sum()),
+            'thresholds': thresholds,
+            'wall_seconds': wall,
+            'events_per_second': stats['events'] / wall if wall else 0.0,
+            'replayed_seconds': replayed,
+            'speedup': replayed / wall if wall else 0.0,
+            'scored': stats['scored'],
+            'batches': stats['batches'],
+            'scores_per_second': stats['scored'] / stats['score_seconds'] if stats['score_seconds'] else 0.0,
+            'batch_p50_ms': float(np.percentile(batches, 50)) * 1000,
+            'batch_p99_ms': float(np.percentile(batches, 99)) * 1000,
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    def pct(value: Optional[float]) -> str:
+        return '-' if value is None else f"{value:.1%}"
+
+    def secs(value: Optional[float]) -> str:
+        return '-' if value is None else f"{value:.1f}s"
+
+    lines = [
+        f"{report['events']:,} events ({report['rejected']:,} rejected), {report['positions']:,} positions, "
+        f"{report['liquidated']:,} liquidated",
+        f"{report['wall_seconds']:.2f}s wall: {report['events_per_second']:,.0f} events/s, "
+        f"{report['speedup']:,.0f}x real time, {report['scores_per_second']:,.0f} scores/s, "
+        f"batch p50 {report['batch_p50_ms']:.2f}ms p99 {report['batch_p99_ms']:.2f}ms",
+        f"{'threshold':>9} {'alerted':>8} {'precision':>9} {'recall':>7} {'lead p50':>9} {'lead p10':>9}",
+    ]
+    for threshold, result in report['thresholds'].items():
+        lead = result['time_to_alert']
+        lines.append(f"{threshold:>9} {result['alerted_positions']:>8,} {pct(result['precision']):>9} "
+                     f"{pct(result['recall']):>7} {secs(lead['p50_seconds']):>9} {secs(lead['p10_seconds']):>9}")
+    return "\n".join(lines)
+
+
+def main():
+    """Backtest a recording, or benchmark the risk engine against a synthetic crash"""
+    parser = argparse.ArgumentParser(description="BlendGuard risk engine backtest")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--recording', help="NDJSON, CSV or Parquet recording to replay")
+    source.add_argument('--synthetic', type=int, metavar='TICKS', help="replay a synthetic crash of TICKS market events")
+    parser.add_argument('--positions', type=int, default=10_000, help="positions in the synthetic crash")
+    parser.add_argument('--record', metavar='PATH', help="with --synthetic, write the crash as NDJSON and exit")
+    parser.add_argument('--speed', type=float, default=0.0, help="replay speed multiplier (0 = as fast as possible)")
+    parser.add_argument('--thresholds', type=float, nargs='+', default=list(BACKTEST_THRESHOLDS))
+    parser.add_argument('--labels-only', action='store_true',
+                        help="count only recorded liquidation events, not health factors below 1.0")
+    parser.add_argument('--engine', default='sklearn', choices=ENGINES)
+    parser.add_argument('--model-path', default='model.pkl')
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.synthetic:
+        events = synthetic_crash(positions=args.positions, ticks=args.synthetic)
+        if args.record:
+            with open(args.record, 'w') as handle:
+                for event in events:
+                    handle.write(json.dumps(event) + "\n")
+            print(f"Wrote synthetic crash to {args.record}")
+            return
+        # Generated up front so the benchmark measures replay, not generation
+        events = paced(list(events), args.speed)
+    else:
+        events = recording_source(args.recording, speed=args.speed)
+
+    predictor = LiquidationPredictor(args.model_path, engine=args.engine, lazy=False)
+    backtest = Backtest(predictor, thresholds=args.thresholds, derive_liquidations=not args.labels_only)
+    report = backtest.run(events)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
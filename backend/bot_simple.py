@@ -10,6 +10,7 @@ from telegram import Update, Bot, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
 from config import TELEGRAM_TOKEN
 from alert_bot import get_user_positions, get_contract_info, generate_deeplink
+from message_templates import render_status
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -41,32 +42,8 @@ async def handle_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.message.from_user.id)
     positions = get_user_positions(user_id)
     
-    if not positions:
-        no_positions_message = """
-📊 **Position Status**
-
-No active lending positions found.
-
-Connect your wallet to start using Blend lending markets!
-"""
-        await update.message.reply_text(no_positions_message, parse_mode="Markdown")
-        return
-    
-    status_message = "📊 **Your Lending Positions**\n\n"
-    
-    keyboard = []
-    for position in positions:
-        risk_emoji = "🔴" if position['risk_score'] > 0.8 else "🟡" if position['risk_score'] > 0.6 else "🟢"
-        status_message += f"{risk_emoji} **{position['asset']}**: ${position['amount']:,}\n"
-        status_message += f"   Risk: {position['risk_score']:.0%} | Health: {position['health_factor']:.2f}\n\n"
-        
-        if position['risk_score'] > 0.7:  # High risk positions
-            keyboard.append([InlineKeyboardButton(
-                f"🛡️ Activate Protection - {position['asset']}", 
-                callback_data=f"protect_{position['id']}"
-            )])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
+    # Shared renderer, so positions with missing metrics show a placeholder instead of failing
+    status_message, reply_markup = render_status(positions)
     await update.message.reply_text(status_message, parse_mode="Markdown", reply_markup=reply_markup)
 
 async def handle_contract(update: Update, context: ContextTypes.DEFAULT_TYPE):
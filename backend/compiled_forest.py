@@ -0,0 +1,162 @@
+"""
+Compiled inference for the liquidation random forest
+Flattens a fitted sklearn forest into contiguous NumPy arrays and walks every
+tree at once with vectorized ops, keeping sklearn out of the scoring path.
+"""
+import os
+from array import array
+from typing import Optional
+
+import numpy as np
+
+PARITY_TOLERANCE = 1e-9
+# Arrays written by save() and mapped back by load()
+ARRAY_NAMES = ('feature', 'threshold', 'children', 'leaf_value', 'roots')
+# Rows walked per vectorized pass; keeps the per-level gather arrays cache-resident
+BLOCK_ROWS = 2048
+
+
+class CompiledForest:
+    """Array-backed random forest evaluator returning positive-class probabilities.
+
+    Nodes of all trees live in one flat index space and leaves point to
+    themselves, so a walk can stop as soon as every tree has reached a leaf.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray,
+                 leaf_value: np.ndarray, roots: np.ndarray, max_depth: int, n_features: int):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        # children[0] is the left child, children[1] the right child, flattened as
+        # children[go_right * n_nodes + node]
+        self.children = np.ascontiguousarray(children, dtype=np.intp)
+        self.leaf_value = np.ascontiguousarray(leaf_value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.n_nodes = self.feature.shape[0]
+        self.n_trees = self.roots.shape[0]
+        self._children_flat = self.children.reshape(-1)
+        self._is_leaf = self.children[0] == np.arange(self.n_nodes)
+        self._lists: Optional[tuple] = None
+
+    def _scalar_tables(self) -> tuple:
+        # Plain-list mirror of the arrays for the scalar path: indexing lists is
+        # far cheaper than dispatching NumPy calls for one row of ~100 trees.
+        # Built on first use so batch-only users (and mapped copies) skip it
+        if self._lists is None:
+            self._lists = (self.feature.tolist(), self.threshold.tolist(), self.children[0].tolist(),
+                           self.children[1].tolist(), self._is_leaf.tolist(), self.leaf_value.tolist(),
+                           self.roots.tolist())
+        return self._lists
+
+    def save(self, directory: str):
+        """Write the arrays as .npy files that load() can memory-map"""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        np.save(os.path.join(directory, 'shape.npy'), np.array([self.max_depth, self.n_features]))
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = 'r') -> 'CompiledForest':
+        """Forest over arrays mapped from save()'s files; processes mapping the same files share their pages"""
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in ARRAY_NAMES}
+        max_depth, n_features = np.load(os.path.join(directory, 'shape.npy')).tolist()
+        return cls(max_depth=max_depth, n_features=n_features, **arrays)
+
+    @classmethod
+    def from_sklearn(cls, model, positive_class=1, verify: bool = True) -> 'CompiledForest':
+        """Compile a fitted RandomForestClassifier (or any forest of DecisionTreeClassifiers)"""
+        classes = list(model.classes_)
+        column = classes.index(positive_class) if positive_class in classes else len(classes) - 1
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            local = np.arange(n)
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, local, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, local, tree.children_right) + offset)
+
+            counts = tree.value[:, 0, :]
+            totals = counts.sum(axis=1)
+            totals[totals == 0] = 1.0
+            values.append(counts[:, column] / totals)
+
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        compiled = cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.stack([np.concatenate(lefts), np.concatenate(rights)]),
+            leaf_value=np.concatenate(values),
+            roots=np.array(roots),
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+        )
+        if verify:
+            compiled.check_parity(model)
+        return compiled
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Positive-class probability for each row of an (n, n_features) matrix"""
+        # sklearn evaluates splits on float32 inputs; match it for bit-level parity
+        X = np.asarray(X, dtype=np.float32)
+        n = X.shape[0]
+        scores = np.empty(n, dtype=np.float64)
+        for start in range(0, n, BLOCK_ROWS):
+            stop = min(start + BLOCK_ROWS, n)
+            scores[start:stop] = self._predict_block(X[start:stop])
+        return scores
+
+    def _predict_block(self, X: np.ndarray) -> np.ndarray:
+        n = X.shape[0]
+        columns = np.ascontiguousarray(X.T).reshape(-1)
+        node = np.repeat(self.roots, n)
+        row = np.tile(np.arange(n, dtype=np.intp), self.n_trees)
+
+        # Only (tree, row) pairs that have not reached a leaf are walked further
+        active = np.arange(node.shape[0], dtype=np.intp)
+        for _ in range(self.max_depth):
+            current = node[active]
+            values = columns[self.feature[current] * n + row[active]]
+            following = self._children_flat[(values > self.threshold[current]) * self.n_nodes + current]
+            node[active] = following
+            active = active[~self._is_leaf[following]]
+            if active.shape[0] == 0:
+                break
+        return self.leaf_value[node].reshape(self.n_trees, n).mean(axis=0)
+
+    def predict_one(self, features) -> float:
+        """Score a single feature row without allocating NumPy temporaries"""
+        x = array('f', features)
+        feature, threshold, left, right, is_leaf, value, roots = self._scalar_tables()
+        total = 0.0
+        for node in roots:
+            while not is_leaf[node]:
+                node = right[node] if x[feature[node]] > threshold[node] else left[node]
+            total += value[node]
+        return total / self.n_trees
+
+    def check_parity(self, model, X: Optional[np.ndarray] = None, atol: float = PARITY_TOLERANCE) -> float:
+        """Compare against sklearn's predict_proba; raise ValueError past ``atol``"""
+        if X is None:
+            X = np.random.default_rng(0).normal(scale=2.0, size=(512, self.n_features))
+        classes = list(model.classes_)
+        column = classes.index(1) if 1 in classes else len(classes) - 1
+        expected = model.predict_proba(X)[:, column]
+        max_error = float(np.max(np.abs(self.predict_proba(X) - expected), initial=0.0))
+        scalar = np.array([self.predict_one(row) for row in X[:32]], dtype=np.float64)
+        max_error = max(max_error, float(np.max(np.abs(scalar - expected[:32]), initial=0.0)))
+        if max_error > atol:
+            raise ValueError(f"Compiled forest diverges from sklearn (max abs error {max_error:.3g})")
+        return max_error
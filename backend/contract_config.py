@@ -1,53 +1,121 @@
 """
 SafetyVault Contract Configuration
 Updated to use official Blend Protocol contracts and proper configuration
+
+Contract and network settings are read from config once into an immutable
+snapshot; lookups return read-only views of it. Call reload() after the
+config changes, or invalidate() to rebuild on next use.
 """
-from config import (
-    SAFETY_VAULT_CONTRACT_ID,
-    SAFETY_VAULT_WASM_HASH,
-    DEPLOYER_ADDRESS,
-    BLEND_CONTRACTS,
-    TOKEN_CONTRACTS,
-    CONTRACT_METADATA,
-    get_network_config
-)
+import time
+import logging
+import importlib
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_snapshot: Optional[Mapping[str, Any]] = None
+_snapshot_lock = threading.Lock()
+_load_stats = {'loads': 0, 'last_load_ms': 0.0, 'loaded_at': None}
+
+def _freeze(value: Any) -> Any:
+    """Read-only copy: dicts become mappingproxies, lists become tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _build_snapshot() -> Mapping[str, Any]:
+    blend = config.BLEND_CONTRACTS
+    tokens = _freeze(config.TOKEN_CONTRACTS)
+    return MappingProxyType({
+        'contract_id': config.SAFETY_VAULT_CONTRACT_ID,
+        'wasm_hash': config.SAFETY_VAULT_WASM_HASH,
+        'deployer': config.DEPLOYER_ADDRESS,
+        'contract_info': _freeze(config.CONTRACT_METADATA["safety_vault"]),
+        'network': _freeze(config.get_network_config()),
+        'tokens': tokens,
+        'all_contracts': MappingProxyType({
+            "safety_vault": config.SAFETY_VAULT_CONTRACT_ID,
+            "blend_pool": blend["TESTNET_POOL_V2"],
+            "blend_backstop": blend["BACKSTOP_V2"],
+            "blend_emitter": blend["EMITTER"],
+            "blend_factory": blend["POOL_FACTORY_V2"],
+            "oracle": blend["ORACLE_MOCK"],
+            "tokens": tokens
+        }),
+    })
+
+def load_contracts() -> Mapping[str, Any]:
+    """Return the contract snapshot, building it on first use"""
+    snapshot = _snapshot
+    if snapshot is not None:
+        return snapshot
+    return _load()
+
+def _load() -> Mapping[str, Any]:
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            started = time.perf_counter()
+            snapshot = _build_snapshot()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            _load_stats['loads'] += 1
+            _load_stats['last_load_ms'] = elapsed_ms
+            _load_stats['loaded_at'] = time.time()
+            logger.info(f"Loaded contract config for {snapshot['network'].get('network', 'unknown')} in {elapsed_ms:.2f}ms")
+            _snapshot = snapshot
+        return _snapshot
+
+def invalidate():
+    """Drop the snapshot; the next lookup rebuilds it from the config module"""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+
+def reload() -> Mapping[str, Any]:
+    """Re-import config (picking up changed env/files) and rebuild the snapshot"""
+    global _snapshot
+    with _snapshot_lock:
+        importlib.reload(config)
+        _snapshot = None
+    return _load()
+
+def load_stats() -> Dict[str, Any]:
+    return dict(_load_stats, loaded=_snapshot is not None)
 
 def get_contract_id() -> str:
     """Get the SafetyVault contract ID"""
-    return SAFETY_VAULT_CONTRACT_ID
+    return load_contracts()['contract_id']
 
-def get_contract_info() -> dict:
-    """Get complete SafetyVault contract information"""
-    return CONTRACT_METADATA["safety_vault"]
+def get_contract_info() -> Mapping[str, Any]:
+    """Get complete SafetyVault contract information (read-only)"""
+    return load_contracts()['contract_info']
 
 def get_deployer_address() -> str:
     """Get the deployer account address"""
-    return DEPLOYER_ADDRESS
+    return load_contracts()['deployer']
 
-def get_network_info() -> dict:
-    """Get network configuration"""
-    return get_network_config()
+def get_network_info() -> Mapping[str, Any]:
+    """Get network configuration (read-only)"""
+    return load_contracts()['network']
 
 def get_blend_pool_contract() -> str:
     """Get the official Blend Protocol pool contract address"""
-    return BLEND_CONTRACTS["TESTNET_POOL_V2"]
+    return load_contracts()['all_contracts']['blend_pool']
 
 def get_blend_backstop_contract() -> str:
     """Get the official Blend Protocol backstop contract address"""
-    return BLEND_CONTRACTS["BACKSTOP_V2"]
+    return load_contracts()['all_contracts']['blend_backstop']
 
 def get_token_contract(token_symbol: str) -> str:
     """Get token contract address by symbol"""
-    return TOKEN_CONTRACTS.get(token_symbol.upper(), "")
-
-def get_all_contracts() -> dict:
-    """Get all contract addresses for integration"""
-    return {
-        "safety_vault": SAFETY_VAULT_CONTRACT_ID,
-        "blend_pool": get_blend_pool_contract(),
-        "blend_backstop": get_blend_backstop_contract(),
-        "blend_emitter": BLEND_CONTRACTS["EMITTER"],
-        "blend_factory": BLEND_CONTRACTS["POOL_FACTORY_V2"],
-        "oracle": BLEND_CONTRACTS["ORACLE_MOCK"],
-        "tokens": TOKEN_CONTRACTS
-    } 
\ No newline at end of file
+    return load_contracts()['tokens'].get(token_symbol.upper(), "")
+
+def get_all_contracts() -> Mapping[str, Any]:
+    """Get all contract addresses for integration (read-only)"""
+    return load_contracts()['all_contracts']
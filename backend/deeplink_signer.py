@@ -0,0 +1,219 @@
+"""
+Deeplink signing for BlendGuard protection links
+HMAC-SHA256 signatures over (position, user) with keys primed once and
+copied per signature, batch sign/verify, expiry and key rotation.
+
+Signature formats:
+    legacy     <hex>                  HMAC(DEEPLINK_SECRET, "pos:user"), never expires
+    versioned  <key_id>.<expiry>.<hex> HMAC(versioned key, "key_id:expiry:pos:user")
+
+Versioned signatures use a key derived from the secret, so a legacy signature
+can never be replayed as a versioned one. New links stay legacy-signed until
+DEEPLINK_LEGACY_SIGNATURES is turned off, which must wait for the frontend to
+verify versioned signatures. Rotating keys: deploy the new key as
+DEEPLINK_KEY_ID/DEEPLINK_SECRET and list the old one in DEEPLINK_PREVIOUS_KEYS
+until links signed with it have expired.
+"""
+import os
+import hmac
+import time
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Id of the key new links are signed with
+DEEPLINK_KEY_ID = os.getenv("DEEPLINK_KEY_ID", "1")
+# Keys still accepted for verification: "id:secret,id:secret"
+DEEPLINK_PREVIOUS_KEYS = os.getenv("DEEPLINK_PREVIOUS_KEYS", "")
+# Lifetime of a signed link (0 = never expires)
+DEEPLINK_TTL_SECONDS = int(os.getenv("DEEPLINK_TTL_SECONDS", "86400"))
+# Accept unversioned signatures from links issued before versioning
+DEEPLINK_ACCEPT_LEGACY = os.getenv("DEEPLINK_ACCEPT_LEGACY", "true").lower() == "true"
+# Keep issuing unversioned signatures until the frontend verifies versioned ones
+DEEPLINK_LEGACY_SIGNATURES = os.getenv("DEEPLINK_LEGACY_SIGNATURES", "true").lower() == "true"
+
+_VERSIONED_KEY_CONTEXT = b"blendguard-deeplink-v2"
+_HEX_DIGITS = '0123456789abcdef'
+_DIGEST_LENGTH = hashlib.sha256().digest_size * 2
+
+Secret = Union[str, bytes]
+
+
+def parse_keys(spec: str) -> Dict[str, str]:
+    """'id:secret,id:secret' -> {id: secret}"""
+    keys = {}
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        key_id, sep, secret = entry.partition(':')
+        if not sep or not key_id or not secret:
+            raise ValueError(f"Invalid deeplink key entry {entry!r}, expected id:secret")
+        keys[key_id] = secret
+    return keys
+
+
+def _is_hex_digest(value: str) -> bool:
+    """A lowercase SHA-256 hexdigest; anything else (non-ASCII included) cannot match"""
+    return len(value) == _DIGEST_LENGTH and not value.strip(_HEX_DIGITS)
+
+
+class PrimedHMAC:
+    """HMAC-SHA256 keyed once; each signature copies the keyed state.
+
+    The key is padded and absorbed only in the constructor, so per-call work
+    is a copy plus the message, far cheaper than hmac.new per call.
+    """
+
+    __slots__ = ('_keyed',)
+
+    def __init__(self, key: bytes):
+        self._keyed = hmac.new(key, digestmod=hashlib.sha256)
+
+    def hexdigest(self, message: bytes) -> str:
+        mac = self._keyed.copy()
+        mac.update(message)
+        return mac.hexdigest()
+
+
+class DeeplinkSigner:
+    """Signs and verifies protection deeplinks.
+
+    Each key is primed once; signing copies its state and feeds only the
+    message, so the secret is never re-encoded or re-padded per call.
+    """
+
+    def __init__(self, keys: Mapping[str, Secret], current: str, ttl: int = DEEPLINK_TTL_SECONDS,
+                 accept_legacy: bool = DEEPLINK_ACCEPT_LEGACY, legacy_signatures: bool = DEEPLINK_LEGACY_SIGNATURES,
+                 clock: Callable[[], float] = time.time):
+        if current not in keys:
+            raise ValueError(f"Signing key {current!r} is not among the configured keys")
+        for key_id in keys:
+            if not key_id or '.' in key_id or ':' in key_id:
+                raise ValueError(f"Invalid deeplink key id {key_id!r}")
+        self.ttl = ttl
+        self.accept_legacy = accept_legacy
+        self.legacy_signatures = legacy_signatures
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._install(dict(keys), current)
+
+    def _install(self, keys: Dict[str, Secret], current: str):
+        legacy, versioned = {}, {}
+        for key_id, secret in keys.items():
+            secret = secret.encode() if isinstance(secret, str) else secret
+            legacy[key_id] = PrimedHMAC(secret)
+            versioned[key_id] = PrimedHMAC(hmac.new(secret, _VERSIONED_KEY_CONTEXT, hashlib.sha256).digest())
+        # Swapped as a whole so concurrent signers never see a half-rotated set
+        self._keys = keys
+        self._state = (current, legacy, versioned, tuple(legacy.values()))
+
+    @property
+    def current_key_id(self) -> str:
+        return self._state[0]
+
+    @property
+    def key_ids(self) -> List[str]:
+        return list(self._state[1])
+
+    def rotate(self, key_id: str, secret: Secret, retire: Sequence[str] = ()):
+        """Sign with a new key from now on; older keys keep verifying unless retired"""
+        if not key_id or '.' in key_id or ':' in key_id:
+            raise ValueError(f"Invalid deeplink key id {key_id!r}")
+        with self._lock:
+            keys = dict(self._keys)
+            keys[key_id] = secret
+            for old in retire:
+                if old != key_id:
+                    keys.pop(old, None)
+            self._install(keys, key_id)
+        logger.info(f"Deeplink signing key rotated to {key_id} ({len(keys)} keys accepted)")
+
+    def legacy_signature(self, position_id: str, user_id: str) -> str:
+        """Unversioned signature with the current key"""
+        current, legacy, _, _ = self._state
+        return legacy[current].hexdigest(f"{position_id}:{user_id}".encode())
+
+    def sign(self, position_id: str, user_id: str, expires_at: Optional[int] = None) -> str:
+        return self.sign_many(((position_id, user_id),), expires_at)[0]
+
+    def sign_many(self, pairs: Iterable[Tuple[str, str]], expires_at: Optional[int] = None) -> List[str]:
+        """Sign (position_id, user_id) pairs; all share one expiry and key"""
+        current, legacy, versioned, _ = self._state
+        signatures = []
+        append = signatures.append
+        if self.legacy_signatures:
+            hexdigest = legacy[current].hexdigest
+            for position_id, user_id in pairs:
+                append(hexdigest(f"{position_id}:{user_id}".encode()))
+            return signatures
+
+        if expires_at is None:
+            expires_at = int(self.clock()) + self.ttl if self.ttl > 0 else 0
+        prefix = f"{current}:{expires_at}:"
+        tag = f"{current}.{expires_at}."
+        hexdigest = versioned[current].hexdigest
+        for position_id, user_id in pairs:
+            append(tag + hexdigest(f"{prefix}{position_id}:{user_id}".encode()))
+        return signatures
+
+    def verify(self, position_id: str, user_id: str, signature: str) -> bool:
+        return self.verify_many(((position_id, user_id, signature),))[0]
+
+    def verify_many(self, items: Iterable[Tuple[str, str, str]], now: Optional[float] = None) -> List[bool]:
+        """Check (position_id, user_id, signature) triples; never raises on malformed input"""
+        _, legacy, versioned, legacy_keys = self._state
+        now = self.clock() if now is None else now
+        accept_legacy = self.accept_legacy
+        compare = hmac.compare_digest
+        results = []
+        append = results.append
+        for position_id, user_id, signature in items:
+            if not isinstance(signature, str):
+                append(False)
+                continue
+            key_id, sep, rest = signature.partition('.')
+            if not sep:
+                ok = False
+                if accept_legacy and _is_hex_digest(signature):
+                    message = f"{position_id}:{user_id}".encode()
+                    for primed in legacy_keys:
+                        if compare(signature, primed.hexdigest(message)):
+                            ok = True
+                            break
+                append(ok)
+                continue
+
+            expiry, sep, digest = rest.partition('.')
+            primed = versioned.get(key_id)
+            # isascii: str.isdigit() accepts digits int() rejects, e.g. '²'
+            if primed is None or not sep or not (expiry.isascii() and expiry.isdigit()) or not _is_hex_digest(digest):
+                append(False)
+                continue
+            expires_at = int(expiry)
+            if expires_at and expires_at < now:
+                append(False)
+                continue
+            append(compare(digest, primed.hexdigest(f"{key_id}:{expiry}:{position_id}:{user_id}".encode())))
+        return results
+
+
+_signer: Optional[DeeplinkSigner] = None
+_signer_lock = threading.Lock()
+
+
+def get_signer() -> DeeplinkSigner:
+    """Process-wide signer keyed from DEEPLINK_SECRET plus DEEPLINK_PREVIOUS_KEYS"""
+    global _signer
+    if _signer is None:
+        with _signer_lock:
+            if _signer is None:
+                from config import DEEPLINK_SECRET
+
+                keys = parse_keys(DEEPLINK_PREVIOUS_KEYS)
+                keys[DEEPLINK_KEY_ID] = DEEPLINK_SECRET
+                _signer = DeeplinkSigner(keys, DEEPLINK_KEY_ID)
+    return _signer
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Telegram dispatcher check
+Bursts messages through the rate-limited dispatcher at a local fake Telegram
+server that enforces Telegram's global and per-chat limits, then asserts that
+every message arrived, each chat's messages arrived in the order they were sent,
+and throughput stayed close to the configured global rate.
+
+    python dispatcher_check.py --chats 60 --per-chat 3
+
+Exits non-zero if any check fails.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from fake_telegram_server import serve
+
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+async def burst(dispatcher, chats: int, per_chat: int):
+    """Send ``per_chat`` numbered messages to each of ``chats`` chats, all at once"""
+    async def chat(chat_id: int):
+        # Each chat's sends are issued in order but never awaited one by one
+        sends = [asyncio.ensure_future(dispatcher.send_message(chat_id, f"{chat_id}:{seq}"))
+                 for seq in range(per_chat)]
+        await asyncio.gather(*sends)
+
+    await asyncio.gather(*(chat(1000 + i) for i in range(chats)))
+
+
+def check(args) -> dict:
+    telegram, state = serve(port=args.telegram_port, global_rate=args.global_limit, chat_rate=args.chat_limit,
+                            retry_after=1, latency=args.latency)
+    os.environ['TELEGRAM_API_URL'] = f'http://127.0.0.1:{args.telegram_port}/bot'
+    # Imported after the API URL is set: telegram_client reads it at import
+    from telegram_client import shutdown as shutdown_telegram_client
+    from telegram_dispatcher import TelegramDispatcher
+
+    dispatcher = TelegramDispatcher()
+    total = args.chats * args.per_chat
+
+    async def run():
+        try:
+            started = time.perf_counter()
+            await burst(dispatcher, args.chats, args.per_chat)
+            return time.perf_counter() - started
+        finally:
+            await shutdown_telegram_client()
+
+    elapsed = asyncio.run(run())
+    telegram.shutdown()
+
+    sent = [call['params'] for call in state.sent if call['method'] == 'sendMessage']
+    by_chat = {}
+    for params in sent:
+        chat_id, seq = params['text'].split(':')
+        by_chat.setdefault(chat_id, []).append(int(seq))
+    # Sends are paced by the slower of the global rate and each chat's rate
+    rates = dispatcher.global_bucket.rate, dispatcher.chat_rate
+    floor = max((total - dispatcher.global_bucket.capacity) / rates[0],
+                (args.per_chat - dispatcher.chat_burst) / rates[1], 0.0)
+    stats = dispatcher.stats()
+
+    failures = []
+    if len(sent) != total:
+        failures.append(f"delivered {len(sent)} of {total} messages")
+    out_of_order = [chat_id for chat_id, seqs in by_chat.items() if seqs != sorted(seqs)]
+    if out_of_order:
+        failures.append(f"{len(out_of_order)} chats received messages out of order")
+    if state.rejected > args.max_429:
+        failures.append(f"fake server returned {state.rejected} 429s (allowed {args.max_429})")
+    if elapsed > floor * args.slack + 1.0:
+        failures.append(f"took {elapsed:.2f}s, rate limits allow {floor:.2f}s")
+
+    return {
+        'messages': total,
+        'delivered': len(sent),
+        'seconds': round(elapsed, 2),
+        'msg_per_sec': round(total / elapsed, 1),
+        'floor_seconds': round(floor, 2),
+        'rejected_429': state.rejected,
+        'max_queue_depth': stats['max_queue_depth'],
+        'wait_seconds_max': round(stats['wait_seconds_max'], 2),
+        'failures': failures,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=60)
+    parser.add_argument('--per-chat', type=int, default=3)
+    parser.add_argument('--global-limit', type=float, default=30, help="fake server's messages/second overall")
+    parser.add_argument('--chat-limit', type=float, default=1, help="fake server's messages/second per chat")
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated Telegram round trip in seconds')
+    parser.add_argument('--max-429', type=int, default=0, help='429 responses tolerated from the fake server')
+    parser.add_argument('--slack', type=float, default=1.25, help='allowed multiple of the rate-limit floor')
+    parser.add_argument('--telegram-port', type=int, default=8093)
+    args = parser.parse_args()
+
+    result = check(args)
+    print(json.dumps(result))
+    sys.exit(1 if result['failures'] else 0)
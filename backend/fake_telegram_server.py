@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Local fake Telegram Bot API server
+Accepts the Bot API calls BlendGuard makes, enforces Telegram-like global and
+per-chat rate limits with 429 + retry_after, and records what was sent.
+
+Point the backend at it with:
+    TELEGRAM_API_URL=http://127.0.0.1:8081/bot python app.py
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import asyncio
+import threading
+from collections import deque
+from http import HTTPStatus
+from urllib.parse import parse_qs
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindow:
+    """Allows at most ``limit`` calls in any trailing one-second span"""
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.calls = deque()
+
+    def hit(self, now: float) -> bool:
+        while self.calls and self.calls[0] <= now - 1.0:
+            self.calls.popleft()
+        if len(self.calls) >= self.limit:
+            return False
+        self.calls.append(now)
+        return True
+
+
+class FakeTelegramState:
+    def __init__(self, global_rate: float, chat_rate: float, retry_after: int, latency: float):
+        self.global_window = SlidingWindow(global_rate)
+        self.chat_rate = chat_rate
+        self.chat_windows = {}
+        self.retry_after = retry_after
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.sent = []
+        self.rejected = 0
+        self.message_id = 0
+
+    def admit(self, chat_id) -> bool:
+        now = time.time()
+        with self.lock:
+            chat = self.chat_windows.setdefault(chat_id, SlidingWindow(self.chat_rate))
+            allowed = chat.hit(now) and self.global_window.hit(now)
+            if not allowed:
+                self.rejected += 1
+            return allowed
+
+    def record(self, method, params) -> int:
+        with self.lock:
+            self.message_id += 1
+            self.sent.append({'method': method, 'params': params, 'at': time.time()})
+            return self.message_id
+
+
+class FakeTelegramServer:
+    """Bot API stand-in served by an asyncio loop in a daemon thread.
+
+    Keep-alive connections are served without a thread each, so the pooled
+    backend client can hold hundreds of them open during load tests.
+    """
+
+    def __init__(self, state: FakeTelegramState, host: str, port: int):
+        self.state = state
+        self.host = host
+        self.port = port
+        self.loop = asyncio.new_event_loop()
+        self._server = None
+        self._connections = set()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='fake-telegram', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self._server = self.loop.run_until_complete(
+            asyncio.start_server(self._handle_connection, self.host, self.port, backlog=1024))
+        self._ready.set()
+        self.loop.run_forever()
+
+    def shutdown(self):
+        async def stop():
+            self._server.close()
+            # Close idle keep-alive connections too, so their handlers exit before the loop stops
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for writer in list(self._connections):
+                writer.close()
+            await asyncio.wait(tasks, timeout=1)
+            self.loop.stop()
+        asyncio.run_coroutine_threadsafe(stop(), self.loop)
+        self._thread.join(5)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                verb, path, _ = request_line.split(' ', 2)
+                headers = {}
+                for line in header_lines:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                body = (await reader.readexactly(length)).decode() if length else ''
+
+                status, payload = await self._dispatch(verb, path, headers, body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except Exception as e:
+            logger.debug(f"Fake Telegram connection error: {str(e)}")
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, verb, path, headers, body):
+        state = self.state
+        if verb == 'GET':
+            if path == '/_sent':
+                with state.lock:
+                    return 200, {'sent': state.sent, 'rejected': state.rejected}
+            return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+
+        # Paths look like /bot<token>/<method>
+        method = path.rsplit('/', 1)[-1]
+        if 'json' in headers.get('content-type', ''):
+            params = json.loads(body or '{}')
+        else:
+            params = {k: v[0] for k, v in parse_qs(body).items()}
+        if state.latency:
+            await asyncio.sleep(state.latency)
+
+        if method in ('setWebhook', 'deleteWebhook'):
+            state.record(method, params)
+            return 200, {'ok': True, 'result': True}
+        if method == 'getWebhookInfo':
+            return 200, {'ok': True, 'result': {'url': '', 'has_custom_certificate': False, 'pending_update_count': 0}}
+
+        if method == 'getMe':
+            return 200, {'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'BlendGuard', 'username': 'blendguard_fake_bot'}}
+
+        chat_id = params.get('chat_id') or params.get('callback_query_id')
+        if method in ('sendMessage', 'editMessageText') and not state.admit(chat_id):
+            return 429, {
+                'ok': False,
+                'error_code': 429,
+                'description': f"Too Many Requests: retry after {state.retry_after}",
+                'parameters': {'retry_after': state.retry_after},
+            }
+
+        message_id = state.record(method, params)
+        if method == 'answerCallbackQuery':
+            return 200, {'ok': True, 'result': True}
+        return 200, {'ok': True, 'result': {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id) if str(chat_id).lstrip('-').isdigit() else 0, 'type': 'private'},
+            'text': params.get('text', ''),
+        }}
+
+
+def serve(host='127.0.0.1', port=8081, global_rate=30, chat_rate=1, retry_after=1, latency=0.0):
+    """Start the fake server in a daemon thread and return (server, state)"""
+    state = FakeTelegramState(global_rate, chat_rate, retry_after, latency)
+    server = FakeTelegramServer(state, host, port).start()
+    logger.info(f"Fake Telegram API listening on http://{host}:{port}/bot")
+    return server, state
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8081)))
+    parser.add_argument('--global-rate', type=float, default=30)
+    parser.add_argument('--chat-rate', type=float, default=1)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every call')
+    args = parser.parse_args()
+
+    server, _ = serve(args.host, args.port, args.global_rate, args.chat_rate, args.retry_after, args.latency)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
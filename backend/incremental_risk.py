@@ -0,0 +1,179 @@
+"""
+Incremental Risk Engine for BlendGuard
+Indexes positions by the asset and pool they depend on so that a price,
+volatility or pool-utilization update re-scores only the affected positions.
+Positions tracked with their collateral amount and debt have their LTV
+recomputed from every price tick before they are re-scored.
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from risk_engine import FEATURES, LiquidationPredictor
+from risk_math import loan_to_value
+
+logger = logging.getLogger(__name__)
+
+ScoreListener = Callable[[Dict[str, float]], None]
+
+
+@dataclass
+class TrackedPosition:
+    """Per-position inputs the engine needs to rebuild a feature vector"""
+    position_id: str
+    asset: str
+    pool: str
+    ltv: float
+    user_id: Optional[str] = None
+    risk_score: Optional[float] = None
+    # Units of collateral and USD debt; when both are known a price tick re-derives ltv
+    collateral_amount: Optional[float] = None
+    debt: Optional[float] = None
+
+
+class IncrementalRiskEngine:
+    """Re-scores O(affected) positions per market update instead of the whole book"""
+
+    def __init__(self, predictor: LiquidationPredictor):
+        self.predictor = predictor
+        self.positions: Dict[str, TrackedPosition] = {}
+        self._by_asset: Dict[str, Set[str]] = {}
+        self._by_pool: Dict[str, Set[str]] = {}
+        # Latest market inputs: asset -> {price, asset_volatility, trend}, pool -> pool_utilization
+        self.asset_state: Dict[str, Dict[str, float]] = {}
+        self.pool_state: Dict[str, float] = {}
+        self._listeners: List[ScoreListener] = []
+        self._lock = threading.RLock()
+        self.stats = {'updates': 0, 'rescored': 0, 'last_rescored': 0}
+
+    def subscribe(self, listener: ScoreListener):
+        """Call ``listener({position_id: risk_score})`` after every re-score"""
+        self._listeners.append(listener)
+
+    def upsert_position(self, position_id: str, asset: str, pool: str, ltv: float,
+                        user_id: Optional[str] = None, collateral_amount: Optional[float] = None,
+                        debt: Optional[float] = None) -> Optional[float]:
+        """Track (or update) a position and score it if market inputs are known.
+
+        With ``collateral_amount`` and ``debt``, later price updates for ``asset``
+        recompute the position's ltv instead of reusing the one given here.
+        """
+        with self._lock:
+            existing = self.positions.get(position_id)
+            if existing is not None and (existing.asset, existing.pool) != (asset, pool):
+                self._unindex(existing)
+            position = TrackedPosition(position_id, asset, pool, float(ltv), user_id,
+                                       existing.risk_score if existing else None,
+                                       None if collateral_amount is None else float(collateral_amount),
+                                       None if debt is None else float(debt))
+            price = self.asset_state.get(asset, {}).get('price')
+            if price is not None:
+                self._reprice([position], price)
+            self.positions[position_id] = position
+            self._by_asset.setdefault(asset, set()).add(position_id)
+            self._by_pool.setdefault(pool, set()).add(position_id)
+        return self.rescore([position_id]).get(position_id)
+
+    def remove_position(self, position_id: str):
+        with self._lock:
+            position = self.positions.pop(position_id, None)
+            if position is not None:
+                self._unindex(position)
+
+    def on_asset_update(self, asset: str, asset_volatility: Optional[float] = None,
+                        trend: Optional[float] = None, price: Optional[float] = None) -> Dict[str, float]:
+        """Apply a price/volatility update and re-score positions backed by ``asset``.
+
+        A ``price`` recomputes ltv for affected positions that carry collateral and debt.
+        """
+        with self._lock:
+            state = self.asset_state.setdefault(asset, {})
+            if asset_volatility is not None:
+                state['asset_volatility'] = float(asset_volatility)
+            if trend is not None:
+                state['trend'] = float(trend)
+            affected = list(self._by_asset.get(asset, ()))
+            if price is not None:
+                state['price'] = float(price)
+                self._reprice([self.positions[position_id] for position_id in affected], state['price'])
+        return self._on_update(affected)
+
+    def on_pool_update(self, pool: str, pool_utilization: float) -> Dict[str, float]:
+        """Apply a pool-utilization update and re-score positions in ``pool``"""
+        with self._lock:
+            self.pool_state[pool] = float(pool_utilization)
+            affected = list(self._by_pool.get(pool, ()))
+        return self._on_update(affected)
+
+    def rescore(self, position_ids: Iterable[str]) -> Dict[str, float]:
+        """Score the given positions in one batch; positions lacking market inputs are skipped"""
+        with self._lock:
+            ready, rows = [], []
+            for position_id in position_ids:
+                position = self.positions.get(position_id)
+                if position is None:
+                    continue
+                features = self._features(position)
+                if features is not None:
+                    ready.append(position)
+                    rows.append(features)
+
+        if not ready:
+            return {}
+
+        scores = self.predictor.predict_batch(np.array(rows, dtype=np.float64)).tolist()
+        results = {}
+        with self._lock:
+            for position, score in zip(ready, scores):
+                position.risk_score = score
+                results[position.position_id] = score
+            self.stats['rescored'] += len(results)
+            self.stats['last_rescored'] = len(results)
+
+        for listener in self._listeners:
+            try:
+                listener(results)
+            except Exception as e:
+                logger.error(f"Risk score listener failed: {str(e)}")
+        return results
+
+    def score(self, position_id: str) -> Optional[float]:
+        """Latest risk score for a position, if it has been scored"""
+        position = self.positions.get(position_id)
+        return position.risk_score if position else None
+
+    def _on_update(self, affected: List[str]) -> Dict[str, float]:
+        with self._lock:
+            self.stats['updates'] += 1
+        return self.rescore(affected)
+
+    def _reprice(self, positions: List[TrackedPosition], price: float):
+        """Recompute ltv at ``price`` for positions with a known collateral amount and debt"""
+        positions = [p for p in positions
+                     if p.collateral_amount is not None and p.collateral_amount > 0 and p.debt is not None]
+        if not positions:
+            return
+        ltvs = loan_to_value(np.array([p.collateral_amount for p in positions]),
+                             np.array([p.debt for p in positions]), np.array([price])).tolist()
+        for position, ltv in zip(positions, ltvs):
+            position.ltv = ltv
+
+    def _features(self, position: TrackedPosition) -> Optional[List[float]]:
+        market = self.asset_state.get(position.asset)
+        utilization = self.pool_state.get(position.pool)
+        if market is None or utilization is None or 'asset_volatility' not in market or 'trend' not in market:
+            return None
+        values = {
+            'ltv': position.ltv,
+            'asset_volatility': market['asset_volatility'],
+            'pool_utilization': utilization,
+            'trend': market['trend'],
+        }
+        return [values[k] for k in FEATURES]
+
+    def _unindex(self, position: TrackedPosition):
+        self._by_asset.get(position.asset, set()).discard(position.position_id)
+        self._by_pool.get(position.pool, set()).discard(position.position_id)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Notification API load test
+Starts the local fake Telegram server, launches the backend in Flask and/or
+ASGI mode against it, fires concurrent POST /api/notify-telegram requests and
+reports throughput, latency percentiles, peak server memory and threads.
+
+    python load_test.py --mode both --requests 2000 --concurrency 200 --latency 0.5
+
+Run the load generator on a different machine (or at least core) than the
+server for throughput numbers that reflect the server rather than the client.
+"""
+import os
+import sys
+import time
+import json
+import signal
+import contextlib
+import asyncio
+import argparse
+import subprocess
+import logging
+import httpx
+from fake_telegram_server import serve
+
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CLIENT_SHARD_CONNECTIONS = 50
+
+SERVER_COMMANDS = {
+    # The current mode: Flask's threaded server, one thread blocked per send
+    'flask': [sys.executable, '-c',
+              'from app import create_app; '
+              'create_app().run(host="127.0.0.1", port={port}, threaded=True)'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi_app:app',
+             '--host', '127.0.0.1', '--port', '{port}', '--log-level', 'warning'],
+}
+
+
+def process_status(pid: int) -> dict:
+    """Resident memory (MB) and thread count of a process (Linux only)"""
+    status = {'rss_mb': float('nan'), 'threads': 0}
+    try:
+        with open(f'/proc/{pid}/status') as lines:
+            for line in lines:
+                if line.startswith('VmRSS:'):
+                    status['rss_mb'] = int(line.split()[1]) / 1024
+                elif line.startswith('Threads:'):
+                    status['threads'] = int(line.split()[1])
+    except OSError:
+        pass
+    return status
+
+
+async def sample_peak(pid: int, peak: dict, interval: float = 0.05):
+    while True:
+        status = process_status(pid)
+        peak['rss_peak_mb'] = max(peak.get('rss_peak_mb', 0.0), status['rss_mb'])
+        peak['threads_peak'] = max(peak.get('threads_peak', 0), status['threads'])
+        await asyncio.sleep(interval)
+
+
+def start_server(mode: str, port: int, telegram_url: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        TELEGRAM_API_URL=telegram_url,
+        # Measure the serving mode, not Telegram's rate limits
+        TELEGRAM_GLOBAL_RATE='1000000', TELEGRAM_GLOBAL_BURST='1000000',
+        TELEGRAM_CHAT_RATE='1000000', TELEGRAM_CHAT_BURST='1000000',
+    )
+    command = [part.replace('{port}', str(port)) for part in SERVER_COMMANDS[mode]]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/health', timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start on port {port}")
+
+
+async def fire(url: str, total: int, concurrency: int, pid: int) -> dict:
+    latencies = []
+    errors = 0
+    peak = {}
+    slots = asyncio.Semaphore(concurrency)
+    # httpx pools degrade past ~100 busy connections; shard so the client is not the bottleneck
+    shards = max(1, -(-concurrency // CLIENT_SHARD_CONNECTIONS))
+    per_shard = -(-concurrency // shards)
+    limits = httpx.Limits(max_connections=per_shard, max_keepalive_connections=per_shard)
+
+    async with contextlib.AsyncExitStack() as stack:
+        clients = [await stack.enter_async_context(httpx.AsyncClient(limits=limits, timeout=60))
+                   for _ in range(shards)]
+
+        async def one(i: int):
+            nonlocal errors
+            async with slots:
+                started = time.perf_counter()
+                try:
+                    response = await clients[i % shards].post(url, json={
+                        'userId': str(100000 + i),
+                        'message': f'Load test notification {i}',
+                        'txHash': f'{i:064x}',
+                    })
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        sampler = asyncio.create_task(sample_peak(pid, peak))
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    return {
+        'requests': total,
+        'errors': errors,
+        'seconds': round(elapsed, 2),
+        'req_per_sec': round(total / elapsed, 1),
+        'p50_ms': round(pct(0.50), 1),
+        'p95_ms': round(pct(0.95), 1),
+        'p99_ms': round(pct(0.99), 1),
+        'rss_peak_mb': round(peak.get('rss_peak_mb', float('nan')), 1),
+        'threads_peak': peak.get('threads_peak', 0),
+    }
+
+
+def run_mode(mode: str, args, telegram_url: str) -> dict:
+    process = start_server(mode, args.port, telegram_url)
+    try:
+        idle_mb = process_status(process.pid)['rss_mb']
+        result = asyncio.run(fire(f'http://127.0.0.1:{args.port}/api/notify-telegram',
+                                  args.requests, args.concurrency, process.pid))
+        result.update(mode=mode, rss_idle_mb=round(idle_mb, 1))
+        return result
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['flask', 'asgi', 'both'], default='both')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.5, help='simulated Telegram round trip in seconds')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--telegram-port', type=int, default=8091)
+    args = parser.parse_args()
+
+    telegram, _ = serve(port=args.telegram_port, global_rate=1e9, chat_rate=1e9, latency=args.latency)
+    telegram_url = f'http://127.0.0.1:{args.telegram_port}/bot'
+
+    modes = ['flask', 'asgi'] if args.mode == 'both' else [args.mode]
+    results = [run_mode(mode, args, telegram_url) for mode in modes]
+    telegram.shutdown()
+
+    for result in results:
+        print(json.dumps(result))
@@ -0,0 +1,449 @@
+"""
+Market Data Feed for BlendGuard
+Streams price and pool-state events from a file, socket or recorded replay and
+keeps the model's market features current per asset and pool:
+
+    asset_volatility  EWMA of squared log returns (square-rooted), with a
+                      Welford estimate standing in until the EWMA has warmed up
+    trend             fast/slow price EWMA divergence, (fast - slow) / slow
+    pool_utilization  latest borrowed / supplied ratio reported for the pool
+
+Every estimator is O(1) time and memory per event. Changed assets and pools are
+published in batches every MARKET_PUBLISH_INTERVAL seconds of event time, so a
+fast tick stream does not re-score positions on every tick. Live sources yield
+None while idle so the consumer can flush a pending batch on wall-clock time
+when the stream goes quiet.
+
+Events are JSON objects (or CSV rows with the same column names):
+    {"type": "price", "asset": "XLM", "price": 0.1123, "ts": 1718000000.1}
+    {"type": "pool", "pool": "XLM-LENDING", "utilization": 0.81, "ts": 1718000000.2}
+    {"type": "pool", "pool": "XLM-LENDING", "borrowed": 810.0, "supplied": 1000.0}
+"""
+import os
+import csv
+import json
+import math
+import time
+import socket
+import logging
+import argparse
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+import numpy as np
+
+from risk_engine import FEATURES
+
+logger = logging.getLogger(__name__)
+
+# Ticks over which return variance and the trend EWMAs decay
+MARKET_VOL_SPAN = int(os.getenv("MARKET_VOL_SPAN", "100"))
+MARKET_TREND_FAST_SPAN = int(os.getenv("MARKET_TREND_FAST_SPAN", "12"))
+MARKET_TREND_SLOW_SPAN = int(os.getenv("MARKET_TREND_SLOW_SPAN", "48"))
+# Returns seen before the EWMA volatility replaces the Welford estimate
+MARKET_VOL_WARMUP = int(os.getenv("MARKET_VOL_WARMUP", "30"))
+# Seconds of event time between feature publishes
+MARKET_PUBLISH_INTERVAL = float(os.getenv("MARKET_PUBLISH_INTERVAL", "0.5"))
+# Seconds a socket read may block before the consumer gets a chance to flush or stop
+MARKET_SOCKET_TIMEOUT = float(os.getenv("MARKET_SOCKET_TIMEOUT", "1.0"))
+
+FeatureListener = Callable[[Dict[str, Any]], None]
+
+
+def span_alpha(span: int) -> float:
+    """EWMA smoothing factor for a span of ``span`` observations"""
+    return 2.0 / (span + 1.0)
+
+
+class Welford:
+    """Running mean and variance in O(1) memory"""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+
+class AssetEstimator:
+    """Incremental volatility and trend for one asset's price stream"""
+
+    __slots__ = ('price', 'ts', 'returns', 'variance', 'fast', 'slow', 'ticks',
+                 '_vol_alpha', '_fast_alpha', '_slow_alpha', '_warmup')
+
+    def __init__(self, vol_span: int = MARKET_VOL_SPAN, fast_span: int = MARKET_TREND_FAST_SPAN,
+                 slow_span: int = MARKET_TREND_SLOW_SPAN, warmup: int = MARKET_VOL_WARMUP):
+        self.price: Optional[float] = None
+        self.ts: Optional[float] = None
+        self.returns = Welford()
+        self.variance = 0.0
+        self.fast = self.slow = 0.0
+        self.ticks = 0
+        self._vol_alpha = span_alpha(vol_span)
+        self._fast_alpha = span_alpha(fast_span)
+        self._slow_alpha = span_alpha(slow_span)
+        self._warmup = warmup
+
+    def update(self, price: float, ts: Optional[float] = None):
+        self.ticks += 1
+        previous = self.price
+        self.price = price
+        self.ts = ts
+        if previous is None:
+            self.fast = self.slow = price
+            return
+        log_return = math.log(price / previous)
+        self.returns.update(log_return)
+        self.variance += self._vol_alpha * (log_return * log_return - self.variance)
+        self.fast += self._fast_alpha * (price - self.fast)
+        self.slow += self._slow_alpha * (price - self.slow)
+
+    @property
+    def volatility(self) -> float:
+        """Per-tick log-return standard deviation"""
+        variance = self.variance if self.returns.count >= self._warmup else self.returns.variance
+        return math.sqrt(variance)
+
+    @property
+    def trend(self) -> float:
+        return (self.fast - self.slow) / self.slow if self.slow else 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        return {'price': self.price, 'asset_volatility': self.volatility, 'trend': self.trend}
+
+
+class MarketFeed:
+    """Consumes market events and publishes per-asset/per-pool feature updates"""
+
+    def __init__(self, publish_interval: float = MARKET_PUBLISH_INTERVAL,
+                 estimator: Callable[[], AssetEstimator] = AssetEstimator):
+        self.publish_interval = publish_interval
+        self.estimator = estimator
+        self.assets: Dict[str, AssetEstimator] = {}
+        self.pools: Dict[str, float] = {}
+        self._dirty_assets: Set[str] = set()
+        self._dirty_pools: Set[str] = set()
+        self._listeners: List[FeatureListener] = []
+        self._last_publish: Optional[float] = None
+        self._published_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.stats = {'events': 0, 'prices': 0, 'pools': 0, 'rejected': 0, 'publishes': 0}
+
+    def subscribe(self, listener: FeatureListener):
+        """Call ``listener({'assets': {...}, 'pools': {...}})`` with changed features on every publish"""
+        self._listeners.append(listener)
+
+    def process(self, event: Dict[str, Any]) -> bool:
+        """Apply one event; returns False (and counts it) if it is malformed"""
+        stats = self.stats
+        stats['events'] += 1
+        try:
+            kind = event.get('type')
+            ts = event.get('ts')
+            ts = float(ts) if ts not in (None, '') else time.time()
+            if kind == 'price':
+                asset = event['asset']
+                price = float(event['price'])
+                if not (math.isfinite(price) and price > 0):
+                    raise ValueError(f"invalid price {price}")
+                estimator = self.assets.get(asset)
+                if estimator is None:
+                    estimator = self.assets[asset] = self.estimator()
+                estimator.update(price, ts)
+                self._dirty_assets.add(asset)
+                stats['prices'] += 1
+            elif kind == 'pool':
+                pool = event['pool']
+                utilization = event.get('utilization')
+                if utilization in (None, ''):
+                    supplied = float(event['supplied'])
+                    utilization = float(event['borrowed']) / supplied if supplied > 0 else 0.0
+                utilization = float(utilization)
+                if not (math.isfinite(utilization) and 0.0 <= utilization <= 1.0):
+                    raise ValueError(f"utilization {utilization} outside [0, 1]")
+                self.pools[pool] = utilization
+                self._dirty_pools.add(pool)
+                stats['pools'] += 1
+            else:
+                raise ValueError(f"unknown event type {kind!r}")
+        except (KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+            stats['rejected'] += 1
+            logger.debug(f"Rejected market event {event!r}: {str(e)}")
+            return False
+
+        if self._last_publish is None:
+            self._last_publish = ts
+        elif ts - self._last_publish >= self.publish_interval:
+            self.publish()
+            self._last_publish = ts
+        return True
+
+    def consume(self, events: Iterable[Optional[Dict[str, Any]]]) -> int:
+        """Process a stream until it ends (or stop() is called), then publish what is left.
+
+        A None item is an idle heartbeat from a live source: it flushes changes
+        older than ``publish_interval`` of wall-clock time and checks for stop().
+        """
+        processed = 0
+        process, stopping = self.process, self._stop.is_set
+        for event in events:
+            if event is None:
+                if stopping():
+                    break
+                if time.monotonic() - self._published_at >= self.publish_interval:
+                    self.publish()
+                continue
+            process(event)
+            processed += 1
+            if not processed & 1023 and stopping():
+                break
+        self.publish()
+        return processed
+
+    def publish(self) -> Dict[str, Any]:
+        """Hand the features of assets and pools changed since the last publish to listeners"""
+        with self._lock:
+            assets, pools = self._dirty_assets, self._dirty_pools
+            if not assets and not pools:
+                return {}
+            self._dirty_assets, self._dirty_pools = set(), set()
+            self._published_at = time.monotonic()
+        update = {
+            'assets': {asset: self.assets[asset].snapshot() for asset in assets},
+            'pools': {pool: self.pools[pool] for pool in pools},
+        }
+        self.stats['publishes'] += 1
+        for listener in self._listeners:
+            try:
+                listener(update)
+            except Exception as e:
+                logger.error(f"Market feature listener failed: {str(e)}")
+        return update
+
+    def features(self, asset: str, pool: str, ltv: float) -> Optional[np.ndarray]:
+        """Model input row for a position, or None until the asset and pool have data"""
+        estimator = self.assets.get(asset)
+        utilization = self.pools.get(pool)
+        if estimator is None or utilization is None:
+            return None
+        values = {'ltv': ltv, 'asset_volatility': estimator.volatility,
+                  'pool_utilization': utilization, 'trend': estimator.trend}
+        return np.array([values[k] for k in FEATURES], dtype=np.float64)
+
+    def start(self, events: Iterable[Dict[str, Any]]) -> threading.Thread:
+        """Consume ``events`` in a daemon thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.consume, args=(events,), name='market-feed', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# Sinks
+
+def engine_sink(engine) -> FeatureListener:
+    """Forward published features to an IncrementalRiskEngine, which re-scores affected positions"""
+    def publish(update: Dict[str, Any]):
+        for asset, features in update['assets'].items():
+            engine.on_asset_update(asset, features['asset_volatility'], features['trend'], features['price'])
+        for pool, utilization in update['pools'].items():
+            engine.on_pool_update(pool, utilization)
+    return publish
+
+
+def store_sink(store) -> FeatureListener:
+    """Write published features into a PositionStore's feature columns for every affected row"""
+    def publish(update: Dict[str, Any]):
+        for asset, features in update['assets'].items():
+            rows = store.rows_for_asset(asset)
+            if rows.size:
+                store.set_column('asset_volatility', features['asset_volatility'], rows)
+                store.set_column('trend', features['trend'], rows)
+        for pool, utilization in update['pools'].items():
+            rows = store.rows_for_pool(pool)
+            if rows.size:
+                store.set_column('pool_utilization', utilization, rows)
+    return publish
+
+
+# Sources
+
+def parse_lines(lines: Iterable[Optional[str]]) -> Iterator[Optional[Dict[str, Any]]]:
+    """NDJSON lines to events; blank and unparseable lines are skipped, idle heartbeats (None) passed on"""
+    loads = json.loads
+    for line in lines:
+        if line is None:
+            yield None
+            continue
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield loads(line)
+        except ValueError:
+            logger.debug(f"Skipping malformed market line {line[:80]!r}")
+
+
+def file_source(path: str, follow: bool = False,
+                poll_interval: float = 0.2) -> Iterator[Optional[Dict[str, Any]]]:
+    """Events from an NDJSON or CSV file; with ``follow``, keep reading appended lines (None while idle)"""
+    with open(path, newline='') as handle:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(handle)
+            return
+        while True:
+            yield from parse_lines(iter(handle.readline, ''))
+            if not follow:
+                return
+            yield None
+            time.sleep(poll_interval)
+
+
+def socket_source(address: str, reconnect_delay: float = 1.0,
+                  timeout: float = MARKET_SOCKET_TIMEOUT) -> Iterator[Optional[Dict[str, Any]]]:
+    """NDJSON events from a TCP ``host:port`` stream, reconnecting when it drops.
+
+    Reads time out after ``timeout`` seconds and yield None, so a quiet stream
+    never blocks the consumer's wall-clock flush or stop().
+    """
+    host, _, port = address.rpartition(':')
+    while True:
+        try:
+            with socket.create_connection((host or 'localhost', int(port)), timeout=timeout) as connection:
+                logger.info(f"Market feed connected to {address}")
+                yield from parse_lines(_socket_lines(connection))
+            logger.warning(f"Market feed {address} closed the connection")
+        except OSError as e:
+            logger.error(f"Market feed {address} unavailable: {str(e)}")
+        yield None
+        time.sleep(reconnect_delay)
+
+
+def _socket_lines(connection: socket.socket) -> Iterator[Optional[bytes]]:
+    """Newline-delimited lines from a socket with a timeout, None on every timed-out read"""
+    pending = b''
+    while True:
+        try:
+            chunk = connection.recv(65536)
+        except socket.timeout:
+            yield None
+            continue
+        if not chunk:
+            break
+        *lines, pending = (pending + chunk).split(b'\n')
+        yield from lines
+    if pending:
+        yield pending
+
+
+def replay_source(path: str, speed: float = 0.0) -> Iterator[Dict[str, Any]]:
+    """Recorded events paced by their timestamps (``speed`` x real time; 0 = as fast as possible)"""
+    return paced(file_source(path), speed)
+
+
+def paced(events: Iterable[Optional[Dict[str, Any]]], speed: float = 0.0) -> Iterator[Optional[Dict[str, Any]]]:
+    """Yield events no faster than ``speed`` x the rate their timestamps imply (0 = unpaced)"""
+    if speed <= 0:
+        yield from events
+        return
+    first_ts = started = None
+    for event in events:
+        if event is None:
+            yield event
+            continue
+        ts = event.get('ts')
+        if ts not in (None, ''):
+            ts = float(ts)
+            if first_ts is None:
+                first_ts, started = ts, time.monotonic()
+            delay = (ts - first_ts) / speed - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+        yield event
+
+
+def synthetic_events(count: int, assets: int = 10, pools: int = 5, seed: int = 0,
+                     start_ts: float = 0.0, tick: float = 0.001) -> Iterator[Dict[str, Any]]:
+    """Random-walk prices with occasional pool updates, for benchmarks and replays"""
+    rng = np.random.default_rng(seed)
+    prices = np.full(assets, 1.0)
+    shocks = np.exp(rng.normal(0.0, 0.002, size=count))
+    picks = rng.integers(0, assets, size=count).tolist()
+    pool_picks = rng.integers(0, pools, size=count).tolist()
+    utilization = rng.uniform(0.3, 0.95, size=count).tolist()
+    for i, (asset, shock) in enumerate(zip(picks, shocks.tolist())):
+        ts = start_ts + i * tick
+        if i % 20 == 19:
+            yield {'type': 'pool', 'pool': f"POOL{pool_picks[i]}", 'utilization': utilization[i], 'ts': ts}
+            continue
+        prices[asset] *= shock
+        yield {'type': 'price', 'asset': f"ASSET{asset}", 'price': float(prices[asset]), 'ts': ts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BlendGuard market data feed")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--file', help="NDJSON or CSV event file")
+    source.add_argument('--socket', help="host:port streaming NDJSON events")
+    source.add_argument('--replay', help="recorded event file, paced by --speed")
+    source.add_argument('--benchmark', type=int, metavar='N', help="process N synthetic events and report throughput")
+    parser.add_argument('--follow', action='store_true', help="keep reading lines appended to --file")
+    parser.add_argument('--speed', type=float, default=0.0, help="replay speed multiplier (0 = as fast as possible)")
+    parser.add_argument('--record', metavar='PATH', help="with --benchmark, write the synthetic events as NDJSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    feed = MarketFeed()
+    feed.subscribe(lambda update: logger.debug(f"Published {len(update['assets'])} assets, "
+                                               f"{len(update['pools'])} pools"))
+
+    if args.benchmark:
+        if args.record:
+            with open(args.record, 'w') as handle:
+                for event in synthetic_events(args.benchmark, start_ts=time.time()):
+                    handle.write(json.dumps(event) + "\n")
+            print(f"Wrote {args.benchmark} events to {args.record}")
+            return
+        events = list(synthetic_events(args.benchmark))
+        started = time.perf_counter()
+        feed.consume(events)
+        elapsed = time.perf_counter() - started
+        print(f"{args.benchmark} events in {elapsed:.2f}s ({args.benchmark / elapsed:,.0f} events/s), "
+              f"{feed.stats['publishes']} publishes")
+        for asset, estimator in sorted(feed.assets.items())[:3]:
+            print(f"  {asset}: {estimator.snapshot()}")
+        return
+
+    if args.file:
+        events = file_source(args.file, follow=args.follow)
+    elif args.socket:
+        events = socket_source(args.socket)
+    else:
+        events = replay_source(args.replay, speed=args.speed)
+    try:
+        feed.consume(events)
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(feed.stats))
+
+
+if __name__ == '__main__':
+    main()
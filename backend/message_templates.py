@@ -0,0 +1,274 @@
+"""
+Message rendering for BlendGuard Telegram messages
+Templates are compiled once per message type, static texts and contract blocks
+are cached, and inline keyboards are built from cached, immutable buttons.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+Rendered = Tuple[str, Optional[InlineKeyboardMarkup]]
+
+EXPLORER_TX_URL = "https://stellar.expert/explorer/testnet/tx/{}"
+# Shown in place of a metric the store has no value for (None)
+MISSING_VALUE = "N/A"
+
+# Static texts
+
+WELCOME_TEXT = """
+🛡️ **Welcome to BlendGuard!**
+
+I'm your personal Stellar lending protection assistant. I monitor your positions and help protect them from liquidation.
+
+**Available Commands:**
+• `/status` - Check your position health
+• `/contract` - View BlendGuard contract info
+• `/demo` - See demo protection result
+
+Stay safe! 🚀
+"""
+
+NO_POSITIONS_TEXT = """
+📊 **Position Status**
+
+No active lending positions found.
+
+Connect your wallet to start using Blend lending markets!
+"""
+
+CALLBACK_ERROR_TEXT = "❌ An error occurred while processing your request. Please try again."
+
+DEMO_TX_HASH = "d1f2a5c8e3b7a9f012e4b8c7d5f6e3a9b2c4d7e8f1a3b5c6d9e2f4a7b8c1d5e"
+
+DEMO_TEXT = (
+    f"⚠️ *DEMO: Protection Applied*\n"
+    f"🔗 TX: `{DEMO_TX_HASH[:16]}...`\n"
+    f"🆕 Health Factor: **1.85**\n\n"
+    f"🛡️ Position successfully protected from liquidation!"
+)
+
+# Templates, bound once so each render is a single format call
+
+_alert = (
+    "⚠️ *Liquidation Risk Alert*\n\n"
+    "🎯 Position: {asset}\n"
+    "📊 Risk Score: {risk_score:.0%}\n"
+    "💰 Amount: {amount}\n"
+    "🔥 Health Factor: {health_factor}\n\n"
+    "⚡ *Action Required* - Your position is at risk of liquidation!\n"
+    "{vault}"
+).format
+
+_summary_header = "⚠️ *Liquidation Risk Alert* - {count} positions\n\n".format
+_summary_line = "{emoji} *{asset}*: {amount}\n   Risk: {risk_score:.0%} | Health: {health_factor}\n\n".format
+_summary_more = "…and {count} more (see /status)\n\n".format
+_summary_footer = "⚡ *Action Required* - These positions are at risk of liquidation!\n{vault}".format
+
+STATUS_HEADER = "📊 **Your Lending Positions**\n\n"
+_status_line = "{emoji} **{asset}**: {amount}\n   Risk: {risk_score} | Health: {health_factor}\n\n".format
+
+_details = (
+    "📊 **Position Details**\n\n"
+    "🏷️ ID: `{position_id}`\n"
+    "🎯 Asset: {asset}\n"
+    "💰 Collateral: {collateral}\n"
+    "💸 Debt: {debt}\n"
+    "📈 LTV: {ltv}\n"
+    "🔥 Health Factor: {health_factor}\n"
+    "⚡ Liquidation Price: {liquidation_price}\n\n"
+    "🛡️ SafetyVault Ready: {status}"
+).format
+
+_protection = (
+    "🛡️ **Protection Activated!**\n\n"
+    "✅ Secure HMAC-signed deeplink generated\n"
+    "🔐 Position: `{position_id}`\n"
+    "👤 User: `{user_id}`\n\n"
+    "Click below to open BlendGuard protection interface:"
+).format
+
+_contract = """
+🔗 **BlendGuard Contract Info**
+
+**SafetyVault Contract:**
+`{contract_id}`
+
+**Network:** {network}
+**Version:** {version}
+
+This contract protects your lending positions through automated safety actions.
+""".format
+
+# Statuses scoring above (strictly) this risk get a protect button
+STATUS_PROTECT_THRESHOLD = 0.7
+
+
+def risk_emoji(risk_score: Optional[float]) -> str:
+    if risk_score is None:
+        return "⚪"
+    return "🔴" if risk_score > 0.8 else "🟡" if risk_score > 0.6 else "🟢"
+
+
+def metric(value: Optional[float], spec: str, prefix: str = '') -> str:
+    """``value`` formatted with ``spec``, or MISSING_VALUE when the store has none"""
+    return MISSING_VALUE if value is None else prefix + format(value, spec)
+
+
+def shown(value: Any) -> Any:
+    """``value`` as-is for display, or MISSING_VALUE when it is None"""
+    return MISSING_VALUE if value is None else value
+
+
+@lru_cache(maxsize=16)
+def vault_footer(contract_id: str) -> str:
+    """Shortened SafetyVault id line shared by every alert"""
+    return f"🛡️ SafetyVault: `{contract_id[:8]}...{contract_id[-8:]}`"
+
+
+@lru_cache(maxsize=16)
+def contract_text(contract_id: str, network: str, version: str) -> str:
+    """/contract reply; changes only when the contract config does"""
+    return _contract(contract_id=contract_id, network=network, version=version)
+
+
+def render_contract(contract_info: Dict[str, Any]) -> str:
+    return contract_text(contract_info['contract_id'], contract_info['network'], contract_info['version'])
+
+
+# Keyboards. PTB objects are immutable, so cached instances are safe to share.
+
+@lru_cache(maxsize=65536)
+def protect_button(position_id: str, label: str = "🛡️ Activate Protection") -> InlineKeyboardButton:
+    return InlineKeyboardButton(label, callback_data=f"protect_{position_id}")
+
+
+@lru_cache(maxsize=65536)
+def alert_keyboard(position_id: str) -> InlineKeyboardMarkup:
+    """Protect + details buttons under a single-position alert"""
+    return InlineKeyboardMarkup([[
+        protect_button(position_id),
+        InlineKeyboardButton("📊 View Details", callback_data=f"details_{position_id}"),
+    ]])
+
+
+@lru_cache(maxsize=65536)
+def protect_keyboard(position_id: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[protect_button(position_id)]])
+
+
+@lru_cache(maxsize=1024)
+def explorer_keyboard(tx_hash: str, label: str = "View on Explorer") -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton(label, url=EXPLORER_TX_URL.format(tx_hash))]])
+
+
+def asset_protect_button(position: Dict[str, Any]) -> InlineKeyboardButton:
+    asset = position.get('asset', 'Unknown')
+    return protect_button(str(position['id']), f"🛡️ Activate Protection - {asset}")
+
+
+def protection_link_keyboard(deeplink: str) -> InlineKeyboardMarkup:
+    # Signed per user, so not cached
+    return InlineKeyboardMarkup([[InlineKeyboardButton("🛡️ Open Protection App", url=deeplink)]])
+
+
+# Renderers
+
+def render_alert(position: Dict[str, Any], risk_score: float, contract_id: str) -> Rendered:
+    """Single-position liquidation risk alert"""
+    text = _alert(
+        asset=position.get('asset', 'Unknown'),
+        risk_score=risk_score,
+        amount=metric(position.get('amount', 0), ',.2f', '$'),
+        health_factor=shown(position.get('health_factor')),
+        vault=vault_footer(contract_id),
+    )
+    return text, alert_keyboard(str(position['id']))
+
+
+def render_alerts(alerts: Iterable[Tuple[Dict[str, Any], float]], contract_id: str) -> List[Rendered]:
+    """Render many single-position alerts in one pass"""
+    vault = vault_footer(contract_id)
+    rendered = []
+    append = rendered.append
+    for position, risk_score in alerts:
+        append((
+            _alert(
+                asset=position.get('asset', 'Unknown'),
+                risk_score=risk_score,
+                amount=metric(position.get('amount', 0), ',.2f', '$'),
+                health_factor=shown(position.get('health_factor')),
+                vault=vault,
+            ),
+            alert_keyboard(str(position['id'])),
+        ))
+    return rendered
+
+
+def render_alert_summary(alerts: Sequence[Dict[str, Any]], contract_id: str, max_positions: int) -> Rendered:
+    """One /status-style alert for several positions, riskiest first.
+
+    ``alerts`` are {'position': ..., 'risk_score': ...} items as queued by the coalescer.
+    """
+    alerts = sorted(alerts, key=lambda alert: alert['risk_score'], reverse=True)
+    parts = [_summary_header(count=len(alerts))]
+    rows = []
+    for alert in alerts[:max_positions]:
+        position, risk_score = alert['position'], alert['risk_score']
+        parts.append(_summary_line(
+            emoji=risk_emoji(risk_score),
+            asset=position.get('asset', 'Unknown'),
+            amount=metric(position.get('amount', 0), ',.0f', '$'),
+            risk_score=risk_score,
+            health_factor=shown(position.get('health_factor')),
+        ))
+        rows.append([asset_protect_button(position)])
+    if len(alerts) > max_positions:
+        parts.append(_summary_more(count=len(alerts) - max_positions))
+    parts.append(_summary_footer(vault=vault_footer(contract_id)))
+    return "".join(parts), InlineKeyboardMarkup(rows)
+
+
+def render_status(positions: Sequence[Dict[str, Any]]) -> Rendered:
+    """/status reply listing every position, with protect buttons for risky ones.
+
+    Metrics the store has no value for (None) render as MISSING_VALUE.
+    """
+    if not positions:
+        return NO_POSITIONS_TEXT, None
+    parts = [STATUS_HEADER]
+    rows = []
+    for position in positions:
+        risk_score = position['risk_score']
+        parts.append(_status_line(
+            emoji=risk_emoji(risk_score),
+            asset=position['asset'],
+            amount=metric(position['amount'], ',.0f', '$'),
+            risk_score=metric(risk_score, '.0%'),
+            health_factor=metric(position['health_factor'], '.2f'),
+        ))
+        if risk_score is not None and risk_score > STATUS_PROTECT_THRESHOLD:
+            rows.append([asset_protect_button(position)])
+    return "".join(parts), InlineKeyboardMarkup(rows) if rows else None
+
+
+def render_position_details(position_id: str, details: Dict[str, Any], vault_status: str) -> Rendered:
+    text = _details(
+        position_id=position_id,
+        asset=details.get('asset', 'Unknown'),
+        collateral=metric(details.get('collateral', 0), ',.2f', '$'),
+        debt=metric(details.get('debt', 0), ',.2f', '$'),
+        ltv=metric(details.get('ltv', 0), '.1%'),
+        health_factor=shown(details.get('health_factor')),
+        liquidation_price=metric(details.get('liquidation_price', 0), ',.2f', '$'),
+        status=vault_status,
+    )
+    return text, protect_keyboard(position_id)
+
+
+def render_protection_link(position_id: str, user_id: str, deeplink: str) -> Rendered:
+    return _protection(position_id=position_id, user_id=user_id), protection_link_keyboard(deeplink)
+
+
+def render_demo() -> Rendered:
+    return DEMO_TEXT, explorer_keyboard(DEMO_TX_HASH)
@@ -0,0 +1,199 @@
+"""
+Process-wide Model Registry for the BlendGuard risk engine
+Keeps named, versioned LiquidationPredictor instances shared by every caller
+and hot-swaps them atomically when a new model.pkl is rolled out.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from risk_engine import LiquidationPredictor
+from score_cache import ScoreCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = "liquidation"
+DEFAULT_MODEL_PATH = os.getenv("RISK_MODEL_PATH", "model.pkl")
+DEFAULT_ENGINE = os.getenv("RISK_MODEL_ENGINE", "sklearn")
+RISK_CACHE_ENABLED = os.getenv("RISK_CACHE_ENABLED", "true").lower() == "true"
+HISTORY_LIMIT = 10
+# Loads attempted before giving up on a model file that keeps changing underneath us
+REGISTER_ATTEMPTS = 3
+
+
+@dataclass(frozen=True)
+class ModelVersion:
+    """One immutable, fully loaded model version"""
+    name: str
+    version: str
+    path: str
+    predictor: LiquidationPredictor = field(repr=False, compare=False)
+    file_mtime_ns: int
+    file_size: int
+    loaded_at: float
+
+
+def _file_identity(path: str) -> Optional[Tuple[int, int, int]]:
+    """(inode, mtime, size) of ``path``, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Named model slots whose current version can be swapped under load.
+
+    Callers grab the current ModelVersion once per prediction, so a reload never
+    interrupts a prediction already running on the previous version.
+    """
+
+    def __init__(self, cache: Optional[ScoreCache] = None):
+        # Shared by every version; keys carry the version so a swap never serves stale scores
+        self.cache = cache
+        self._current: Dict[str, ModelVersion] = {}
+        self._history: Dict[str, List[ModelVersion]] = {}
+        self._sequence: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+    def register(self, name: str, path: str, engine: str = DEFAULT_ENGINE) -> ModelVersion:
+        """Load the model at ``path`` and make it the current version of ``name``.
+
+        The file is statted and hashed before the load and statted again after
+        it; if it was replaced in between the load is retried, so the version
+        and digest always describe the model actually being served.
+        """
+        path = os.path.abspath(path)
+        for attempt in range(REGISTER_ATTEMPTS):
+            identity = _file_identity(path)
+            digest = _file_digest(path) if identity else None
+            predictor = LiquidationPredictor(path, engine=engine, lazy=False, cache=self.cache)
+            if identity is None:
+                # The predictor wrote a fallback model; load it back as a real file
+                continue
+            if _file_identity(path) == identity:
+                break
+            logger.warning(f"Model file {path} changed while loading {name}, retrying")
+        else:
+            raise RuntimeError(f"Model file {path} kept changing during {REGISTER_ATTEMPTS} load attempts")
+        _, mtime_ns, size = identity
+
+        with self._lock:
+            sequence = self._sequence.get(name, 0) + 1
+            version = f"v{sequence}-{digest[:8]}"
+            predictor.version = version
+            model_version = ModelVersion(
+                name=name,
+                version=version,
+                path=path,
+                predictor=predictor,
+                file_mtime_ns=mtime_ns,
+                file_size=size,
+                loaded_at=time.time(),
+            )
+            self._sequence[name] = sequence
+            # A single reference swap; readers see either the old or the new version
+            self._current[name] = model_version
+            history = self._history.setdefault(name, [])
+            history.append(model_version)
+            del history[:-HISTORY_LIMIT]
+
+        logger.info(f"Model {name} now serving {model_version.version} from {path}")
+        return model_version
+
+    def get(self, name: str = DEFAULT_MODEL_NAME) -> ModelVersion:
+        """Return the current version of ``name``"""
+        try:
+            return self._current[name]
+        except KeyError:
+            raise KeyError(f"No model registered under {name!r}") from None
+
+    def reload(self, name: str = DEFAULT_MODEL_NAME, path: Optional[str] = None) -> ModelVersion:
+        """Load a new version (from ``path`` or the current file) and swap it in"""
+        current = self.get(name)
+        return self.register(name, path or current.path, engine=current.predictor.engine)
+
+    def maybe_reload(self, name: str = DEFAULT_MODEL_NAME) -> Optional[ModelVersion]:
+        """Reload ``name`` if its model file changed on disk since it was loaded"""
+        current = self.get(name)
+        try:
+            stat = os.stat(current.path)
+        except FileNotFoundError:
+            logger.warning(f"Model file for {name} disappeared: {current.path}")
+            return None
+        if (stat.st_mtime_ns, stat.st_size) == (current.file_mtime_ns, current.file_size):
+            return None
+        try:
+            return self.reload(name)
+        except Exception as e:
+            # Keep serving the previous version if the new file is bad
+            logger.error(f"Failed to reload model {name}: {str(e)}")
+            return None
+
+    def versions(self, name: str = DEFAULT_MODEL_NAME) -> List[str]:
+        """Recently loaded versions of ``name``, oldest first"""
+        return [v.version for v in self._history.get(name, [])]
+
+    def predict(self, position_data: dict, name: str = DEFAULT_MODEL_NAME) -> Tuple[float, str]:
+        """Score one position, returning (risk_score, model version)"""
+        model_version = self.get(name)
+        return model_version.predictor.predict(position_data), model_version.version
+
+    def predict_batch(self, positions: Any, name: str = DEFAULT_MODEL_NAME,
+                      chunk_size: Optional[int] = None) -> Tuple[np.ndarray, str]:
+        """Score many positions against one version, returning (scores, model version)"""
+        model_version = self.get(name)
+        return model_version.predictor.predict_batch(positions, chunk_size=chunk_size), model_version.version
+
+    def start_watching(self, interval: float = 5.0):
+        """Poll registered model files in a daemon thread and hot-reload on change"""
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._stop_watching.clear()
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                for name in list(self._current):
+                    self.maybe_reload(name)
+
+        self._watcher = threading.Thread(target=watch, name="model-registry-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        if self._watcher:
+            self._watcher.join()
+            self._watcher = None
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """Return the process-wide registry, registering the default liquidation model on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = ModelRegistry(cache=ScoreCache() if RISK_CACHE_ENABLED else None)
+                registry.register(DEFAULT_MODEL_NAME, DEFAULT_MODEL_PATH)
+                _registry = registry
+    return _registry
@@ -0,0 +1,118 @@
+"""
+Model Store for the BlendGuard risk engine
+Loads model.pkl lazily and guards first-time training with a file lock plus
+atomic rename, so concurrent workers never train twice or read a half-written
+file.
+"""
+import os
+import time
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+import joblib
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms fall back to atomic rename only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# joblib mmap_mode for model.pkl; off by default because it only maps plain
+# ndarrays, and a forest's tree arrays are unpickled into every process anyway.
+# Workers that must share model pages use CompiledForest.save/load instead
+DEFAULT_MMAP_MODE = os.getenv("RISK_MODEL_MMAP_MODE") or None
+
+
+class ModelStore:
+    """Lazily loaded, process-safe handle on a joblib model file"""
+
+    def __init__(self, path: str, trainer: Optional[Callable[[], Any]] = None,
+                 mmap_mode: Optional[str] = DEFAULT_MMAP_MODE):
+        self.path = os.path.abspath(path)
+        self.trainer = trainer
+        self.mmap_mode = mmap_mode
+        self._model = None
+        self._lock = threading.Lock()
+        self.metrics: Dict[str, Any] = {
+            'load_seconds': None,
+            'train_seconds': None,
+            'trained': False,
+            'loaded_at': None,
+        }
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def get(self) -> Any:
+        """Return the model, loading (and if needed training) it on first use"""
+        model = self._model
+        if model is not None:
+            return model
+        with self._lock:
+            if self._model is None:
+                self._model = self._load()
+            return self._model
+
+    def reset(self):
+        """Drop the loaded model so the next get() reads the file again"""
+        with self._lock:
+            self._model = None
+
+    def _load(self) -> Any:
+        started = time.perf_counter()
+        if not os.path.exists(self.path):
+            self._train_and_dump()
+
+        model = joblib.load(self.path, mmap_mode=self.mmap_mode)
+        elapsed = time.perf_counter() - started
+        self.metrics['load_seconds'] = elapsed
+        self.metrics['loaded_at'] = time.time()
+        logger.info(f"Loaded risk model {self.path} in {elapsed * 1000:.1f}ms (mmap_mode={self.mmap_mode})")
+        return model
+
+    def _train_and_dump(self):
+        if self.trainer is None:
+            raise FileNotFoundError(f"Risk model not found at {self.path}")
+
+        with self._file_lock():
+            # Another process may have finished training while we waited on the lock
+            if os.path.exists(self.path):
+                return
+            started = time.perf_counter()
+            model = self.trainer()
+            self.dump(model)
+            self.metrics['train_seconds'] = time.perf_counter() - started
+            self.metrics['trained'] = True
+            logger.info(f"Trained fallback risk model in {self.metrics['train_seconds']:.2f}s")
+
+    def dump(self, model: Any):
+        """Write the model next to its final path, then atomically rename it into place"""
+        directory = os.path.dirname(self.path)
+        fd, tmp_path = tempfile.mkstemp(prefix='.model-', suffix='.pkl.tmp', dir=directory)
+        os.close(fd)
+        try:
+            # Uncompressed dumps are required for mmap_mode loading
+            joblib.dump(model, tmp_path)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", 'a+') as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
@@ -8,6 +8,7 @@ import logging
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from alert_bot import send_alert
+from api.notify import format_actions, notify_bulk
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -45,15 +46,8 @@ TX Hash: `{tx_hash}`
 📊 *Actions Executed:*
 """
         
-        for action in actions:
-            action_type = action.get('action_type', 'Unknown')
-            amount = action.get('amount', 0)
-            asset_id = action.get('asset_id', '')
-            
-            if amount > 0:
-                formatted_message += f"• {action_type}: {amount:,.0f} {asset_id}\n"
-            else:
-                formatted_message += f"• {action_type}\n"
+        if actions:
+            formatted_message += format_actions(actions) + "\n"
         
         formatted_message += f"\n🎉 Your position is now protected from liquidation!"
         
@@ -88,6 +82,9 @@ TX Hash: `{tx_hash}`
         logger.error(f"Error processing notification request: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+# Batched SafetyVault executions notify every affected user in one request
+app.add_url_rule('/api/notify-telegram/bulk', view_func=notify_bulk, methods=['POST'])
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
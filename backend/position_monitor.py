@@ -0,0 +1,355 @@
+"""
+Position Monitor for BlendGuard
+Keeps re-scoring the position book with LiquidationPredictor. Positions sit in
+priority tiers by distance to liquidation: near-liquidation positions are
+checked every few seconds, healthy ones every few minutes. Positions crossing
+the alert threshold are handed to the alert pipeline.
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+from collections import deque
+from dataclasses import dataclass
+from itertools import takewhile
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from position_store import PositionStore, get_position_store
+from score_table import RISK_TABLE_ENABLED, ScoreTable
+from update_processor import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Tier boundaries on distance_to_liquidation (fraction of collateral value the price can fall)
+MONITOR_CRITICAL_DISTANCE = float(os.getenv("MONITOR_CRITICAL_DISTANCE", "0.05"))
+MONITOR_WARNING_DISTANCE = float(os.getenv("MONITOR_WARNING_DISTANCE", "0.20"))
+# Re-check interval per tier, in seconds
+MONITOR_CRITICAL_INTERVAL = float(os.getenv("MONITOR_CRITICAL_INTERVAL", "5"))
+MONITOR_WARNING_INTERVAL = float(os.getenv("MONITOR_WARNING_INTERVAL", "30"))
+MONITOR_HEALTHY_INTERVAL = float(os.getenv("MONITOR_HEALTHY_INTERVAL", "300"))
+# Scoring batches in flight at once, and positions per batch
+MONITOR_CONCURRENCY = int(os.getenv("MONITOR_CONCURRENCY", "2"))
+MONITOR_BATCH_SIZE = int(os.getenv("MONITOR_BATCH_SIZE", "4096"))
+# Positions scoring at or above this are alerted once per upward crossing
+MONITOR_ALERT_THRESHOLD = float(os.getenv("MONITOR_ALERT_THRESHOLD", "0.7"))
+# How often tier lag summaries are logged (0 disables)
+MONITOR_METRICS_LOG_SECONDS = float(os.getenv("MONITOR_METRICS_LOG_SECONDS", "300"))
+
+# Longest idle sleep, so newly stored positions are picked up promptly
+DISCOVERY_INTERVAL = 1.0
+
+Alert = Callable[[str, Dict[str, Any], float], Any]
+Predictor = Callable[[], Any]
+
+
+@dataclass(frozen=True)
+class Tier:
+    """Positions closer to liquidation than ``max_distance`` are checked every ``interval`` seconds"""
+    name: str
+    max_distance: float
+    interval: float
+
+
+DEFAULT_TIERS = (
+    Tier('critical', MONITOR_CRITICAL_DISTANCE, MONITOR_CRITICAL_INTERVAL),
+    Tier('warning', MONITOR_WARNING_DISTANCE, MONITOR_WARNING_INTERVAL),
+    Tier('healthy', float('inf'), MONITOR_HEALTHY_INTERVAL),
+)
+
+
+def alert_crossings(scores: np.ndarray, threshold: float, alerted: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """The alert decision for a batch: (alert now, alerted afterwards) masks.
+
+    A position alerts when its score reaches ``threshold`` while it is not
+    already alerted, and stays silent until its score falls back below.
+    """
+    above = scores >= threshold
+    return above & ~alerted, above
+
+
+def _registry_predictor():
+    # Resolved per batch so hot-reloaded model versions are picked up
+    from model_registry import get_registry
+
+    return get_registry().get().predictor
+
+
+class PositionMonitor:
+    """Tiered re-scoring scheduler over a PositionStore.
+
+    Each tier has a fixed interval, so its queue of (due, row) entries stays in
+    due order by appending. A row's current due time is kept separately; queue
+    entries that no longer match it are stale and skipped, which lets a row be
+    moved between tiers or expedited without searching the queues.
+    """
+
+    def __init__(self, store: Optional[PositionStore] = None, alert: Optional[Alert] = None,
+                 predictor: Predictor = _registry_predictor, tiers: Sequence[Tier] = DEFAULT_TIERS,
+                 concurrency: int = MONITOR_CONCURRENCY, batch_size: int = MONITOR_BATCH_SIZE,
+                 threshold: float = MONITOR_ALERT_THRESHOLD, log_interval: float = MONITOR_METRICS_LOG_SECONDS,
+                 table: Optional[ScoreTable] = None):
+        if not tiers or tiers[-1].max_distance != float('inf'):
+            raise ValueError("The last monitoring tier must cover every remaining distance")
+        self.store = store or get_position_store()
+        self.alert = alert
+        self.predictor = predictor
+        self.tiers = tuple(tiers)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.threshold = threshold
+        self.log_interval = log_interval
+        # Fresh scores are published here for /status readers in other processes
+        self.table = table
+        self._bounds = np.array([tier.max_distance for tier in self.tiers[:-1]])
+        self._queues: List[Deque[Tuple[float, int]]] = [deque() for _ in self.tiers]
+        # Expedited rows, checked ahead of every tier and counted as the first tier
+        self._expedited: Deque[Tuple[float, int]] = deque()
+        # Per row: current due time (None while being checked) and tier index
+        self._due: List[Optional[float]] = []
+        self._tier_of: List[int] = []
+        self._alerted = np.zeros(0, dtype=bool)
+        self.lag = [LatencyHistogram() for _ in self.tiers]
+        self.metrics = {'checked': 0, 'batches': 0, 'unscored': 0, 'alerts': 0, 'errors': 0,
+                        'score_seconds': 0.0}
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Future] = None
+
+    def tier_for(self, distances: np.ndarray) -> np.ndarray:
+        """Tier index per distance; unknown distances go to the middle tier"""
+        tiers = np.searchsorted(self._bounds, distances, side='right')
+        return np.where(np.isnan(distances), min(1, len(self.tiers) - 1), tiers)
+
+    def _schedule(self, rows: np.ndarray, now: float, tiers: Optional[np.ndarray] = None):
+        if tiers is None:
+            tiers = self.tier_for(self.store.column('distance_to_liquidation', rows))
+        queues, intervals = self._queues, [tier.interval for tier in self.tiers]
+        for row, tier in zip(rows.tolist(), tiers.tolist()):
+            due = now + intervals[tier]
+            self._due[row] = due
+            self._tier_of[row] = tier
+            queues[tier].append((due, row))
+
+    def _discover(self, now: float):
+        """Queue rows added to the store since the last pass, due immediately"""
+        known, size = len(self._due), len(self.store)
+        if size <= known:
+            return
+        self._due.extend([None] * (size - known))
+        self._tier_of.extend([0] * (size - known))
+        self._alerted = np.concatenate([self._alerted, np.zeros(size - known, dtype=bool)])
+        rows = np.arange(known, size, dtype=np.intp)
+        tiers = self.tier_for(self.store.column('distance_to_liquidation', rows))
+        for row, tier in zip(rows.tolist(), tiers.tolist()):
+            self._due[row] = now
+            self._tier_of[row] = tier
+            self._queues[tier].append((now, row))
+
+    def expedite(self, position_ids: Sequence[str]):
+        """Check these positions on the next pass (e.g. after a market move); thread-safe"""
+        now = time.monotonic()
+        for position_id in position_ids:
+            row = self.store.row_of(position_id)
+            if row is None or row >= len(self._due) or self._due[row] is None:
+                continue
+            self._due[row] = now
+            self._expedited.append((now, row))
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _take_due(self, now: float) -> List[Tuple[int, List[int], List[float]]]:
+        """Pop due rows, most urgent tier first, as (tier, rows, due times) batches"""
+        batches = []
+        due_of = self._due
+        for index, queue in enumerate(self._queues):
+            rows, dues = [], []
+            for source in ((self._expedited, queue) if index == 0 else (queue,)):
+                while source and source[0][0] <= now:
+                    due, row = source.popleft()
+                    if due_of[row] != due:
+                        continue  # stale: rescheduled or already in flight
+                    due_of[row] = None
+                    rows.append(row)
+                    dues.append(due)
+                    if len(rows) == self.batch_size:
+                        batches.append((index, rows, dues))
+                        rows, dues = [], []
+            if rows:
+                batches.append((index, rows, dues))
+        return batches
+
+    def _next_due(self) -> Optional[float]:
+        heads = [queue[0][0] for queue in (self._expedited, *self._queues) if queue]
+        return min(heads) if heads else None
+
+    def _score(self, rows: np.ndarray) -> np.ndarray:
+        """Score rows with complete features; others keep their stored score"""
+        features = self.store.features(rows)
+        complete = ~np.isnan(features).any(axis=1)
+        if complete.any():
+            scored = rows if complete.all() else rows[complete]
+            self.store.score(self.predictor(), scored)
+        self.metrics['unscored'] += int((~complete).sum())
+        scores = self.store.column('risk_score', rows)
+        if self.table is not None:
+            ids = self.store.ids
+            self.table.publish([ids[row] for row in rows.tolist()], scores,
+                               self.store.column('health_factor', rows))
+        return scores
+
+    async def _check(self, tier: int, rows: List[int], dues: List[float], slots: asyncio.Semaphore):
+        loop = asyncio.get_running_loop()
+        row_array = np.array(rows, dtype=np.intp)
+        started = time.monotonic()
+        lag = self.lag[tier]
+        for due in dues:
+            lag.observe(max(0.0, started - due))
+        try:
+            scores = await loop.run_in_executor(None, self._score, row_array)
+            self.metrics['score_seconds'] += time.monotonic() - started
+            self.metrics['checked'] += len(rows)
+            self.metrics['batches'] += 1
+            alerts = self._alert_crossings(row_array, scores)
+            if alerts:
+                # Raising an alert may wait on alert-queue backpressure; keep that off the loop
+                await loop.run_in_executor(None, self._raise_alerts, alerts)
+        except Exception as e:
+            self.metrics['errors'] += 1
+            logger.error(f"Failed to check {len(rows)} {self.tiers[tier].name} positions: {str(e)}")
+        finally:
+            slots.release()
+            self._schedule(row_array, time.monotonic())
+
+    def _alert_crossings(self, rows: np.ndarray, scores: np.ndarray) -> List[Tuple[str, Dict[str, Any], float]]:
+        """(user_id, position, score) for rows that just crossed the threshold upwards"""
+        crossed, self._alerted[rows] = alert_crossings(scores, self.threshold, self._alerted[rows])
+        alerts = []
+        for row, score in zip(rows[crossed].tolist(), scores[crossed].tolist()):
+            user_id = self.store.user_ids[row]
+            if user_id is None or self.alert is None:
+                continue
+            self.metrics['alerts'] += 1
+            alerts.append((user_id, self.store.to_dict(row), score))
+        return alerts
+
+    def _raise_alerts(self, alerts: List[Tuple[str, Dict[str, Any], float]]):
+        for user_id, position, score in alerts:
+            try:
+                self.alert(user_id, position, score)
+            except Exception as e:
+                logger.error(f"Failed to raise alert for {position.get('id')}: {str(e)}")
+
+    async def run(self):
+        """Check due positions forever; cancel the task to stop"""
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.concurrency)
+        pending: Set[asyncio.Task] = set()
+        last_log = time.monotonic()
+        logger.info(f"Position monitor started: {', '.join(f'{t.name} every {t.interval:g}s' for t in self.tiers)}")
+        try:
+            while True:
+                now = time.monotonic()
+                self._discover(now)
+                for tier, rows, dues in self._take_due(now):
+                    # Waiting here is backpressure: unscored work shows up as lag
+                    await slots.acquire()
+                    task = asyncio.create_task(self._check(tier, rows, dues, slots))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+
+                if self.log_interval > 0 and now - last_log >= self.log_interval:
+                    self.log_summary()
+                    last_log = now
+
+                next_due = self._next_due()
+                timeout = DISCOVERY_INTERVAL if next_due is None else min(DISCOVERY_INTERVAL, next_due - time.monotonic())
+                if timeout > 0:
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self._loop = None
+            for task in pending:
+                task.cancel()
+            self.log_summary()
+
+    def start(self, loop=None) -> asyncio.Future:
+        """Run on ``loop`` (default: the shared background loop)"""
+        if self._task is None or self._task.done():
+            if loop is None:
+                from async_runner import get_background_loop
+
+                self._task = get_background_loop().submit(self.run())
+            else:
+                self._task = asyncio.run_coroutine_threadsafe(self.run(), loop)
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def log_summary(self):
+        for tier, stats in self.stats()['tiers'].items():
+            logger.info(
+                f"Monitor tier {tier}: {stats['positions']} positions every {stats['interval_seconds']:g}s, "
+                f"{stats['overdue']} overdue, lag p95 <= {stats['lag']['p95_seconds']:g}s, "
+                f"max {stats['lag']['max_seconds']:.2f}s"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        counts = np.bincount(np.array(self._tier_of, dtype=np.intp), minlength=len(self.tiers))
+        tiers = {}
+        for index, tier in enumerate(self.tiers):
+            due_of = self._due
+            overdue = sum(1 for due, row in takewhile(lambda entry: entry[0] <= now, self._queues[index])
+                          if due_of[row] == due)
+            tiers[tier.name] = {
+                'positions': int(counts[index]),
+                'interval_seconds': tier.interval,
+                'max_distance': tier.max_distance,
+                'overdue': overdue,
+                'lag': self.lag[index].to_dict(),
+            }
+        return dict(self.metrics, tracked=len(self._due), alerted=int(self._alerted.sum()), tiers=tiers)
+
+
+def main():
+    """Run the monitor standalone, feeding alerts to the bot's alert pipeline"""
+    parser = argparse.ArgumentParser(description="BlendGuard position monitor")
+    parser.add_argument('--duration', type=float, default=0, help="Stop after this many seconds (0 = forever)")
+    parser.add_argument('--no-alerts', action='store_true', help="Score and report without sending alerts")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    alert = None
+    if not args.no_alerts:
+        from alert_bot import get_alert_coalescer, send_alert
+
+        # Start the alert pipeline before the monitor's loop needs it
+        get_alert_coalescer()
+        alert = send_alert
+    monitor = PositionMonitor(alert=alert, table=ScoreTable.create() if RISK_TABLE_ENABLED else None)
+
+    async def run():
+        task = asyncio.ensure_future(monitor.run())
+        try:
+            await asyncio.wait_for(asyncio.shield(task), args.duration or None)
+        except asyncio.TimeoutError:
+            task.cancel()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
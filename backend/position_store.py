@@ -0,0 +1,266 @@
+"""
+Columnar Position Store for BlendGuard
+Single source of position data for the bot, the API and the risk engine.
+Numeric fields live in NumPy columns so LiquidationPredictor batches can be
+fed without materializing a dict per position.
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from risk_engine import FEATURES
+from risk_math import compute_risk_metrics
+
+# Float columns; the model's input features are stored alongside the position fields
+NUMERIC_COLUMNS = (
+    'collateral', 'debt', 'ltv', 'health_factor', 'risk_score', 'liquidation_price',
+    'collateral_amount', 'distance_to_liquidation',
+) + tuple(k for k in FEATURES if k != 'ltv')
+
+INITIAL_CAPACITY = 1024
+DEMO_USER_ID = 'demo'
+
+
+class PositionStore:
+    """Append-mostly columnar table of positions indexed by id and Telegram user id"""
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self._lock = threading.RLock()
+        self.size = 0
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.full(capacity, np.nan, dtype=np.float64) for name in NUMERIC_COLUMNS
+        }
+        self.ids: List[str] = []
+        self.user_ids: List[Optional[str]] = []
+        self.assets: List[str] = []
+        self.pools: List[str] = []
+        self.statuses: List[str] = []
+        # Integer asset code per row, indexing the per-asset price/factor arrays
+        self.asset_index = np.zeros(capacity, dtype=np.intp)
+        self.asset_codes: List[str] = []
+        self._asset_code_index: Dict[str, int] = {}
+        # Integer pool code per row, so per-pool lookups are one vectorized compare
+        self.pool_index = np.zeros(capacity, dtype=np.intp)
+        self.pool_codes: List[str] = []
+        self._pool_code_index: Dict[str, int] = {}
+        self._row_by_id: Dict[str, int] = {}
+        self._rows_by_user: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def upsert(self, position_id: str, user_id: Optional[str] = None, asset: str = '', pool: str = '',
+               status: str = '', **values: float) -> int:
+        """Insert or update a position; numeric fields are passed by column name"""
+        unknown = set(values) - set(NUMERIC_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown position columns: {sorted(unknown)}")
+
+        with self._lock:
+            row = self._row_by_id.get(position_id)
+            if row is None:
+                row = self._append(position_id, user_id, asset, pool, status)
+            else:
+                if user_id is not None and user_id != self.user_ids[row]:
+                    self._reindex_user(row, user_id)
+                if asset:
+                    self.assets[row] = asset
+                    self.asset_index[row] = self._asset_code(asset)
+                if pool:
+                    self.pools[row] = pool
+                    self.pool_index[row] = self._pool_code(pool)
+                if status:
+                    self.statuses[row] = status
+            for name, value in values.items():
+                self.columns[name][row] = value
+            return row
+
+    def row_of(self, position_id: str) -> Optional[int]:
+        return self._row_by_id.get(position_id)
+
+    def rows_for_user(self, user_id: str) -> np.ndarray:
+        return np.array(self._rows_by_user.get(str(user_id), ()), dtype=np.intp)
+
+    def rows_for_asset(self, asset: str) -> np.ndarray:
+        code = self._asset_code_index.get(asset)
+        if code is None:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self.asset_index[:self.size] == code)
+
+    def rows_for_pool(self, pool: str) -> np.ndarray:
+        code = self._pool_code_index.get(pool)
+        if code is None:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self.pool_index[:self.size] == code)
+
+    def column(self, name: str, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """View of a numeric column over all rows, or a copy over selected rows"""
+        values = self.columns[name][:self.size]
+        return values if rows is None else values[rows]
+
+    def features(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """(n, 4) LiquidationPredictor input matrix built straight from the columns"""
+        return np.column_stack([self.column(name, rows) for name in FEATURES])
+
+    def set_column(self, name: str, values: np.ndarray, rows: Optional[np.ndarray] = None):
+        with self._lock:
+            if rows is None:
+                self.columns[name][:self.size] = values
+            else:
+                self.columns[name][rows] = values
+
+    def score(self, predictor, rows: Optional[np.ndarray] = None, chunk_size: Optional[int] = None) -> np.ndarray:
+        """Score rows (default: all) with ``predictor.predict_batch`` and store risk_score"""
+        scores = predictor.predict_batch(self.features(rows), chunk_size=chunk_size)
+        self.set_column('risk_score', scores, rows)
+        return scores
+
+    def refresh_risk_metrics(self, prices: Dict[str, float], collateral_factors: Dict[str, float],
+                             rows: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Recompute collateral, LTV, health factor and liquidation price from asset prices.
+
+        Assets missing from ``prices`` or ``collateral_factors`` yield NaN metrics.
+        """
+        with self._lock:
+            price_array = np.array([prices.get(code, np.nan) for code in self.asset_codes], dtype=np.float64)
+            factor_array = np.array([collateral_factors.get(code, np.nan) for code in self.asset_codes],
+                                    dtype=np.float64)
+            asset_index = self.asset_index[:self.size] if rows is None else self.asset_index[rows]
+            metrics = compute_risk_metrics(
+                self.column('collateral_amount', rows),
+                self.column('debt', rows),
+                price_array,
+                factor_array,
+                asset_index,
+            )
+            for name, values in metrics.items():
+                self.set_column(name, values, rows)
+        return metrics
+
+    def get(self, position_id: str, camel_case: bool = False) -> Optional[Dict[str, Any]]:
+        """Materialize one position as a display dict"""
+        row = self._row_by_id.get(position_id)
+        return None if row is None else self.to_dict(row, camel_case=camel_case)
+
+    def positions_for_user(self, user_id: str, camel_case: bool = False) -> List[Dict[str, Any]]:
+        return [self.to_dict(row, camel_case=camel_case) for row in self._rows_by_user.get(str(user_id), ())]
+
+    def to_dict(self, row: int, camel_case: bool = False) -> Dict[str, Any]:
+        """Dict for a row, with the key names alert_bot (snake) or the demo bot (camel) expect"""
+        values = {name: self._value(name, row) for name in NUMERIC_COLUMNS}
+        asset = self.assets[row]
+        position = {
+            'id': self.ids[row],
+            'asset': asset,
+            'pool': self.pools[row],
+            'collateral': values['collateral'],
+            'debt': values['debt'],
+            'ltv': values['ltv'],
+            'liquidation_price': values['liquidation_price'],
+            'distance_to_liquidation': values['distance_to_liquidation'],
+            'risk_score': values['risk_score'],
+            'status': self.statuses[row],
+            'amount': values['collateral'],
+            'assets': [{'code': asset, 'amount': values['collateral']}],
+        }
+        if camel_case:
+            position['healthFactor'] = values['health_factor']
+            position['riskScore'] = position.pop('risk_score')
+            position['liquidationPrice'] = position.pop('liquidation_price')
+            position['distanceToLiquidation'] = position.pop('distance_to_liquidation')
+        else:
+            position['health_factor'] = values['health_factor']
+        return position
+
+    def _value(self, name: str, row: int) -> Optional[float]:
+        value = self.columns[name][row]
+        return None if np.isnan(value) else float(value)
+
+    def _append(self, position_id: str, user_id: Optional[str], asset: str, pool: str, status: str) -> int:
+        row = self.size
+        if row == self.columns['ltv'].shape[0]:
+            self._grow()
+        self.size += 1
+        self.ids.append(position_id)
+        self.user_ids.append(None)
+        self.assets.append(asset)
+        self.asset_index[row] = self._asset_code(asset)
+        self.pools.append(pool)
+        self.pool_index[row] = self._pool_code(pool)
+        self.statuses.append(status)
+        self._row_by_id[position_id] = row
+        if user_id is not None:
+            self._reindex_user(row, user_id)
+        return row
+
+    def _reindex_user(self, row: int, user_id: str):
+        previous = self.user_ids[row]
+        if previous is not None:
+            self._rows_by_user[previous].remove(row)
+        user_id = str(user_id)
+        self.user_ids[row] = user_id
+        self._rows_by_user.setdefault(user_id, []).append(row)
+
+    def _asset_code(self, asset: str) -> int:
+        code = self._asset_code_index.get(asset)
+        if code is None:
+            code = len(self.asset_codes)
+            self.asset_codes.append(asset)
+            self._asset_code_index[asset] = code
+        return code
+
+    def _pool_code(self, pool: str) -> int:
+        code = self._pool_code_index.get(pool)
+        if code is None:
+            code = len(self.pool_codes)
+            self.pool_codes.append(pool)
+            self._pool_code_index[pool] = code
+        return code
+
+    def _grow(self):
+        for name, values in self.columns.items():
+            grown = np.full(values.shape[0] * 2, np.nan, dtype=np.float64)
+            grown[:values.shape[0]] = values
+            self.columns[name] = grown
+        grown_index = np.zeros(self.asset_index.shape[0] * 2, dtype=np.intp)
+        grown_index[:self.asset_index.shape[0]] = self.asset_index
+        self.asset_index = grown_index
+        grown_pools = np.zeros(self.pool_index.shape[0] * 2, dtype=np.intp)
+        grown_pools[:self.pool_index.shape[0]] = self.pool_index
+        self.pool_index = grown_pools
+
+
+def _seed_demo_positions(store: PositionStore):
+    # Centralized demo position - consistent with position_service.js
+    store.upsert(
+        'XLM-123',
+        user_id=DEMO_USER_ID,
+        asset='XLM',
+        pool='XLM-LENDING',
+        status='high-risk',
+        collateral=10000.00,  # USD value
+        collateral_amount=100000.00,  # XLM
+        debt=8500.00,         # USD value
+        ltv=0.85,
+        health_factor=1.15,
+        risk_score=0.85,
+        liquidation_price=0.095,
+        distance_to_liquidation=1.0 - 1.0 / 1.15,
+    )
+
+
+_store: Optional[PositionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_position_store() -> PositionStore:
+    """Return the process-wide position store, seeded with the demo position"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = PositionStore()
+                _seed_demo_positions(store)
+                _store = store
+    return _store
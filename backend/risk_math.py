@@ -0,0 +1,96 @@
+"""
+Vectorized risk math for BlendGuard positions
+Health factor, LTV, liquidation price and distance-to-liquidation for whole
+arrays of positions, broadcasting per-asset prices and collateral factors.
+
+Positions hold either one collateral asset (1-D ``collateral_amount`` with an
+``asset_index`` into the per-asset arrays) or several (2-D ``collateral_amount``
+of shape (n_positions, n_assets)).
+"""
+from typing import Dict, Optional
+
+import numpy as np
+
+
+def _per_position(values: np.ndarray, asset_index: Optional[np.ndarray]) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    return values if asset_index is None else values[asset_index]
+
+
+def collateral_value(collateral_amount: np.ndarray, prices: np.ndarray,
+                     asset_index: Optional[np.ndarray] = None) -> np.ndarray:
+    """USD value of each position's collateral"""
+    value = np.asarray(collateral_amount, dtype=np.float64) * _per_position(prices, asset_index)
+    return value.sum(axis=-1) if value.ndim == 2 else value
+
+
+def health_factor(collateral_amount: np.ndarray, debt_value: np.ndarray, prices: np.ndarray,
+                  collateral_factors: np.ndarray, asset_index: Optional[np.ndarray] = None) -> np.ndarray:
+    """Risk-adjusted collateral over debt; below 1.0 the position can be liquidated.
+
+    Positions without debt are infinitely healthy; missing (NaN) debt gives NaN.
+    """
+    weighted = (np.asarray(collateral_amount, dtype=np.float64)
+                * _per_position(prices, asset_index)
+                * _per_position(collateral_factors, asset_index))
+    if weighted.ndim == 2:
+        weighted = weighted.sum(axis=-1)
+    debt = np.asarray(debt_value, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        health = np.where(debt > 0, weighted / debt, np.inf)
+    return np.where(np.isnan(debt), np.nan, health)
+
+
+def loan_to_value(collateral_amount: np.ndarray, debt_value: np.ndarray, prices: np.ndarray,
+                  asset_index: Optional[np.ndarray] = None) -> np.ndarray:
+    """Debt over unweighted collateral value; NaN where debt or collateral value is missing"""
+    value = collateral_value(collateral_amount, prices, asset_index)
+    debt = np.asarray(debt_value, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ltv = np.where(value > 0, debt / value, np.inf)
+    return np.where(np.isnan(value) | np.isnan(debt), np.nan, ltv)
+
+
+def liquidation_price(collateral_amount: np.ndarray, debt_value: np.ndarray, prices: np.ndarray,
+                      collateral_factors: np.ndarray, asset_index: Optional[np.ndarray] = None) -> np.ndarray:
+    """Collateral price at which the health factor reaches 1.0.
+
+    For multi-asset positions this is per (position, asset), holding the other
+    collateral prices fixed. Missing inputs give NaN rather than a price.
+    """
+    amount = np.asarray(collateral_amount, dtype=np.float64)
+    price = _per_position(prices, asset_index)
+    factor = _per_position(collateral_factors, asset_index)
+    debt = np.asarray(debt_value, dtype=np.float64)
+    weighted = amount * price * factor
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if amount.ndim == 2:
+            others = weighted.sum(axis=-1, keepdims=True) - weighted
+            result = (debt[:, None] - others) / (amount * factor)
+        else:
+            result = debt / (amount * factor)
+    return np.clip(result, 0.0, None)
+
+
+def distance_to_liquidation(health: np.ndarray) -> np.ndarray:
+    """Fractional collateral price drop that would trigger liquidation (1 - 1/HF); NaN where HF is NaN"""
+    health = np.asarray(health, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        distance = np.where(health > 0, 1.0 - 1.0 / health, -np.inf)
+    return np.where(np.isnan(health), np.nan, distance)
+
+
+def compute_risk_metrics(collateral_amount: np.ndarray, debt_value: np.ndarray, prices: np.ndarray,
+                         collateral_factors: np.ndarray,
+                         asset_index: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """All risk metrics for a batch of positions in one pass"""
+    health = health_factor(collateral_amount, debt_value, prices, collateral_factors, asset_index)
+    return {
+        'collateral': collateral_value(collateral_amount, prices, asset_index),
+        'ltv': loan_to_value(collateral_amount, debt_value, prices, asset_index),
+        'health_factor': health,
+        'liquidation_price': liquidation_price(collateral_amount, debt_value, prices, collateral_factors,
+                                               asset_index),
+        'distance_to_liquidation': distance_to_liquidation(health),
+    }
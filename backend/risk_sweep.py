@@ -0,0 +1,234 @@
+"""
+Parallel risk sweeps for BlendGuard
+Partitions the position book across a process pool so full-book scoring uses
+every core. Each worker reads its shard of the feature matrix from a
+memory-mapped .npy file and writes scores straight into a shared result file;
+only (start, stop, seconds) tuples travel back over the pipe.
+
+Each worker loads the model once; unpickling copies each tree's nodes into
+the worker's own heap. Shards are far larger than COMPILED_MAX_BATCH_ROWS, so
+they are scored by sklearn's predict_proba whichever engine is selected.
+"""
+import os
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from risk_engine import DEFAULT_CHUNK_SIZE, FEATURES, LiquidationPredictor
+
+logger = logging.getLogger(__name__)
+
+RISK_SWEEP_WORKERS = int(os.getenv("RISK_SWEEP_WORKERS", "0")) or os.cpu_count() or 1
+# Shards per worker; more shards balance uneven workers at a small dispatch cost
+RISK_SWEEP_SHARDS_PER_WORKER = int(os.getenv("RISK_SWEEP_SHARDS_PER_WORKER", "4"))
+# forkserver keeps workers from inheriting the bot's threads and event loops
+RISK_SWEEP_START_METHOD = os.getenv("RISK_SWEEP_START_METHOD", "forkserver")
+# Where sweep inputs/outputs are mapped; /dev/shm keeps them in memory
+RISK_SWEEP_TMPDIR = os.getenv("RISK_SWEEP_TMPDIR") or ('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+# How long start() waits for every worker to come up
+WORKER_START_TIMEOUT = 120.0
+
+# Worker process state, set by _init_worker
+_predictor: Optional[LiquidationPredictor] = None
+_ready_barrier = None
+_mapped: Dict[str, np.ndarray] = {}
+
+
+def _init_worker(model_path: str, engine: str, barrier):
+    global _predictor, _ready_barrier
+    _ready_barrier = barrier
+    _predictor = LiquidationPredictor(model_path, engine=engine, lazy=False)
+
+
+def _ready(_) -> int:
+    # Every worker blocks here until all have initialized, so no single worker can take every task
+    _ready_barrier.wait(WORKER_START_TIMEOUT)
+    return os.getpid()
+
+
+def _mapping(path: str, mode: str) -> np.ndarray:
+    # One mapping per sweep file; dropped when the next sweep's files arrive
+    array = _mapped.get(path)
+    if array is None:
+        _mapped.clear()
+        array = _mapped[path] = np.load(path, mmap_mode=mode)
+    return array
+
+
+def _score_shard(features_path: str, results_path: str, start: int, stop: int) -> Tuple[int, int, float]:
+    started = time.perf_counter()
+    features = _mapping(features_path, 'r')
+    results = _mapping(results_path, 'r+')
+    results[start:stop] = _predictor.predict_batch(features[start:stop], chunk_size=DEFAULT_CHUNK_SIZE)
+    return start, stop, time.perf_counter() - started
+
+
+def shard_bounds(n: int, shards: int) -> List[Tuple[int, int]]:
+    """Split n rows into up to ``shards`` contiguous, near-equal ranges"""
+    shards = max(1, min(shards, n))
+    edges = np.linspace(0, n, shards + 1).astype(np.int64).tolist()
+    return [(start, stop) for start, stop in zip(edges, edges[1:]) if stop > start]
+
+
+class SweepExecutor:
+    """Scores feature matrices in parallel shards across worker processes"""
+
+    def __init__(self, model_path: str = 'model.pkl', engine: str = 'sklearn', workers: int = RISK_SWEEP_WORKERS,
+                 shards_per_worker: int = RISK_SWEEP_SHARDS_PER_WORKER,
+                 start_method: str = RISK_SWEEP_START_METHOD, tmpdir: str = RISK_SWEEP_TMPDIR):
+        self.model_path = os.path.abspath(model_path)
+        self.engine = engine
+        self.workers = workers
+        self.shards_per_worker = shards_per_worker
+        self.start_method = start_method
+        self.tmpdir = tmpdir
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.last_sweep: Dict[str, Any] = {}
+
+    @classmethod
+    def from_predictor(cls, predictor: LiquidationPredictor, **kwargs) -> 'SweepExecutor':
+        """Sweep with the same model file and engine as ``predictor``"""
+        # Train/load in the parent first so workers never race to create the file
+        predictor.warm()
+        return cls(predictor.store.path, engine=predictor.engine, **kwargs)
+
+    def start(self) -> ProcessPoolExecutor:
+        """Spawn the workers and load the model in each, once"""
+        if self._pool is None:
+            started = time.perf_counter()
+            context = multiprocessing.get_context(self.start_method)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.model_path, self.engine, context.Barrier(self.workers)),
+            )
+            # Workers spawn on demand; tasks that wait for each other force all of them up
+            try:
+                pids = set(self._pool.map(_ready, range(self.workers)))
+            except Exception:
+                self.shutdown()
+                raise
+            logger.info(f"Risk sweep pool ready: {len(pids)} workers ({self.start_method}) "
+                        f"in {time.perf_counter() - started:.2f}s")
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self) -> 'SweepExecutor':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def sweep(self, features: np.ndarray) -> np.ndarray:
+        """Score an (n, 4) feature matrix, returning float64 scores in row order"""
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim != 2 or features.shape[1] != len(FEATURES):
+            raise ValueError(f"Expected feature matrix of shape (n, {len(FEATURES)}), got {features.shape}")
+        features_path = self._temp_path('features')
+        try:
+            mapped = np.lib.format.open_memmap(features_path, mode='w+', dtype=np.float64, shape=features.shape)
+            mapped[:] = features
+            mapped.flush()
+            del mapped
+            return self.sweep_file(features_path)
+        finally:
+            _remove(features_path)
+
+    def sweep_file(self, features_path: str) -> np.ndarray:
+        """Score an (n, 4) float64 .npy file in place on disk, without loading it in the parent"""
+        n = np.load(features_path, mmap_mode='r').shape[0]
+        if n == 0:
+            return np.empty(0, dtype=np.float64)
+        pool = self.start()
+        results_path = self._temp_path('scores')
+        started = time.perf_counter()
+        try:
+            np.lib.format.open_memmap(results_path, mode='w+', dtype=np.float64, shape=(n,)).flush()
+            shards = shard_bounds(n, self.workers * self.shards_per_worker)
+            timings = list(pool.map(_score_shard, *zip(*[(features_path, results_path, start, stop)
+                                                         for start, stop in shards])))
+            scores = np.array(np.load(results_path, mmap_mode='r'))
+        finally:
+            _remove(results_path)
+
+        elapsed = time.perf_counter() - started
+        busy = sum(seconds for _, _, seconds in timings)
+        self.last_sweep = {
+            'rows': n,
+            'shards': len(shards),
+            'workers': self.workers,
+            'seconds': elapsed,
+            'rows_per_second': n / elapsed if elapsed else 0.0,
+            'worker_busy_seconds': busy,
+            'slowest_shard_seconds': max(seconds for _, _, seconds in timings),
+        }
+        return scores
+
+    def sweep_store(self, store) -> np.ndarray:
+        """Score every position with complete features and write back its risk_score.
+
+        Positions with missing features keep their stored score, as in the
+        position monitor; returns the whole risk_score column.
+        """
+        features = store.features()
+        rows = np.flatnonzero(~np.isnan(features).any(axis=1))
+        if rows.size:
+            store.set_column('risk_score', self.sweep(features[rows]), rows)
+        return store.column('risk_score').copy()
+
+    def _temp_path(self, kind: str) -> str:
+        return os.path.join(self.tmpdir, f"blendguard-sweep-{os.getpid()}-{uuid.uuid4().hex}-{kind}.npy")
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def main():
+    """Benchmark full-book sweeps against in-process scoring"""
+    parser = argparse.ArgumentParser(description="BlendGuard parallel risk sweep benchmark")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--engine', default='sklearn', choices=['sklearn', 'compiled'])
+    parser.add_argument('--model-path', default='model.pkl')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    rng = np.random.default_rng(42)
+    features = rng.normal(size=(args.rows, len(FEATURES)))
+    predictor = LiquidationPredictor(args.model_path, engine=args.engine, lazy=False)
+
+    started = time.perf_counter()
+    expected = predictor.predict_batch(features, chunk_size=DEFAULT_CHUNK_SIZE)
+    baseline = time.perf_counter() - started
+    print(f"in-process: {args.rows} rows in {baseline:.2f}s ({args.rows / baseline:,.0f} rows/s)")
+
+    for workers in args.workers:
+        with SweepExecutor.from_predictor(predictor, workers=workers) as executor:
+            scores = executor.sweep(features)
+            stats = executor.last_sweep
+        assert np.allclose(scores, expected), "parallel sweep disagrees with in-process scores"
+        speedup = baseline / stats['seconds']
+        print(f"{workers} workers: {stats['seconds']:.2f}s ({stats['rows_per_second']:,.0f} rows/s, "
+              f"speedup {speedup:.2f}x, efficiency {speedup / workers:.0%}, {stats['shards']} shards, "
+              f"{os.cpu_count()} CPUs)")
+
+
+if __name__ == '__main__':
+    main()
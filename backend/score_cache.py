@@ -0,0 +1,163 @@
+"""
+Risk Score Cache for the BlendGuard risk engine
+Bounded memoization of liquidation scores keyed on a quantized feature
+tuple plus model version, with TTL expiry and LRU eviction.
+"""
+import os
+import time
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("RISK_CACHE_MAX_ENTRIES", "250000"))
+DEFAULT_TTL_SECONDS = float(os.getenv("RISK_CACHE_TTL_SECONDS", "300"))
+# Feature changes smaller than this are treated as "unchanged"
+DEFAULT_QUANTUM = float(os.getenv("RISK_CACHE_QUANTUM", "0.0001"))
+
+# Keys are the native int64 bytes of (version tag, quantized ltv, volatility, utilization, trend)
+_KEY_STRUCT = struct.Struct('=5q')
+# Key components for non-finite features, which have no quantized value
+_NAN_KEY = -2 ** 63
+_NEG_INF_KEY = -2 ** 63 + 1
+_POS_INF_KEY = 2 ** 63 - 1
+
+
+def _component(scaled: float) -> int:
+    if scaled != scaled:
+        return _NAN_KEY
+    if scaled in (float('inf'), float('-inf')):
+        return _POS_INF_KEY if scaled > 0 else _NEG_INF_KEY
+    return round(scaled)
+
+
+@lru_cache(maxsize=64)
+def _version_tag(version: str) -> int:
+    return int.from_bytes(hashlib.blake2b(version.encode(), digest_size=8).digest(), 'little', signed=True)
+
+
+class ScoreCache:
+    """Thread-safe TTL + LRU cache of risk scores"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL_SECONDS,
+                 quantum: float = DEFAULT_QUANTUM):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.quantum = quantum
+        self._entries: 'OrderedDict[Hashable, Tuple[float, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(self, version: str, features: Sequence[float]) -> bytes:
+        """Cache key for one feature row scored by ``version``"""
+        quantum = self.quantum
+        try:
+            return _KEY_STRUCT.pack(_version_tag(version), *(round(value / quantum) for value in features))
+        except (ValueError, OverflowError):
+            # round() rejects NaN and infinity; those rows get sentinel components
+            return _KEY_STRUCT.pack(_version_tag(version), *(_component(value / quantum) for value in features))
+
+    def keys(self, version: str, features: np.ndarray) -> List[bytes]:
+        """Cache keys for every row of an (n, 4) feature matrix, built without per-row tuples"""
+        features = np.asarray(features, dtype=np.float64)
+        quantized = np.empty((features.shape[0], features.shape[1] + 1), dtype=np.int64)
+        quantized[:, 0] = _version_tag(version)
+        scaled = np.rint(features / self.quantum)
+        finite = np.isfinite(scaled)
+        if finite.all():
+            quantized[:, 1:] = scaled
+        else:
+            values = quantized[:, 1:]
+            values[:] = np.where(finite, scaled, 0.0)
+            values[np.isnan(scaled)] = _NAN_KEY
+            values[scaled == np.inf] = _POS_INF_KEY
+            values[scaled == -np.inf] = _NEG_INF_KEY
+        # Each row's raw bytes match what key() packs for the same values
+        return quantized.view(f'V{quantized.shape[1] * 8}').ravel().tolist()
+
+    def get(self, key: Hashable) -> Optional[float]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            score, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def get_many(self, keys: Sequence[Hashable]) -> List[Optional[float]]:
+        """Look up many keys under one lock acquisition; misses come back as None"""
+        now = time.monotonic()
+        results: List[Optional[float]] = []
+        append = results.append
+        with self._lock:
+            entries = self._entries
+            for key in keys:
+                entry = entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    append(None)
+                elif entry[1] <= now:
+                    del entries[key]
+                    self.expirations += 1
+                    self.misses += 1
+                    append(None)
+                else:
+                    entries.move_to_end(key)
+                    self.hits += 1
+                    append(entry[0])
+        return results
+
+    def put_many(self, items: Sequence[Tuple[Hashable, float]]):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            entries = self._entries
+            for key, score in items:
+                entries[key] = (score, expires_at)
+                entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, key: Hashable, score: float):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (score, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,306 @@
+"""
+Shared Score Table for BlendGuard
+Fixed-width risk records in a multiprocessing.shared_memory block, written by
+the scoring process (the position monitor) and read lock-free by the bot and
+API processes, so /status is a memory read instead of a model invocation.
+
+Layout: a 64-byte header followed by ``capacity`` records forming an
+open-addressing hash table keyed by a stable 64-bit hash of the position id.
+Each record carries its own sequence counter (a seqlock): the writer makes it
+odd, writes the fields, then makes it even again; readers retry a record whose
+counter was odd or changed while they copied it. There is a single writer.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Publish monitor scores to shared memory for other processes
+RISK_TABLE_ENABLED = os.getenv("RISK_TABLE_ENABLED", "true").lower() == "true"
+RISK_TABLE_NAME = os.getenv("RISK_TABLE_NAME", "blendguard-scores")
+# Slots (a power of two, 40 bytes each); keep positions below RISK_TABLE_MAX_LOAD of this
+RISK_TABLE_CAPACITY = int(os.getenv("RISK_TABLE_CAPACITY", str(1 << 18)))
+RISK_TABLE_MAX_LOAD = 0.75
+# Reads retried this many times before a record being rewritten is reported missing
+READ_RETRIES = 64
+# Records written per seqlock window; short windows keep readers from retrying
+PUBLISH_CHUNK = 512
+
+MAGIC = 0x424C4753434F5245  # 'BLGSCORE'
+LAYOUT_VERSION = 1
+HEADER_BYTES = 64
+# Header words: magic, layout version, capacity, epoch (bumped when the writer
+# (re)initializes), records used, publishes, last publish time (float bits)
+_MAGIC, _VERSION, _CAPACITY, _EPOCH, _USED, _PUBLISHES, _UPDATED_AT = range(7)
+
+RECORD = np.dtype([
+    ('seq', '<u8'),
+    ('key', '<u8'),
+    ('risk_score', '<f8'),
+    ('health_factor', '<f8'),
+    ('timestamp', '<f8'),
+])
+
+
+def position_key(position_id: str) -> int:
+    """Stable 64-bit key for a position id (the same in every process); 0 means empty"""
+    key = int.from_bytes(hashlib.blake2b(str(position_id).encode(), digest_size=8).digest(), 'little')
+    return key or 1
+
+
+def _untrack(shm: shared_memory.SharedMemory):
+    # The table outlives any one process: without this the resource tracker
+    # unlinks the segment when whichever process touched it first exits
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+class ScoreTable:
+    """Seqlock-protected shared risk records; use create() in the writer, attach() in readers"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, writer: bool):
+        self.shm = shm
+        self.writer = writer
+        self.header = np.ndarray((HEADER_BYTES // 8,), dtype='<u8', buffer=shm.buf)
+        if self.header[_MAGIC] != MAGIC or self.header[_VERSION] != LAYOUT_VERSION:
+            raise ValueError(f"Shared memory {shm.name!r} is not a score table")
+        self.capacity = int(self.header[_CAPACITY])
+        self.records = np.ndarray((self.capacity,), dtype=RECORD, buffer=shm.buf, offset=HEADER_BYTES)
+        # Per-field views; scalar reads through these avoid copying whole records
+        self._seq, self._key = self.records['seq'], self.records['key']
+        self._risk, self._health, self._time = (self.records['risk_score'], self.records['health_factor'],
+                                                self.records['timestamp'])
+        self._mask = self.capacity - 1
+        # Slots never move once a key is placed, so both sides cache them per epoch;
+        # readers also keep the key to re-check it against a concurrent reset
+        self._write_slots: Dict[str, int] = {}
+        self._read_slots: Dict[str, Tuple[int, int]] = {}
+        self._epoch = int(self.header[_EPOCH])
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, name: str = RISK_TABLE_NAME, capacity: int = RISK_TABLE_CAPACITY) -> 'ScoreTable':
+        """Open the table for writing, reusing a compatible segment so attached readers keep working"""
+        if capacity & (capacity - 1):
+            raise ValueError(f"Score table capacity must be a power of two, got {capacity}")
+        size = HEADER_BYTES + capacity * RECORD.itemsize
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+            _untrack(shm)
+            header = np.ndarray((HEADER_BYTES // 8,), dtype='<u8', buffer=shm.buf)
+            if (shm.size < size or header[_MAGIC] != MAGIC or header[_VERSION] != LAYOUT_VERSION
+                    or header[_CAPACITY] != capacity):
+                del header
+                resource_tracker.register(shm._name, 'shared_memory')
+                shm.close()
+                shm.unlink()
+                raise FileNotFoundError(name)
+            del header
+        except FileNotFoundError:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            _untrack(shm)
+            header = np.ndarray((HEADER_BYTES // 8,), dtype='<u8', buffer=shm.buf)
+            header[:] = 0
+            header[_VERSION] = LAYOUT_VERSION
+            header[_CAPACITY] = capacity
+            header[_MAGIC] = MAGIC
+            del header
+
+        table = cls(shm, writer=True)
+        # Start from an empty table; readers see the new epoch and drop cached slots
+        table.records[:] = 0
+        table.header[_USED] = 0
+        table.header[_EPOCH] += 1
+        table._epoch = int(table.header[_EPOCH])
+        logger.info(f"Score table {name!r} ready: {capacity} slots, {size / 1e6:.1f}MB, epoch {table._epoch}")
+        return table
+
+    @classmethod
+    def attach(cls, name: str = RISK_TABLE_NAME) -> 'ScoreTable':
+        """Open an existing table read-only; raises FileNotFoundError if no writer created it"""
+        shm = shared_memory.SharedMemory(name=name)
+        _untrack(shm)
+        return cls(shm, writer=False)
+
+    def close(self):
+        self.header = self.records = None
+        self._seq = self._key = self._risk = self._health = self._time = None
+        self.shm.close()
+
+    def unlink(self):
+        """Remove the segment (readers already attached keep their mapping)"""
+        # unlink() unregisters from the resource tracker, which expects a prior register
+        resource_tracker.register(self.shm._name, 'shared_memory')
+        self.shm.unlink()
+
+    def __len__(self) -> int:
+        return int(self.header[_USED])
+
+    @property
+    def updated_at(self) -> float:
+        return float(self.header[_UPDATED_AT:_UPDATED_AT + 1].view('<f8')[0])
+
+    def _probe(self, key: int, insert: bool, pending: Optional[Dict[int, int]] = None) -> Optional[int]:
+        """Slot holding ``key``, else (when inserting) the first free one.
+
+        ``pending`` maps slots claimed earlier in the same publish, whose keys
+        are not written yet, to their keys.
+        """
+        keys = self.records['key']
+        slot = key & self._mask
+        for _ in range(self.capacity):
+            current = int(keys[slot])
+            if current == 0 and pending:
+                current = pending.get(slot, 0)
+            if current == key:
+                return slot
+            if current == 0:
+                return slot if insert else None
+            slot = (slot + 1) & self._mask
+        return None
+
+    def _check_epoch(self):
+        epoch = int(self.header[_EPOCH])
+        if epoch != self._epoch:
+            self._read_slots.clear()
+            self._epoch = epoch
+
+    # Writer
+
+    def publish(self, position_ids: Sequence[str], risk_scores: Sequence[float],
+                health_factors: Sequence[float], timestamp: Optional[float] = None) -> int:
+        """Write records for many positions at once; returns how many were stored"""
+        if not self.writer:
+            raise PermissionError("Score table was attached read-only")
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            slots = np.empty(len(position_ids), dtype=np.intp)
+            new_keys = np.zeros(len(position_ids), dtype=np.uint64)
+            keep = np.ones(len(position_ids), dtype=bool)
+            pending: Dict[int, int] = {}
+            used = int(self.header[_USED])
+            limit = int(self.capacity * RISK_TABLE_MAX_LOAD)
+            cached = self._write_slots
+            for index, position_id in enumerate(position_ids):
+                slot = cached.get(position_id)
+                if slot is None:
+                    key = position_key(position_id)
+                    slot = self._probe(key, insert=True, pending=pending)
+                    is_new = slot is not None and self.records['key'][slot] == 0 and slot not in pending
+                    if slot is None or (is_new and used >= limit):
+                        keep[index] = False
+                        continue
+                    if is_new:
+                        pending[slot] = key
+                        new_keys[index] = key
+                        used += 1
+                    cached[position_id] = slot
+                slots[index] = slot
+
+            risk_scores = np.asarray(risk_scores, dtype=np.float64)
+            health_factors = np.asarray(health_factors, dtype=np.float64)
+            if not keep.all():
+                logger.warning(f"Score table full: dropped {int((~keep).sum())} positions")
+                slots, new_keys = slots[keep], new_keys[keep]
+                risk_scores, health_factors = risk_scores[keep], health_factors[keep]
+
+            seq, keys = self._seq, self._key
+            for start in range(0, len(slots), PUBLISH_CHUNK):
+                chunk = slots[start:start + PUBLISH_CHUNK]
+                # Odd sequence: records are being written
+                seq[chunk] += 1
+                self._risk[chunk] = risk_scores[start:start + PUBLISH_CHUNK]
+                self._health[chunk] = health_factors[start:start + PUBLISH_CHUNK]
+                self._time[chunk] = timestamp
+                fresh = new_keys[start:start + PUBLISH_CHUNK]
+                if fresh.any():
+                    # Keys last: a reader probing for a new key only finds it once its fields are there
+                    placed = fresh != 0
+                    keys[chunk[placed]] = fresh[placed]
+                seq[chunk] += 1
+
+            self.header[_USED] = used
+            self.header[_PUBLISHES] += 1
+            self.header[_UPDATED_AT:_UPDATED_AT + 1].view('<f8')[0] = timestamp
+            return len(slots)
+
+    # Readers
+
+    def get(self, position_id: str) -> Optional[Dict[str, float]]:
+        return self.get_many((position_id,))[0]
+
+    def get_many(self, position_ids: Iterable[str]) -> List[Optional[Dict[str, float]]]:
+        """Consistent snapshot of each position's record, or None if it was never published"""
+        self._check_epoch()
+        seq, keys, risk, health, when = (self._seq.item, self._key.item, self._risk.item,
+                                         self._health.item, self._time.item)
+        results = []
+        for position_id in position_ids:
+            cached = self._read_slots.get(position_id)
+            if cached is None:
+                key = position_key(position_id)
+                slot = self._probe(key, insert=False)
+                if slot is None:
+                    results.append(None)
+                    continue
+                self._read_slots[position_id] = (slot, key)
+            else:
+                slot, key = cached
+
+            record = None
+            for _ in range(READ_RETRIES):
+                before = seq(slot)
+                if not before & 1:
+                    record_key = keys(slot)
+                    record = {'risk_score': risk(slot), 'health_factor': health(slot), 'timestamp': when(slot)}
+                    if seq(slot) == before:
+                        if record_key != key:
+                            # Table was reset under us; look the slot up again next time
+                            self._read_slots.pop(position_id, None)
+                            record = None
+                        break
+                    record = None
+                # Mid-write: let the writer finish
+                time.sleep(0)
+            results.append(record)
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'name': self.shm.name,
+            'capacity': self.capacity,
+            'used': len(self),
+            'load': len(self) / self.capacity,
+            'epoch': int(self.header[_EPOCH]),
+            'publishes': int(self.header[_PUBLISHES]),
+            'updated_at': self.updated_at,
+        }
+
+
+_reader: Optional[ScoreTable] = None
+_reader_lock = threading.Lock()
+
+
+def get_score_reader(name: str = RISK_TABLE_NAME) -> Optional[ScoreTable]:
+    """Attached read-only table, or None while no scorer has created it"""
+    global _reader
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                try:
+                    _reader = ScoreTable.attach(name)
+                except FileNotFoundError:
+                    return None
+                except ValueError as e:
+                    logger.error(f"Cannot read score table: {str(e)}")
+                    return None
+    return _reader
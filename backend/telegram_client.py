@@ -0,0 +1,90 @@
+"""
+Shared Telegram Bot client for BlendGuard
+One long-lived, connection-pooled Bot per event loop, reused by alerts and the
+notification API instead of building a new HTTP client per message.
+"""
+import os
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_POOL_SIZE = int(os.getenv("TELEGRAM_POOL_SIZE", "32"))
+TELEGRAM_KEEPALIVE_SECONDS = float(os.getenv("TELEGRAM_KEEPALIVE_SECONDS", "60"))
+TELEGRAM_POOL_TIMEOUT = float(os.getenv("TELEGRAM_POOL_TIMEOUT", "5"))
+# Override to point the client at a local fake Telegram server
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
+
+class PooledHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest with a configurable keep-alive expiry on pooled connections"""
+
+    def __init__(self, connection_pool_size: int = TELEGRAM_POOL_SIZE,
+                 keepalive_expiry: float = TELEGRAM_KEEPALIVE_SECONDS,
+                 pool_timeout: float = TELEGRAM_POOL_TIMEOUT, **kwargs: Any):
+        # Read by _build_client, which the parent constructor calls to create the one client
+        self._keepalive_expiry = keepalive_expiry
+        super().__init__(connection_pool_size=connection_pool_size, pool_timeout=pool_timeout, **kwargs)
+
+    def _build_client(self) -> httpx.AsyncClient:
+        limits = self._client_kwargs['limits']
+        self._client_kwargs['limits'] = httpx.Limits(
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=self._keepalive_expiry,
+        )
+        return super()._build_client()
+
+
+# httpx connections are bound to the loop that opened them, so bots are cached
+# per (loop, token). Entries disappear with their loop.
+_bots: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Bot]]' = weakref.WeakKeyDictionary()
+_bots_lock = threading.Lock()
+
+
+def _default_token() -> str:
+    token = os.getenv("TELEGRAM_TOKEN")
+    if not token:
+        raise ValueError("TELEGRAM_TOKEN environment variable not set")
+    return token
+
+
+def get_bot(token: Optional[str] = None) -> Bot:
+    """Return the pooled Bot for the running event loop, creating it on first use"""
+    token = token or _default_token()
+    loop = asyncio.get_running_loop()
+    with _bots_lock:
+        bots = _bots.setdefault(loop, {})
+        bot = bots.get(token)
+        if bot is None:
+            request = PooledHTTPXRequest()
+            # Outbound-only client: getUpdates is never called, so both slots share one pool
+            bot = Bot(token=token, base_url=TELEGRAM_API_URL, request=request, get_updates_request=request)
+            bots[token] = bot
+            logger.info(f"Created pooled Telegram client (pool size {TELEGRAM_POOL_SIZE})")
+    return bot
+
+
+async def send_message(chat_id: Any, text: str, token: Optional[str] = None, **kwargs: Any):
+    """Send a message through the shared pooled client"""
+    return await get_bot(token).send_message(chat_id=chat_id, text=text, **kwargs)
+
+
+async def shutdown():
+    """Close the pooled clients owned by the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _bots_lock:
+        bots = _bots.pop(loop, {})
+    for bot in bots.values():
+        try:
+            # Bot.shutdown() is a no-op unless initialize() ran, so close the pool directly
+            await bot.request.shutdown()
+        except Exception as e:
+            logger.error(f"Error closing Telegram client: {str(e)}")
@@ -10,6 +10,7 @@ from telegram import Bot
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
+from position_store import get_position_store
 
 # Set up logging
 logging.basicConfig(
@@ -81,15 +82,8 @@ def format_position(position):
 
 def get_position(position_id):
     """Get position data - centralized source"""
-    return {
-        'id': position_id or 'XLM-123',
-        'asset': 'XLM',
-        'collateral': 10000,  # USD value
-        'debt': 8500,         # USD value
-        'ltv': 0.85,          # 85%
-        'healthFactor': 1.15,
-        'status': 'high-risk'
-    }
+    store = get_position_store()
+    return store.get(position_id or 'XLM-123', camel_case=True) or dict(store.get('XLM-123', camel_case=True), id=position_id)
 
 async def demo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /demo command"""
@@ -0,0 +1,220 @@
+"""
+Rate-limit-aware Telegram dispatcher for BlendGuard
+Schedules outbound messages through a global token bucket plus per-chat
+buckets so bursts stay under Telegram's limits, and honors retry_after on 429s.
+Sends to the same chat go out one at a time in call order, retries included.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from telegram.error import RetryAfter
+
+from telegram_client import get_bot
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows ~30 messages/second overall and ~1 message/second per chat.
+# Any one-second span sees at most rate + burst sends; keep that sum a few under 30,
+# since uneven network latency can land more of them inside one second at Telegram.
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "25"))
+TELEGRAM_GLOBAL_BURST = float(os.getenv("TELEGRAM_GLOBAL_BURST", "2"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = float(os.getenv("TELEGRAM_CHAT_BURST", "1"))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "3"))
+# Idle per-chat buckets beyond this many are forgotten (they refill to full anyway)
+MAX_CHAT_BUCKETS = 100000
+
+
+class TokenBucket:
+    """Reservation-style token bucket.
+
+    Tokens may go negative: each caller reserves one and sleeps for the debt,
+    which keeps waiters in FIFO order without polling.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return how many seconds the caller must wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def pause(self, seconds: float):
+        """Block new reservations for ``seconds`` (used for server-imposed retry_after)"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def spent(self):
+        """Record that a token was used just now, however long ago it was reserved"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity - 1, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    @property
+    def idle(self) -> bool:
+        return self._tokens + (time.monotonic() - self._updated) * self.rate >= self.capacity
+
+
+class TelegramDispatcher:
+    """Sends Bot API calls at the highest rate Telegram tolerates"""
+
+    def __init__(self, global_rate: float = TELEGRAM_GLOBAL_RATE, global_burst: float = TELEGRAM_GLOBAL_BURST,
+                 chat_rate: float = TELEGRAM_CHAT_RATE, chat_burst: float = TELEGRAM_CHAT_BURST,
+                 max_retries: int = TELEGRAM_MAX_RETRIES):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+        # Completion of the latest send per chat; thread-safe futures so any loop can wait on them
+        self._chat_tails: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.metrics: Dict[str, float] = {
+            'queue_depth': 0,
+            'max_queue_depth': 0,
+            'sent': 0,
+            'retry_after': 0,
+            'failed': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+                self._chat_buckets[chat_id] = bucket
+                if len(self._chat_buckets) > MAX_CHAT_BUCKETS:
+                    oldest_id, oldest = next(iter(self._chat_buckets.items()))
+                    if oldest.idle:
+                        del self._chat_buckets[oldest_id]
+            else:
+                self._chat_buckets.move_to_end(chat_id)
+            return bucket
+
+    async def _acquire(self, chat_bucket: TokenBucket) -> float:
+        waited = 0.0
+        # Wait for the chat first so a busy chat does not hold global capacity
+        for bucket in (chat_bucket, self.global_bucket):
+            delay = bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                waited += delay
+        return waited
+
+    async def send_message(self, chat_id: Any, text: str, token: Optional[str] = None, **kwargs: Any):
+        """Rate-limited Bot.send_message"""
+        return await self.call('send_message', chat_id, token=token, text=text, **kwargs)
+
+    async def call(self, method: str, chat_id: Any, token: Optional[str] = None,
+                   timeout: Optional[float] = None, **kwargs: Any):
+        """Rate-limited call of any Bot method that targets ``chat_id``.
+
+        Waits for the previous call to the same chat to finish first, so a
+        retried 429 is never overtaken by a later message to that chat.
+        ``timeout`` bounds each request to Telegram, not the time spent queued
+        behind the rate limits; a request that exceeds it raises TimeoutError.
+        """
+        key = str(chat_id)
+        done: Future = Future()
+        with self._lock:
+            previous = self._chat_tails.get(key)
+            self._chat_tails[key] = done
+        try:
+            return await self._call(method, chat_id, key, previous, token, timeout, **kwargs)
+        finally:
+            done.set_result(None)
+            with self._lock:
+                if self._chat_tails.get(key) is done:
+                    del self._chat_tails[key]
+
+    async def _call(self, method: str, chat_id: Any, key: str, previous: Optional[Future],
+                    token: Optional[str], timeout: Optional[float], **kwargs: Any):
+        metrics = self.metrics
+        attempt = 0
+        while True:
+            metrics['queue_depth'] += 1
+            metrics['max_queue_depth'] = max(metrics['max_queue_depth'], metrics['queue_depth'])
+            started = time.monotonic()
+            chat_bucket = self._chat_bucket(key)
+            try:
+                if previous is not None:
+                    # Shielded: a cancelled caller must not cancel the chain for later callers
+                    await asyncio.shield(asyncio.wrap_future(previous))
+                    previous = None
+                await self._acquire(chat_bucket)
+            finally:
+                metrics['queue_depth'] -= 1
+            waited = time.monotonic() - started
+            metrics['wait_seconds_total'] += waited
+            metrics['wait_seconds_max'] = max(metrics['wait_seconds_max'], waited)
+
+            try:
+                result = await asyncio.wait_for(getattr(get_bot(token), method)(chat_id=chat_id, **kwargs), timeout)
+                metrics['sent'] += 1
+                return result
+            except RetryAfter as e:
+                metrics['retry_after'] += 1
+                delay = e.retry_after.total_seconds() if isinstance(e.retry_after, timedelta) else float(e.retry_after)
+                # A 429 means we were too fast for everyone, not just this chat
+                self.global_bucket.pause(delay)
+                chat_bucket.pause(delay)
+                attempt += 1
+                logger.warning(f"Telegram rate limited {method} to {chat_id}, retry after {delay:.1f}s")
+                if attempt > self.max_retries:
+                    metrics['failed'] += 1
+                    raise
+            except Exception:
+                metrics['failed'] += 1
+                raise
+            finally:
+                # Space the chat's next send from when Telegram answered, which is after it
+                # counted this one, so queueing and network jitter cannot bunch them up
+                chat_bucket.spent()
+
+    def stats(self) -> Dict[str, float]:
+        stats = dict(self.metrics)
+        calls = stats['sent'] + stats['failed']
+        stats['wait_seconds_avg'] = stats['wait_seconds_total'] / calls if calls else 0.0
+        stats['chat_buckets'] = len(self._chat_buckets)
+        return stats
+
+
+_dispatcher: Optional[TelegramDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> TelegramDispatcher:
+    """Return the process-wide dispatcher"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = TelegramDispatcher()
+    return _dispatcher
+
+
+async def send_message(chat_id: Any, text: str, token: Optional[str] = None, **kwargs: Any):
+    """Send a message through the shared rate-limited dispatcher"""
+    return await get_dispatcher().send_message(chat_id, text, token=token, **kwargs)
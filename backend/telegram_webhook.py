@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Telegram webhook ingestion for BlendGuard
+Feeds updates POSTed by Telegram into a polling-free Application running the
+alert bot's handlers, so any number of backend workers can receive updates.
+
+Register the backend's route with Telegram:
+    python telegram_webhook.py set https://api.example.com/api/telegram/webhook
+
+Replay recorded updates (a JSON array or NDJSON file) against a local backend:
+    python telegram_webhook.py replay updates.ndjson --url http://localhost:5001/api/telegram/webhook
+"""
+import os
+import hmac
+import json
+import asyncio
+import logging
+import argparse
+from typing import Any, Dict, Optional
+
+from telegram import Update
+from telegram.ext import Application
+
+from telegram_client import TELEGRAM_API_URL, PooledHTTPXRequest, get_bot
+from update_processor import OrderedUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# Public URL of the webhook route; when set, alert_bot stops long polling
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL", "")
+# Echoed by Telegram in X-Telegram-Bot-Api-Secret-Token on every delivery; required
+# for webhook mode, since without it anyone who can reach the route can forge updates
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+# Parallel deliveries Telegram may open to the webhook (1-100)
+TELEGRAM_WEBHOOK_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_WEBHOOK_MAX_CONNECTIONS", "40"))
+# Updates processed at once per worker process (ordered per user within a process)
+TELEGRAM_WEBHOOK_CONCURRENCY = int(os.getenv("TELEGRAM_WEBHOOK_CONCURRENCY", "64"))
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class TelegramWebhook:
+    """Per-process Application that processes webhook updates on the current loop"""
+
+    def __init__(self, token: Optional[str] = None, secret: str = TELEGRAM_WEBHOOK_SECRET,
+                 concurrency: int = TELEGRAM_WEBHOOK_CONCURRENCY):
+        self.token = token
+        self.secret = secret
+        self.concurrency = concurrency
+        self.application: Optional[Application] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self.received = 0
+        self.rejected = 0
+
+    def verify(self, secret_header: Optional[str]) -> bool:
+        """Check the secret token header; every update is rejected if no secret is configured"""
+        if self.secret and hmac.compare_digest((secret_header or "").encode(), self.secret.encode()):
+            return True
+        if not self.secret and not self.rejected:
+            logger.error("TELEGRAM_WEBHOOK_SECRET is not set: rejecting all webhook updates")
+        self.rejected += 1
+        return False
+
+    async def start(self) -> Application:
+        """Build and start the Application on the running loop, once"""
+        if self.application is not None:
+            return self.application
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.application is None:
+                # Imported here: alert_bot needs TELEGRAM_TOKEN and imports this module
+                import alert_bot
+
+                token = self.token or os.getenv("TELEGRAM_TOKEN")
+                application = (
+                    Application.builder()
+                    .token(token)
+                    .base_url(TELEGRAM_API_URL)
+                    .request(PooledHTTPXRequest())
+                    .updater(None)
+                    .concurrent_updates(OrderedUpdateProcessor(self.concurrency))
+                    .build()
+                )
+                alert_bot.register_handlers(application)
+                await application.initialize()
+                await application.start()
+                self.application = application
+                logger.info(f"Telegram webhook processor started (concurrency {self.concurrency})")
+        return self.application
+
+    async def submit(self, payload: Dict[str, Any]) -> Optional[int]:
+        """Queue one update for the handlers; returns its update_id"""
+        application = await self.start()
+        update = Update.de_json(payload, application.bot)
+        if update is None:
+            return None
+        self.received += 1
+        await application.update_queue.put(update)
+        return update.update_id
+
+    async def stop(self):
+        if self.application is None:
+            return
+        application, self.application = self.application, None
+        await application.stop()
+        await application.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        application = self.application
+        return {
+            'running': bool(application and application.running),
+            'received': self.received,
+            'rejected': self.rejected,
+            'queued': application.update_queue.qsize() if application else 0,
+            'processor': application.update_processor.stats() if application else None,
+        }
+
+
+async def set_webhook(url: str, token: Optional[str] = None, drop_pending_updates: bool = False) -> bool:
+    """Point Telegram at the backend's webhook route"""
+    if not TELEGRAM_WEBHOOK_SECRET:
+        raise ValueError("TELEGRAM_WEBHOOK_SECRET must be set to use webhook mode")
+    return await get_bot(token).set_webhook(
+        url=url,
+        secret_token=TELEGRAM_WEBHOOK_SECRET,
+        max_connections=TELEGRAM_WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=Update.ALL_TYPES,
+        drop_pending_updates=drop_pending_updates,
+    )
+
+
+async def delete_webhook(token: Optional[str] = None) -> bool:
+    """Stop webhook delivery so long polling can be used again"""
+    return await get_bot(token).delete_webhook()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('action', choices=['set', 'delete', 'info', 'replay'])
+    parser.add_argument('target', nargs='?', default=TELEGRAM_WEBHOOK_URL,
+                        help='webhook URL for set, or a recorded updates file for replay')
+    parser.add_argument('--url', default='http://localhost:5001/api/telegram/webhook',
+                        help='webhook route to replay against')
+    parser.add_argument('--drop-pending-updates', action='store_true')
+    args = parser.parse_args()
+
+    async def replay(path: str, url: str):
+        import httpx
+
+        with open(path) as f:
+            text = f.read().strip()
+        updates = json.loads(text) if text.startswith('[') else [json.loads(line) for line in text.splitlines() if line]
+        headers = {SECRET_HEADER: TELEGRAM_WEBHOOK_SECRET} if TELEGRAM_WEBHOOK_SECRET else {}
+        async with httpx.AsyncClient(timeout=30) as client:
+            responses = await asyncio.gather(*(client.post(url, json=update, headers=headers) for update in updates))
+        for update, response in zip(updates, responses):
+            logger.info(f"update {update.get('update_id')}: {response.status_code} {response.text.strip()}")
+
+    async def main():
+        if args.action == 'replay':
+            return await replay(args.target, args.url)
+        if args.action == 'set':
+            if not args.target:
+                parser.error("a webhook URL (or TELEGRAM_WEBHOOK_URL) is required")
+            await set_webhook(args.target, drop_pending_updates=args.drop_pending_updates)
+            logger.info(f"Webhook set to {args.target}")
+        elif args.action == 'delete':
+            await delete_webhook()
+            logger.info("Webhook deleted")
+        logger.info(str((await get_bot().get_webhook_info()).to_dict()))
+
+    asyncio.run(main())
@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+
+from compiled_forest import ARRAY_NAMES, CompiledForest
+from model_store import DEFAULT_MMAP_MODE, ModelStore
+
+
+def mapped_file(array):
+    """Path of the file ``array``'s memory lives in, or None for private memory"""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return array.filename
+        array = getattr(array, 'base', None)
+    return None
+
+
+@pytest.fixture(scope='module')
+def forest_model():
+    X, y = make_classification(n_samples=200, n_features=4, random_state=0)
+    return RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+
+
+def test_compiled_forest_load_maps_shared_files(forest_model, tmp_path):
+    CompiledForest.from_sklearn(forest_model).save(str(tmp_path))
+    first = CompiledForest.load(str(tmp_path))
+    second = CompiledForest.load(str(tmp_path))
+
+    for name in ARRAY_NAMES:
+        path = os.path.join(str(tmp_path), f"{name}.npy")
+        # Both loads read the same read-only file mapping, so their pages are shared
+        assert mapped_file(getattr(first, name)) == path
+        assert mapped_file(getattr(second, name)) == path
+    assert mapped_file(first._children_flat) is not None
+
+    X = np.random.default_rng(0).normal(size=(50, 4))
+    np.testing.assert_allclose(first.predict_proba(X), forest_model.predict_proba(X)[:, 1])
+
+
+def test_model_store_mmap_does_not_share_tree_arrays(forest_model, tmp_path):
+    assert DEFAULT_MMAP_MODE is None
+    path = str(tmp_path / 'model.pkl')
+    ModelStore(path).dump(forest_model)
+
+    model = ModelStore(path, mmap_mode='r').get()
+    # joblib maps plain ndarrays only; every tree is unpickled into private memory
+    for estimator in model.estimators_:
+        assert mapped_file(estimator.tree_.value) is None
+        assert mapped_file(estimator.tree_.threshold) is None
@@ -0,0 +1,28 @@
+import numpy as np
+
+from risk_math import compute_risk_metrics, health_factor, loan_to_value
+
+PRICES = np.array([2.0, 10.0])
+FACTORS = np.array([0.5, 0.8])
+
+
+def test_health_factor_is_nan_for_missing_debt():
+    health = health_factor(np.array([100.0, 100.0, 100.0]), np.array([50.0, 0.0, np.nan]), PRICES, FACTORS,
+                           np.array([0, 0, 1]))
+    np.testing.assert_allclose(health[:2], [2.0, np.inf])
+    assert np.isnan(health[2])
+
+
+def test_loan_to_value_is_nan_for_missing_inputs():
+    ltv = loan_to_value(np.array([100.0, 100.0, np.nan, 0.0]), np.array([50.0, np.nan, 50.0, np.nan]), PRICES,
+                        np.array([0, 0, 0, 0]))
+    assert ltv[0] == 0.25
+    assert np.isnan(ltv[1:]).all()
+
+
+def test_missing_debt_never_looks_healthy():
+    metrics = compute_risk_metrics(np.array([100.0, 100.0]), np.array([np.nan, 150.0]), PRICES, FACTORS,
+                                   np.array([0, 0]))
+    for name in ('ltv', 'health_factor', 'liquidation_price', 'distance_to_liquidation'):
+        assert np.isnan(metrics[name][0]), name
+    assert metrics['health_factor'][1] < 1.0
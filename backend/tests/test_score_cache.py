@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from risk_engine import FEATURES, LiquidationPredictor
+from score_cache import ScoreCache
+
+ROWS = np.array([
+    [0.5, 0.2, 0.7, -0.1],
+    [np.nan, 0.2, 0.7, -0.1],
+    [np.inf, 0.2, 0.7, -0.1],
+    [-np.inf, 0.2, 0.7, np.nan],
+])
+
+
+def test_keys_for_non_finite_features_match_key():
+    cache = ScoreCache()
+    keys = cache.keys('v1', ROWS)
+    assert keys == [cache.key('v1', row.tolist()) for row in ROWS]
+    assert len(set(keys)) == len(ROWS)
+
+
+def test_cached_predict_scores_nan_rows(tmp_path):
+    path = str(tmp_path / 'model.pkl')
+    uncached = LiquidationPredictor(path)
+    cached = LiquidationPredictor(path, cache=ScoreCache())
+    row = dict(zip(FEATURES, ROWS[1].tolist()))
+
+    expected = uncached.predict(row)
+    assert cached.predict(row) == pytest.approx(expected)
+    assert cached.predict(row) == pytest.approx(expected)
+    assert cached.cache.hits == 1
@@ -0,0 +1,24 @@
+import asyncio
+
+import httpx
+
+from telegram_client import PooledHTTPXRequest
+
+
+def test_pooled_request_builds_one_client_with_keepalive(monkeypatch):
+    clients = []
+
+    class TrackedClient(httpx.AsyncClient):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            clients.append(self)
+
+    monkeypatch.setattr(httpx, 'AsyncClient', TrackedClient)
+    request = PooledHTTPXRequest(connection_pool_size=7, keepalive_expiry=12.5)
+
+    assert clients == [request._client]
+    pool = request._client._transport._pool
+    assert pool._max_connections == 7
+    assert pool._keepalive_expiry == 12.5
+    asyncio.run(request.shutdown())
+    assert request._client.is_closed
@@ -0,0 +1,38 @@
+import pytest
+from flask import Flask
+
+import api.webhook
+from telegram_webhook import SECRET_HEADER, TelegramWebhook
+
+UPDATE = {'update_id': 1, 'message': {'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'},
+                                      'text': '/start'}}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api.webhook, 'webhook', TelegramWebhook(secret='s3cret'))
+    app = Flask(__name__)
+    app.register_blueprint(api.webhook.bp, url_prefix='/api')
+    return app.test_client()
+
+
+@pytest.mark.parametrize('headers', [{}, {SECRET_HEADER: ''}, {SECRET_HEADER: 'wrong'}])
+def test_webhook_rejects_missing_or_wrong_secret(client, headers):
+    response = client.post('/api/telegram/webhook', json=UPDATE, headers=headers)
+    assert response.status_code == 403
+    assert api.webhook.webhook.rejected == 1
+    assert api.webhook.webhook.received == 0
+
+
+def test_verify_accepts_only_the_configured_secret():
+    webhook = TelegramWebhook(secret='s3cret')
+    assert webhook.verify('s3cret')
+    assert not webhook.verify('s3cret-not')
+    assert not webhook.verify(None)
+
+
+def test_verify_rejects_everything_without_a_secret():
+    webhook = TelegramWebhook(secret='')
+    assert not webhook.verify(None)
+    assert not webhook.verify('')
+    assert webhook.rejected == 2
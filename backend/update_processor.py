@@ -0,0 +1,219 @@
+"""
+Concurrent Telegram update processing for BlendGuard
+An update processor for the bot Application that runs updates from different
+users concurrently, keeps each user's updates in order, bounds handler run
+time and records per-command latency histograms.
+"""
+import os
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from typing import Any, Awaitable, Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# Updates processed at once; 1 restores strictly sequential processing
+BOT_CONCURRENT_UPDATES = int(os.getenv("BOT_CONCURRENT_UPDATES", "32"))
+# Handlers running longer than this are cancelled (0 disables the limit)
+BOT_HANDLER_TIMEOUT = float(os.getenv("BOT_HANDLER_TIMEOUT", "15"))
+# How often handler latency summaries are logged (0 disables)
+BOT_METRICS_LOG_SECONDS = float(os.getenv("BOT_METRICS_LOG_SECONDS", "300"))
+
+# Commands and callback actions the bot handles; anything else is labelled
+# 'other' so user-typed text cannot mint unbounded metric labels
+KNOWN_COMMANDS = frozenset(('/start', '/status', '/contract', '/demo'))
+KNOWN_CALLBACKS = frozenset(('protect', 'details'))
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (non-cumulative counts, last bucket is +Inf)"""
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.timeouts = 0
+        self.errors = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets['+Inf'] = self.count
+        return {
+            'count': self.count,
+            'avg_seconds': self.total / self.count if self.count else 0.0,
+            'max_seconds': self.max,
+            'p50_seconds': self.percentile(0.50),
+            'p95_seconds': self.percentile(0.95),
+            'p99_seconds': self.percentile(0.99),
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'buckets': buckets,
+        }
+
+
+def update_label(update: object) -> str:
+    """Name an update by what it asks for: '/status', 'callback:protect', 'message', ..."""
+    if not isinstance(update, Update):
+        return type(update).__name__
+    message = update.message or update.edited_message
+    if message is not None and message.text and message.text.startswith('/'):
+        # '/status@BlendGuardBot args' -> '/status'
+        command = message.text.split()[0].split('@')[0]
+        return command if command in KNOWN_COMMANDS else 'other'
+    if update.callback_query is not None:
+        data = update.callback_query.data or ''
+        if not data:
+            return 'callback'
+        action = data.split('_', 1)[0]
+        return f"callback:{action}" if action in KNOWN_CALLBACKS else 'callback:other'
+    if message is not None:
+        return 'message'
+    return 'other'
+
+
+def update_user_key(update: object) -> Optional[int]:
+    """Updates sharing a key are processed one at a time, in arrival order"""
+    if isinstance(update, Update):
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+    return None
+
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    """Concurrent across users, sequential per user, with handler timeouts.
+
+    The base class bounds concurrency with a semaphore; each user also has a
+    FIFO lock so a user's callback never overtakes the command that produced
+    its keyboard. The user lock is taken before a semaphore slot, so one
+    user's backlog waits without holding slots other users need. Locks are
+    dropped once a user has nothing queued.
+    """
+
+    def __init__(self, max_concurrent_updates: int = BOT_CONCURRENT_UPDATES,
+                 handler_timeout: float = BOT_HANDLER_TIMEOUT,
+                 log_interval: float = BOT_METRICS_LOG_SECONDS):
+        super().__init__(max_concurrent_updates)
+        self.handler_timeout = handler_timeout
+        self.log_interval = log_interval
+        self._user_locks: Dict[int, Tuple[asyncio.Lock, int]] = {}
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._log_task: Optional[asyncio.Task] = None
+
+    async def initialize(self) -> None:
+        if self.log_interval > 0 and self._log_task is None:
+            self._log_task = asyncio.create_task(self._log_periodically())
+
+    async def shutdown(self) -> None:
+        if self._log_task is not None:
+            self._log_task.cancel()
+            self._log_task = None
+        self.log_summary()
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:  # type: ignore[misc]
+        # Per-user lock first, then the base class's semaphore slot
+        key = update_user_key(update)
+        if key is None:
+            return await super().process_update(update, coroutine)
+
+        lock, waiters = self._user_locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._user_locks[key] = (lock, waiters + 1)
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            lock, waiters = self._user_locks[key]
+            if waiters <= 1:
+                del self._user_locks[key]
+            else:
+                self._user_locks[key] = (lock, waiters - 1)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await self._run(update, coroutine)
+
+    async def _run(self, update: object, coroutine: Awaitable[Any]):
+        label = update_label(update)
+        histogram = self.histograms.get(label)
+        if histogram is None:
+            histogram = self.histograms[label] = LatencyHistogram()
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            if self.handler_timeout > 0:
+                await asyncio.wait_for(coroutine, self.handler_timeout)
+            else:
+                await coroutine
+        except asyncio.TimeoutError:
+            histogram.timeouts += 1
+            logger.warning(f"Handler for {label} timed out after {self.handler_timeout:.1f}s and was cancelled")
+        except Exception as e:
+            histogram.errors += 1
+            logger.error(f"Handler for {label} failed: {str(e)}")
+        finally:
+            self.in_flight -= 1
+            histogram.observe(time.perf_counter() - started)
+
+    async def _log_periodically(self):
+        while True:
+            await asyncio.sleep(self.log_interval)
+            self.log_summary()
+
+    def log_summary(self):
+        """Log handlers by p95 latency, slowest first"""
+        ranked = sorted(self.histograms.items(), key=lambda item: item[1].percentile(0.95), reverse=True)
+        for label, histogram in ranked:
+            logger.info(
+                f"Handler {label}: {histogram.count} updates, "
+                f"avg {histogram.total / histogram.count * 1000:.0f}ms, "
+                f"p95 <= {histogram.percentile(0.95) * 1000:.0f}ms, max {histogram.max * 1000:.0f}ms, "
+                f"{histogram.timeouts} timeouts"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'max_concurrent_updates': self.max_concurrent_updates,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'users_active': len(self._user_locks),
+            'handler_timeout_seconds': self.handler_timeout,
+            'handlers': {label: histogram.to_dict() for label, histogram in self.histograms.items()},
+        }
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Telegram webhook check
+Starts the local fake Telegram server and the backend (Flask and/or ASGI mode),
+POSTs a recorded update stream to /api/telegram/webhook with every chat's
+updates delivered in order and chats delivered concurrently, then asserts that
+each update got its reply, each chat's replies came back in the order its
+commands were sent, and updates were handled concurrently rather than one by one.
+
+    python webhook_check.py --mode both --chats 100
+    python webhook_check.py --record updates.ndjson --chats 20   # write the synthetic stream
+    python webhook_check.py --updates updates.ndjson             # replay a recording
+
+Exits non-zero if any check fails.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+import logging
+import httpx
+from fake_telegram_server import serve
+from load_test import start_server
+from message_templates import DEMO_TEXT, NO_POSITIONS_TEXT, STATUS_HEADER, WELCOME_TEXT
+
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+COMMANDS = ('/start', '/status', '/contract', '/demo')
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def synthetic_updates(chats: int, commands=COMMANDS, start_ts: int = 1718000000) -> list:
+    """Private-chat command messages shaped like Telegram's, ``commands`` in order per chat"""
+    updates = []
+    for step, command in enumerate(commands):
+        for i in range(chats):
+            chat_id = 100000 + i
+            user = {'id': chat_id, 'is_bot': False, 'first_name': f'User{i}'}
+            updates.append({
+                'update_id': len(updates) + 1,
+                'message': {
+                    'message_id': step + 1,
+                    'date': start_ts + step,
+                    'chat': {'id': chat_id, 'type': 'private', 'first_name': user['first_name']},
+                    'from': user,
+                    'text': command,
+                    'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}],
+                },
+            })
+    return updates
+
+
+def load_updates(path: str) -> list:
+    """Recorded updates from a JSON array or NDJSON file"""
+    with open(path) as f:
+        text = f.read().strip()
+    return json.loads(text) if text.startswith('[') else [json.loads(line) for line in text.splitlines() if line]
+
+
+def command_of(update: dict):
+    message = update.get('message') or {}
+    command = (message.get('text') or '').split(' ', 1)[0].split('@', 1)[0]
+    return (str(message['chat']['id']), command) if command in COMMANDS else (None, None)
+
+
+def reply_kind(text: str):
+    """Which command a bot reply answers"""
+    if text.strip() == WELCOME_TEXT.strip():
+        return '/start'
+    if text.startswith(STATUS_HEADER) or text.strip() == NO_POSITIONS_TEXT.strip():
+        return '/status'
+    if 'Contract Info' in text:
+        return '/contract'
+    if text == DEMO_TEXT:
+        return '/demo'
+    return None
+
+
+async def post_all(url: str, updates: list) -> float:
+    """POST each chat's updates one after another (as Telegram does), all chats at once"""
+    by_chat = {}
+    for update in updates:
+        chat_id, _ = command_of(update)
+        by_chat.setdefault(chat_id, []).append(update)
+    secret = os.getenv('TELEGRAM_WEBHOOK_SECRET')
+    headers = {SECRET_HEADER: secret} if secret else {}
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=100)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def deliver(chat_updates):
+            for update in chat_updates:
+                response = await client.post(url, json=update, headers=headers)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(deliver(chat_updates) for chat_updates in by_chat.values()))
+        return time.perf_counter() - started
+
+
+def run_mode(mode: str, args, updates: list, telegram_url: str, state) -> dict:
+    expected = {}
+    for update in updates:
+        chat_id, command = command_of(update)
+        if chat_id is not None:
+            expected.setdefault(chat_id, []).append(command)
+    total = sum(len(commands) for commands in expected.values())
+
+    process = start_server(mode, args.port, telegram_url)
+    try:
+        with state.lock:
+            state.sent.clear()
+        started = time.perf_counter()
+        post_seconds = asyncio.run(post_all(f'http://127.0.0.1:{args.port}/api/telegram/webhook', updates))
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline:
+            with state.lock:
+                replies = [call['params'] for call in state.sent if call['method'] == 'sendMessage']
+            if len(replies) >= total:
+                break
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    received = {}
+    for params in replies:
+        received.setdefault(str(params['chat_id']), []).append(reply_kind(params.get('text', '')))
+    # Handled strictly one at a time, every update would cost at least one Telegram round trip
+    serial_seconds = total * args.latency
+
+    failures = []
+    if len(replies) != total:
+        failures.append(f"{len(replies)} replies for {total} command updates")
+    out_of_order = [chat_id for chat_id, commands in expected.items() if received.get(chat_id) != commands]
+    if out_of_order:
+        failures.append(f"{len(out_of_order)} chats got replies missing or out of order")
+    if elapsed * args.min_speedup > serial_seconds:
+        failures.append(f"took {elapsed:.2f}s, under {args.min_speedup:g}x faster than one at a time "
+                        f"({serial_seconds:.2f}s)")
+
+    return {
+        'mode': mode,
+        'updates': len(updates),
+        'chats': len(expected),
+        'replies': len(replies),
+        'post_seconds': round(post_seconds, 2),
+        'seconds': round(elapsed, 2),
+        'updates_per_sec': round(total / elapsed, 1),
+        'speedup_vs_serial': round(serial_seconds / elapsed, 1),
+        'failures': failures,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['flask', 'asgi', 'both'], default='both')
+    parser.add_argument('--updates', metavar='PATH', help='recorded updates (JSON array or NDJSON) to replay')
+    parser.add_argument('--chats', type=int, default=100, help='chats in the synthetic stream')
+    parser.add_argument('--record', metavar='PATH', help='write the synthetic stream as NDJSON and exit')
+    parser.add_argument('--latency', type=float, default=0.2, help='simulated Telegram round trip in seconds')
+    parser.add_argument('--min-speedup', type=float, default=4.0,
+                        help='required speedup over handling updates one at a time')
+    parser.add_argument('--timeout', type=float, default=60.0, help='seconds to wait for all replies')
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--telegram-port', type=int, default=8095)
+    args = parser.parse_args()
+
+    updates = load_updates(args.updates) if args.updates else synthetic_updates(args.chats)
+    if args.record:
+        with open(args.record, 'w') as handle:
+            for update in updates:
+                handle.write(json.dumps(update) + "\n")
+        print(f"Wrote {len(updates)} updates to {args.record}")
+        sys.exit(0)
+
+    # Replies are sent straight from the handlers, so the fake server does not rate limit them
+    telegram, state = serve(port=args.telegram_port, global_rate=1e9, chat_rate=1e9, latency=args.latency)
+    telegram_url = f'http://127.0.0.1:{args.telegram_port}/bot'
+    os.environ.setdefault('TELEGRAM_TOKEN', '1:fake-webhook-check')
+    # The backend rejects every update unless a webhook secret is configured
+    os.environ.setdefault('TELEGRAM_WEBHOOK_SECRET', 'fake-webhook-check-secret')
+
+    modes = ['flask', 'asgi'] if args.mode == 'both' else [args.mode]
+    results = [run_mode(mode, args, updates, telegram_url, state) for mode in modes]
+    telegram.shutdown()
+
+    for result in results:
+        print(json.dumps(result))
+    sys.exit(1 if any(result['failures'] for result in results) else 0)